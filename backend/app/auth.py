@@ -16,10 +16,21 @@ from sqlalchemy.ext.asyncio import AsyncSession
 from app.database import get_db, settings
 from app.models import User
 from app.schemas import TokenData
+from app.services.cache import TTLCache
+from app.services.password_hasher import PasswordHasherBusy, password_hasher
 
 # OAuth2 scheme
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="api/auth/token")
 
+# Пользователь нужен на каждый авторизованный запрос (в т.ч. опрос админки).
+# Короткий TTL ограничивает устаревание роли/профиля в других воркерах,
+# изменения через API сбрасывают запись явно (invalidate_user_cache).
+user_cache = TTLCache(ttl_seconds=settings.user_cache_ttl_seconds, max_entries=10000)
+
+# Хеш пользователей OAuth: не совпадает ни с одним паролем и не требует bcrypt.
+# Строка, а не NULL - в старых базах SQLite колонка осталась NOT NULL.
+UNUSABLE_PASSWORD_HASH = "!"
+
 
 def verify_password(plain_password: str, hashed_password: str) -> bool:
     """
@@ -58,6 +69,27 @@ def get_password_hash(password: str) -> str:
     return hashed.decode("utf-8")
 
 
+async def _run_password_hasher(func, *args):
+    try:
+        return await password_hasher.run(func, *args)
+    except PasswordHasherBusy:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Сервер перегружен, попробуйте еще раз",
+            headers={"Retry-After": "1"},
+        )
+
+
+async def verify_password_async(plain_password: str, hashed_password: str) -> bool:
+    """verify_password in the bcrypt thread pool (use in request handlers)."""
+    return await _run_password_hasher(verify_password, plain_password, hashed_password)
+
+
+async def get_password_hash_async(password: str) -> str:
+    """get_password_hash in the bcrypt thread pool (use in request handlers)."""
+    return await _run_password_hasher(get_password_hash, password)
+
+
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -> str:
     """Create a JWT access token."""
     to_encode = data.copy()
@@ -81,6 +113,50 @@ async def get_user_by_username(db: AsyncSession, username: str) -> Optional[User
     return result.scalar_one_or_none()
 
 
+def _detached_user(user: User) -> User:
+    """Копия пользователя, не привязанная к сессии (безопасна для разделения между запросами)."""
+    return User(**{column.name: getattr(user, column.name) for column in User.__table__.columns})
+
+
+async def get_cached_user(db: AsyncSession, username: str) -> Optional[User]:
+    """
+    Get user by username through the in-process cache.
+    Returns a detached copy: use it for checks, load the user again to modify it.
+    """
+    user = user_cache.get(username)
+    if user is not None:
+        return user
+
+    user = await get_user_by_username(db, username)
+    if user is None:
+        return None
+
+    user = _detached_user(user)
+    user_cache.set(username, user)
+    return user
+
+
+def invalidate_user_cache(username: Optional[str] = None) -> None:
+    """Сбросить кэш пользователя (вызывать после изменения роли или профиля)."""
+    user_cache.invalidate(username)
+
+
+async def get_user_from_token(db: AsyncSession, token: str) -> Optional[User]:
+    """Decode a JWT and return its user, or None if the token or user is invalid."""
+    try:
+        payload = jwt.decode(
+            token, settings.secret_key, algorithms=[settings.algorithm]
+        )
+        username: str = payload.get("sub")
+        if username is None:
+            return None
+        token_data = TokenData(username=username)
+    except JWTError:
+        return None
+
+    return await get_cached_user(db, token_data.username)
+
+
 async def authenticate_user(
     db: AsyncSession, username: str, password: str
 ) -> Optional[User]:
@@ -88,7 +164,10 @@ async def authenticate_user(
     user = await get_user_by_username(db, username)
     if not user:
         return None
-    if not verify_password(password, user.password_hash):
+    # У пользователей OAuth пароля нет - входить по паролю они не могут
+    if not user.password_hash or user.password_hash == UNUSABLE_PASSWORD_HASH:
+        return None
+    if not await verify_password_async(password, user.password_hash):
         return None
     return user
 
@@ -103,18 +182,7 @@ async def get_current_user(
         headers={"WWW-Authenticate": "Bearer"},
     )
 
-    try:
-        payload = jwt.decode(
-            token, settings.secret_key, algorithms=[settings.algorithm]
-        )
-        username: str = payload.get("sub")
-        if username is None:
-            raise credentials_exception
-        token_data = TokenData(username=username)
-    except JWTError:
-        raise credentials_exception
-
-    user = await get_user_by_username(db, username=token_data.username)
+    user = await get_user_from_token(db, token)
     if user is None:
         raise credentials_exception
 
@@ -35,12 +35,29 @@ class Settings(BaseSettings):
     # Telegram & SMTP settings
     telegram_bot_token: str = os.getenv("TELEGRAM_BOT_TOKEN", "")
     telegram_chat_id: str = os.getenv("TELEGRAM_CHAT_ID", "")
+    telegram_api_url: str = os.getenv("TELEGRAM_API_URL", "https://api.telegram.org")
+
+    # Telegram outbox: notifications are committed with the booking and sent by a dispatcher
+    telegram_poll_interval_seconds: float = float(os.getenv("TELEGRAM_POLL_INTERVAL_SECONDS", "5"))
+    telegram_max_attempts: int = int(os.getenv("TELEGRAM_MAX_ATTEMPTS", "8"))
+    telegram_retry_base_seconds: float = float(os.getenv("TELEGRAM_RETRY_BASE_SECONDS", "5"))
+    # Лимиты Bot API: ~30 сообщений в секунду всего и 20 в минуту в одну группу
+    telegram_messages_per_second: int = int(os.getenv("TELEGRAM_MESSAGES_PER_SECOND", "30"))
+    telegram_chat_messages_per_minute: int = int(
+        os.getenv("TELEGRAM_CHAT_MESSAGES_PER_MINUTE", "20")
+    )
+    telegram_outbox_retention_days: int = int(os.getenv("TELEGRAM_OUTBOX_RETENTION_DAYS", "7"))
     smtp_host: str = os.getenv("SMTP_HOST", "smtp.gmail.com")
     smtp_port: str = os.getenv("SMTP_PORT", "587")
     smtp_user: str = os.getenv("SMTP_USER", "")
     smtp_password: str = os.getenv("SMTP_PASSWORD", "")
     from_email: str = os.getenv("FROM_EMAIL", "")
     smtp_use_tls: str = os.getenv("SMTP_USE_TLS", "true")
+    # Email queue: background delivery with retries (1st retry after base, then x2)
+    email_queue_size: int = int(os.getenv("EMAIL_QUEUE_SIZE", "1000"))
+    email_max_attempts: int = int(os.getenv("EMAIL_MAX_ATTEMPTS", "4"))
+    email_retry_base_seconds: float = float(os.getenv("EMAIL_RETRY_BASE_SECONDS", "5"))
+    email_idle_timeout_seconds: float = float(os.getenv("EMAIL_IDLE_TIMEOUT_SECONDS", "60"))
 
     # YooKassa payment settings
     yookassa_shop_id: str = os.getenv("YOOKASSA_SHOP_ID", "")
@@ -49,6 +66,24 @@ class Settings(BaseSettings):
         "YOOKASSA_RETURN_URL", "http://localhost:3000/booking/success"
     )
     yookassa_test_mode: str = os.getenv("YOOKASSA_TEST_MODE", "true")
+    yookassa_api_url: str = os.getenv("YOOKASSA_API_URL", "https://api.yookassa.ru/v3")
+
+    # Payment intents: YooKassa payments are created by a background worker
+    payment_poll_interval_seconds: float = float(os.getenv("PAYMENT_POLL_INTERVAL_SECONDS", "2"))
+    payment_max_attempts: int = int(os.getenv("PAYMENT_MAX_ATTEMPTS", "5"))
+    payment_retry_base_seconds: float = float(os.getenv("PAYMENT_RETRY_BASE_SECONDS", "2"))
+    payment_worker_concurrency: int = int(os.getenv("PAYMENT_WORKER_CONCURRENCY", "4"))
+    payment_circuit_failure_threshold: int = int(os.getenv("PAYMENT_CIRCUIT_FAILURES", "5"))
+    payment_circuit_reset_seconds: float = float(os.getenv("PAYMENT_CIRCUIT_RESET_SECONDS", "30"))
+    # Reconciliation with the YooKassa payments list (webhooks that never arrived)
+    payment_reconcile_interval_seconds: int = int(
+        os.getenv("PAYMENT_RECONCILE_INTERVAL_SECONDS", "900")
+    )
+    payment_reconcile_lookback_hours: int = int(os.getenv("PAYMENT_RECONCILE_LOOKBACK_HOURS", "24"))
+
+    # YooKassa webhooks: in-process LRU of processed (payment id, event) pairs
+    webhook_dedup_ttl_seconds: int = int(os.getenv("WEBHOOK_DEDUP_TTL_SECONDS", str(24 * 3600)))
+    webhook_dedup_max_entries: int = int(os.getenv("WEBHOOK_DEDUP_MAX_ENTRIES", "10000"))
 
     # Yandex OAuth settings
     yandex_client_id: str = os.getenv("YANDEX_CLIENT_ID", "")
@@ -57,6 +92,30 @@ class Settings(BaseSettings):
         "YANDEX_REDIRECT_URI", "http://localhost:8000/api/auth/yandex/callback"
     )
     
+    # Booking holds: PENDING booking keeps its table while the guest is paying
+    booking_hold_minutes: int = int(os.getenv("BOOKING_HOLD_MINUTES", "15"))
+    hold_sweep_interval_seconds: int = int(
+        os.getenv("HOLD_SWEEP_INTERVAL_SECONDS", "60")
+    )
+
+    # In-process caches
+    restaurant_settings_ttl_seconds: int = int(os.getenv("SETTINGS_CACHE_TTL_SECONDS", "60"))
+    availability_cache_ttl_seconds: int = int(
+        os.getenv("AVAILABILITY_CACHE_TTL_SECONDS", "30")
+    )
+    menu_cache_ttl_seconds: int = int(os.getenv("MENU_CACHE_TTL_SECONDS", "300"))
+    user_cache_ttl_seconds: int = int(os.getenv("USER_CACHE_TTL_SECONDS", "30"))
+
+    # Image store: uploaded Base64 images are saved as files and served from media_base_url
+    media_root: str = os.getenv("MEDIA_ROOT", "media")
+    media_base_url: str = os.getenv("MEDIA_BASE_URL", "http://localhost:8000/api/media")
+    max_image_bytes: int = int(os.getenv("MAX_IMAGE_BYTES", str(10 * 1024 * 1024)))
+    image_workers: int = int(os.getenv("IMAGE_WORKERS", "2"))
+
+    # bcrypt runs in its own thread pool; extra calls wait in a bounded queue
+    password_hash_workers: int = int(os.getenv("PASSWORD_HASH_WORKERS", "2"))
+    password_hash_max_queue: int = int(os.getenv("PASSWORD_HASH_MAX_QUEUE", "32"))
+
     # Frontend URL for CORS and redirects
     frontend_url: str = os.getenv("FRONTEND_URL", "http://localhost:3000")
 
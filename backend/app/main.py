@@ -7,9 +7,18 @@ from fastapi.responses import JSONResponse
 from fastapi.exceptions import RequestValidationError
 from contextlib import asynccontextmanager
 import logging
-
-from app.database import init_db
-from app.routers import bookings, menu, tables, auth, admin, reviews
+import os
+
+from app.database import init_db, settings
+from app.routers import bookings, menu, tables, auth, admin, analytics, reviews
+from app.services.email_service import email_service
+from app.services.hold_sweeper import hold_sweeper
+from app.services.http_clients import http_clients
+from app.services.image_store import ImmutableStaticFiles, image_processor
+from app.services.password_hasher import password_hasher
+from app.services.payment_intents import payment_intent_worker
+from app.services.payment_reconciliation import payment_reconciler
+from app.services.telegram_outbox import telegram_dispatcher
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
@@ -18,10 +27,24 @@ logger = logging.getLogger(__name__)
 # Lifespan context for startup/shutdown events
 @asynccontextmanager
 async def lifespan(app: FastAPI):
-    """Initialize database on startup."""
+    """Initialize database and background workers on startup."""
     await init_db()
+    os.makedirs(settings.media_root, exist_ok=True)
+    http_clients.open()
+    hold_sweeper.start()
+    email_service.start()
+    payment_intent_worker.start()
+    telegram_dispatcher.start()
+    payment_reconciler.start()
     yield
-    # Cleanup if needed
+    await payment_reconciler.stop()
+    await telegram_dispatcher.stop()
+    await payment_intent_worker.stop()
+    await hold_sweeper.stop()
+    await email_service.stop()
+    image_processor.shutdown()
+    password_hasher.shutdown()
+    await http_clients.aclose()
 
 
 # Create FastAPI app
@@ -91,8 +114,16 @@ app.include_router(menu.router, prefix="/api")
 app.include_router(tables.router, prefix="/api")
 app.include_router(auth.router, prefix="/api")
 app.include_router(admin.router, prefix="/api")
+app.include_router(analytics.router, prefix="/api")
 app.include_router(reviews.router, prefix="/api")
 
+# Загруженные изображения (content-addressed, кэшируются браузером навсегда)
+app.mount(
+    "/api/media",
+    ImmutableStaticFiles(directory=settings.media_root, check_dir=False),
+    name="media",
+)
+
 
 @app.get("/")
 async def root():
@@ -12,10 +12,13 @@ from sqlalchemy import (
     DateTime,
     Float,
     ForeignKey,
+    Index,
     Integer,
     String,
     Text,
     Time,
+    UniqueConstraint,
+    text,
 )
 from sqlalchemy import Enum as SQLEnum
 from sqlalchemy.orm import relationship
@@ -41,6 +44,22 @@ class BookingStatus(str, enum.Enum):
     CANCELLED = "CANCELLED"
 
 
+class PaymentIntentStatus(str, enum.Enum):
+    """Payment intent status enum."""
+
+    PENDING = "PENDING"  # платеж в YooKassa еще создается
+    READY = "READY"  # ссылка на оплату получена
+    FAILED = "FAILED"  # попытки исчерпаны (выдана резервная ссылка) или бронь уже не ждет оплаты
+
+
+class OutboxStatus(str, enum.Enum):
+    """Telegram outbox message status enum."""
+
+    PENDING = "PENDING"  # ждет отправки (или повтора)
+    SENT = "SENT"
+    FAILED = "FAILED"  # попытки исчерпаны или Telegram отклонил сообщение
+
+
 class UserRole(str, enum.Enum):
     """User role enum."""
 
@@ -131,13 +150,163 @@ class Booking(Base):
     )
     deposit_amount = Column(Float, default=0.0, nullable=False)
     table_id = Column(Integer, ForeignKey("tables.id"), nullable=True)
+    # Для больших компаний: JSON-список соседних столов, сдвинутых к основному '[12, 13]'
+    extra_tables_json = Column(Text, nullable=True)
     user_id = Column(Integer, ForeignKey("users.id"), nullable=True, index=True)
     comment = Column(String, nullable=True)
+    # Платеж YooKassa по брони (для сверки с выгрузкой платежей)
+    payment_id = Column(String, nullable=True, index=True)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
 
     table = relationship("Table", back_populates="bookings")
     user = relationship("User", back_populates="bookings")
 
+    @property
+    def extra_table_ids(self):
+        import json
+
+        if not self.extra_tables_json:
+            return []
+        try:
+            return json.loads(self.extra_tables_json)
+        except ValueError:
+            return []
+
+    __table_args__ = (
+        # Занятость столов на дату: сетка доступности, валидация, автоподбор.
+        # Частичный (только брони со столом) и покрывающий для PostgreSQL.
+        Index(
+            "ix_bookings_date_status_table",
+            "date",
+            "status",
+            "table_id",
+            postgresql_include=["time", "created_at"],
+            postgresql_where=text("table_id IS NOT NULL"),
+            sqlite_where=text("table_id IS NOT NULL"),
+        ),
+        # Список броней (GET /bookings): курсор по (created_at, id) без фильтров,
+        # по статусу или по столу - порядок выдачи берется прямо из индекса.
+        Index("ix_bookings_created_at_id", "created_at", "id"),
+        Index("ix_bookings_status_created_at_id", "status", "created_at", "id"),
+        Index("ix_bookings_table_created_at_id", "table_id", "created_at", "id"),
+        # Поиск по началу номера телефона (LIKE 'prefix%') и брони пользователя по телефону
+        Index(
+            "ix_bookings_user_phone",
+            "user_phone",
+            postgresql_ops={"user_phone": "text_pattern_ops"},
+        ),
+    )
+
+
+class PaymentIntent(Base):
+    """
+    Намерение оплатить бронь: платеж в YooKassa создается фоновым воркером
+    (app.services.payment_intents), клиент получает ссылку через статус.
+    """
+
+    __tablename__ = "payment_intents"
+
+    id = Column(Integer, primary_key=True, index=True)
+    booking_id = Column(Integer, ForeignKey("bookings.id"), nullable=False, unique=True)
+    amount = Column(Float, nullable=False)
+    description = Column(String, nullable=False)
+    status = Column(
+        SQLEnum(PaymentIntentStatus), default=PaymentIntentStatus.PENDING, nullable=False
+    )
+    attempts = Column(Integer, default=0, nullable=False)
+    # Когда воркер может взять намерение (следующая попытка или окончание аренды)
+    next_attempt_at = Column(DateTime(timezone=True), nullable=False)
+    payment_id = Column(String, nullable=True)
+    confirmation_url = Column(Text, nullable=True)
+    last_error = Column(Text, nullable=True)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+
+    __table_args__ = (
+        # Выборка воркером: ожидающие намерения, у которых подошло время
+        Index("ix_payment_intents_status_next_attempt", "status", "next_attempt_at"),
+    )
+
+
+class TelegramOutbox(Base):
+    """
+    Уведомление в Telegram, записанное в той же транзакции, что и изменение
+    брони. Отправляет фоновый диспетчер (app.services.telegram_outbox).
+    """
+
+    __tablename__ = "telegram_outbox"
+
+    id = Column(Integer, primary_key=True, index=True)
+    # Одно событие - одно сообщение: повтор вебхука не создает дубль
+    dedup_key = Column(String, nullable=False, unique=True)
+    booking_id = Column(Integer, ForeignKey("bookings.id"), nullable=True)
+    chat_id = Column(String, nullable=False)
+    text = Column(Text, nullable=False)
+    status = Column(SQLEnum(OutboxStatus), default=OutboxStatus.PENDING, nullable=False)
+    attempts = Column(Integer, default=0, nullable=False)
+    # Когда диспетчер может взять сообщение (следующая попытка или окончание аренды)
+    next_attempt_at = Column(DateTime(timezone=True), nullable=False)
+    last_error = Column(Text, nullable=True)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    sent_at = Column(DateTime(timezone=True), nullable=True)
+
+    __table_args__ = (
+        Index("ix_telegram_outbox_status_next_attempt", "status", "next_attempt_at"),
+    )
+
+
+class PaymentWebhookEvent(Base):
+    """
+    Обработанное уведомление YooKassa: повторная доставка того же события
+    по тому же платежу не применяется второй раз (app.services.payment_webhooks).
+    """
+
+    __tablename__ = "payment_webhook_events"
+
+    id = Column(Integer, primary_key=True, index=True)
+    payment_id = Column(String, nullable=False)
+    event = Column(String, nullable=False)
+    # Без внешнего ключа: уведомление может прийти и по неизвестной брони
+    booking_id = Column(Integer, nullable=True)
+    received_at = Column(DateTime(timezone=True), server_default=func.now())
+
+    __table_args__ = (
+        UniqueConstraint("payment_id", "event", name="uq_payment_webhook_events_payment_event"),
+    )
+
+
+class BookingDailyStats(Base):
+    """
+    Дневная сводка броней по зоне и статусу (для статистики админки).
+    Поддерживается инкрементально при создании брони и смене статуса
+    (app.services.stats_service), поэтому отчеты не сканируют bookings.
+    """
+
+    __tablename__ = "booking_daily_stats"
+
+    date = Column(Date, primary_key=True)
+    # Значение Zone или NO_ZONE для броней без стола
+    zone = Column(String, primary_key=True)
+    status = Column(SQLEnum(BookingStatus), primary_key=True)
+    bookings_count = Column(Integer, default=0, nullable=False)
+    guests_total = Column(Integer, default=0, nullable=False)
+    deposits_total = Column(Float, default=0.0, nullable=False)
+
+
+class BookingAnalyticsDay(Base):
+    """
+    Посчитанная загрузка зала за закрытый (прошедший) день для аналитики:
+    занятые стол-минуты по зонам и часам. Прошлые дни не пересчитываются,
+    пока строку не удалит изменение брони этой даты.
+    """
+
+    __tablename__ = "booking_analytics_days"
+
+    date = Column(Date, primary_key=True)
+    # JSON: {"HALL_1": [стол-минуты за 0:00-1:00, ..., за 23:00-24:00], ...}
+    occupancy_json = Column(Text, nullable=False)
+    computed_at = Column(DateTime(timezone=True), server_default=func.now())
+
 
 class MenuCategory(Base):
     """Menu category model."""
@@ -165,8 +334,10 @@ class MenuItem(Base):
     price = Column(Float, nullable=False)
     weight = Column(Integer, nullable=False)  # in grams
 
-    # CHANGED: Используем Text для хранения длинных Base64 строк изображений
+    # URL основного (самого большого) варианта из хранилища изображений
     image_url = Column(Text, nullable=True)
+    # JSON: [{"url": ..., "width": 320}, ...] - WebP-варианты по возрастанию ширины
+    image_variants_json = Column(Text, nullable=True)
 
     category_id = Column(Integer, ForeignKey("menu_categories.id"), nullable=False)
     is_spicy = Column(Boolean, default=False, nullable=False)
@@ -175,6 +346,20 @@ class MenuItem(Base):
     # Relationships
     category = relationship("MenuCategory", back_populates="items")
 
+    @property
+    def image_srcset(self):
+        import json
+
+        from app.services.image_store import build_srcset
+
+        if not self.image_variants_json:
+            return None
+        try:
+            variants = json.loads(self.image_variants_json)
+        except ValueError:
+            return None
+        return build_srcset(variants) or None
+
 
 class Review(Base):
     __tablename__ = "reviews"
@@ -184,8 +369,10 @@ class Review(Base):
     rating = Column(Integer, nullable=False)
     text = Column(Text, nullable=True)  # Text может быть пустым
 
-    # Храним JSON строку: '["base64...", "base64..."]'
+    # Храним JSON строку: '["url...", "url..."]' (старые отзывы - Base64)
     images_json = Column(Text, nullable=True)
+    # JSON: для каждой картинки список WebP-вариантов [{"url", "width"}] или null
+    image_variants_json = Column(Text, nullable=True)
 
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     is_approved = Column(Boolean, default=True, nullable=False)
@@ -1,14 +1,34 @@
 """
 Admin router - handles admin panel statistics and management.
 """
-from fastapi import APIRouter, Depends
+from datetime import date
+from typing import List, Optional
+
+from fastapi import APIRouter, Depends, HTTPException, Query, status
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, func
+from sqlalchemy import select
+from zoneinfo import ZoneInfo
 
 from app.database import get_db
-from app.models import Booking, BookingStatus, User
-from app.schemas import StatsResponse
+from app.models import RestaurantSettings, User, Zone
+from app.schemas import (
+    DailyStats,
+    RestaurantSettingsRead,
+    RestaurantSettingsUpdate,
+    StatsResponse,
+    WeekdayStats,
+    ZoneStats,
+)
 from app.auth import get_current_admin_user
+from app.services.analytics_service import reset_analytics_days
+from app.services.booking_service import get_settings, invalidate_settings_cache
+from app.services.password_hasher import password_hasher
+from app.services.stats_service import (
+    get_daily_stats,
+    get_overall_stats,
+    get_weekday_stats,
+    get_zone_stats,
+)
 
 router = APIRouter(prefix="/admin", tags=["admin"])
 
@@ -20,53 +40,117 @@ async def get_stats(
 ):
     """
     Get statistics for admin panel.
-    Returns total deposits, guest count, and booking counts by status.
+    Returns total deposits, guest count, and booking counts by status
+    (one grouped query over bookings).
     """
-    # Total deposits (only confirmed bookings)
-    deposits_result = await db.execute(
-        select(func.sum(Booking.deposit_amount))
-        .where(Booking.status == BookingStatus.CONFIRMED)
-    )
-    total_deposits = deposits_result.scalar() or 0.0
-    
-    # Total guests
-    guests_result = await db.execute(
-        select(func.sum(Booking.guest_count))
-        .where(Booking.status == BookingStatus.CONFIRMED)
-    )
-    total_guests = guests_result.scalar() or 0
-    
-    # Total bookings
-    total_result = await db.execute(select(func.count(Booking.id)))
-    total_bookings = total_result.scalar() or 0
-    
-    # Confirmed bookings
-    confirmed_result = await db.execute(
-        select(func.count(Booking.id))
-        .where(Booking.status == BookingStatus.CONFIRMED)
-    )
-    confirmed_bookings = confirmed_result.scalar() or 0
-    
-    # Pending bookings
-    pending_result = await db.execute(
-        select(func.count(Booking.id))
-        .where(Booking.status == BookingStatus.PENDING)
-    )
-    pending_bookings = pending_result.scalar() or 0
-    
-    # Cancelled bookings
-    cancelled_result = await db.execute(
-        select(func.count(Booking.id))
-        .where(Booking.status == BookingStatus.CANCELLED)
-    )
-    cancelled_bookings = cancelled_result.scalar() or 0
-    
-    return StatsResponse(
-        total_deposits=float(total_deposits),
-        total_guests=total_guests,
-        total_bookings=total_bookings,
-        confirmed_bookings=confirmed_bookings,
-        pending_bookings=pending_bookings,
-        cancelled_bookings=cancelled_bookings
-    )
+    return StatsResponse(**await get_overall_stats(db))
+
+
+# Максимальная длина диапазона для отчетов по сводке (год)
+MAX_STATS_RANGE_DAYS = 366
+
+
+def _check_stats_range(date_from: date, date_to: date) -> None:
+    if date_to < date_from:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Дата окончания диапазона раньше даты начала",
+        )
+    if (date_to - date_from).days + 1 > MAX_STATS_RANGE_DAYS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Диапазон не может превышать {MAX_STATS_RANGE_DAYS} дней",
+        )
+
+
+@router.get("/stats/daily", response_model=List[DailyStats])
+async def get_daily_stats_view(
+    date_from: date = Query(..., alias="from"),
+    date_to: date = Query(..., alias="to"),
+    zone: Optional[Zone] = Query(None),
+    db: AsyncSession = Depends(get_db),
+    current_user: User = Depends(get_current_admin_user)
+):
+    """Statistics per booking date (days without bookings are omitted)."""
+    _check_stats_range(date_from, date_to)
+    return await get_daily_stats(db, date_from, date_to, zone)
+
+
+@router.get("/stats/zones", response_model=List[ZoneStats])
+async def get_zone_stats_view(
+    date_from: date = Query(..., alias="from"),
+    date_to: date = Query(..., alias="to"),
+    db: AsyncSession = Depends(get_db),
+    current_user: User = Depends(get_current_admin_user)
+):
+    """Statistics per hall zone for a date range."""
+    _check_stats_range(date_from, date_to)
+    return await get_zone_stats(db, date_from, date_to)
+
+
+@router.get("/stats/weekdays", response_model=List[WeekdayStats])
+async def get_weekday_stats_view(
+    date_from: date = Query(..., alias="from"),
+    date_to: date = Query(..., alias="to"),
+    zone: Optional[Zone] = Query(None),
+    db: AsyncSession = Depends(get_db),
+    current_user: User = Depends(get_current_admin_user)
+):
+    """Statistics per weekday (0 - Monday) for a date range."""
+    _check_stats_range(date_from, date_to)
+    return await get_weekday_stats(db, date_from, date_to, zone)
+
+
+@router.get("/metrics")
+async def get_metrics(current_user: User = Depends(get_current_admin_user)):
+    """Runtime metrics of this worker (bcrypt pool queue and wait times)."""
+    return {"password_hasher": password_hasher.metrics()}
+
+
+@router.get("/settings", response_model=RestaurantSettingsRead)
+async def get_restaurant_settings(
+    db: AsyncSession = Depends(get_db),
+    current_user: User = Depends(get_current_admin_user)
+):
+    """Get restaurant booking settings (Admin only)."""
+    return await get_settings(db)
+
+
+@router.put("/settings", response_model=RestaurantSettingsRead)
+async def update_restaurant_settings(
+    settings_data: RestaurantSettingsUpdate,
+    db: AsyncSession = Depends(get_db),
+    current_user: User = Depends(get_current_admin_user)
+):
+    """
+    Update restaurant booking settings (Admin only).
+    Resets the settings cache of this worker; other workers pick up
+    the change when their cache entry expires.
+    """
+    try:
+        ZoneInfo(settings_data.timezone)
+    except Exception:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Неизвестный часовой пояс: {settings_data.timezone}"
+        )
+
+    result = await db.execute(select(RestaurantSettings))
+    restaurant_settings = result.scalar_one_or_none()
+
+    if not restaurant_settings:
+        restaurant_settings = RestaurantSettings()
+        db.add(restaurant_settings)
+
+    if restaurant_settings.booking_duration_hours != settings_data.booking_duration_hours:
+        # Сохраненная загрузка прошлых дней посчитана со старой длительностью брони
+        await reset_analytics_days(db)
+
+    for field, value in settings_data.model_dump().items():
+        setattr(restaurant_settings, field, value)
+
+    await db.commit()
+    await db.refresh(restaurant_settings)
+    invalidate_settings_cache()
 
+    return restaurant_settings
@@ -0,0 +1,65 @@
+"""
+Analytics router - occupancy heatmaps and revenue series for the admin panel.
+"""
+from datetime import date
+from typing import List, Optional
+
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.auth import get_current_admin_user
+from app.database import get_db
+from app.models import User, Zone
+from app.schemas import OccupancyHeatmapResponse, RevenuePoint
+from app.services.analytics_service import (
+    RevenueBucket,
+    get_occupancy_heatmap,
+    get_revenue_series,
+)
+
+router = APIRouter(prefix="/analytics", tags=["analytics"])
+
+# Максимальная длина диапазона аналитики (два года)
+MAX_ANALYTICS_RANGE_DAYS = 731
+
+
+def _check_range(date_from: date, date_to: date) -> None:
+    if date_to < date_from:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Дата окончания диапазона раньше даты начала",
+        )
+    if (date_to - date_from).days + 1 > MAX_ANALYTICS_RANGE_DAYS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Диапазон не может превышать {MAX_ANALYTICS_RANGE_DAYS} дней",
+        )
+
+
+@router.get("/occupancy", response_model=OccupancyHeatmapResponse)
+async def get_occupancy(
+    date_from: date = Query(..., alias="from"),
+    date_to: date = Query(..., alias="to"),
+    db: AsyncSession = Depends(get_db),
+    current_user: User = Depends(get_current_admin_user)
+):
+    """
+    Occupancy heatmap (zone x weekday x hour) from confirmed bookings.
+    Past days are computed once and stored.
+    """
+    _check_range(date_from, date_to)
+    return await get_occupancy_heatmap(db, date_from, date_to)
+
+
+@router.get("/revenue", response_model=List[RevenuePoint])
+async def get_revenue(
+    date_from: date = Query(..., alias="from"),
+    date_to: date = Query(..., alias="to"),
+    bucket: RevenueBucket = Query(RevenueBucket.WEEK),
+    zone: Optional[Zone] = Query(None),
+    db: AsyncSession = Depends(get_db),
+    current_user: User = Depends(get_current_admin_user)
+):
+    """Deposit revenue of confirmed bookings per day, week or month."""
+    _check_range(date_from, date_to)
+    return await get_revenue_series(db, date_from, date_to, bucket, zone)
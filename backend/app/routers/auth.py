@@ -16,10 +16,12 @@ from app.schemas import (
 )
 from app.auth import (
     authenticate_user, create_access_token, get_current_user,
-    get_password_hash, get_user_by_username
+    get_password_hash_async, get_user_by_username, invalidate_user_cache,
+    UNUSABLE_PASSWORD_HASH
 )
 from app.models import User, EmailVerificationCode, UserRole
 from app.services.email_service import email_service
+from app.services.http_clients import YANDEX_OAUTH, http_clients
 
 router = APIRouter(prefix="/auth", tags=["auth"])
 
@@ -106,15 +108,8 @@ async def request_email_verification(
     db.add(verification_code)
     await db.commit()
     
-    # Send email (non-blocking, don't fail if email sending fails)
-    try:
-        await email_service.send_verification_code(email, code)
-    except Exception as e:
-        # Log error but don't fail the request
-        import logging
-        logger = logging.getLogger(__name__)
-        logger.error(f"Failed to send email: {str(e)}")
-        logger.info(f"Verification code for {email}: {code}")
+    # Письмо уходит в фоне: ответ не ждет SMTP, ошибки отправки логируются воркером
+    email_service.enqueue_verification_code(email, code)
     
     return {
         "message": "Код подтверждения отправлен на email",
@@ -173,7 +168,7 @@ async def register_user(
     verification_code.is_used = True
     
     # Create user
-    password_hash = get_password_hash(user_data.password)
+    password_hash = await get_password_hash_async(user_data.password)
     new_user = User(
         username=user_data.username,
         password_hash=password_hash,
@@ -230,7 +225,6 @@ async def yandex_callback(
     Handle Yandex OAuth callback.
     Exchange code for token, get user info, create/find user, return JWT.
     """
-    import httpx
     from fastapi.responses import RedirectResponse
     
     if error:
@@ -241,39 +235,39 @@ async def yandex_callback(
     
     # Exchange code for access token
     try:
-        async with httpx.AsyncClient() as client:
-            token_response = await client.post(
-                "https://oauth.yandex.ru/token",
-                data={
-                    "grant_type": "authorization_code",
-                    "code": code,
-                    "client_id": settings.yandex_client_id,
-                    "client_secret": settings.yandex_client_secret,
-                },
-                headers={"Content-Type": "application/x-www-form-urlencoded"}
+        client = http_clients.get(YANDEX_OAUTH)
+        token_response = await client.post(
+            "https://oauth.yandex.ru/token",
+            data={
+                "grant_type": "authorization_code",
+                "code": code,
+                "client_id": settings.yandex_client_id,
+                "client_secret": settings.yandex_client_secret,
+            },
+            headers={"Content-Type": "application/x-www-form-urlencoded"}
+        )
+
+        if token_response.status_code != 200:
+            return RedirectResponse(
+                url=f"{settings.frontend_url}/?auth_error=token_exchange_failed"
             )
-            
-            if token_response.status_code != 200:
-                return RedirectResponse(
-                    url=f"{settings.frontend_url}/?auth_error=token_exchange_failed"
-                )
-            
-            token_data = token_response.json()
-            yandex_access_token = token_data.get("access_token")
-            
-            # Get user info from Yandex
-            user_response = await client.get(
-                "https://login.yandex.ru/info",
-                headers={"Authorization": f"OAuth {yandex_access_token}"}
+
+        token_data = token_response.json()
+        yandex_access_token = token_data.get("access_token")
+
+        # Get user info from Yandex
+        user_response = await client.get(
+            "https://login.yandex.ru/info",
+            headers={"Authorization": f"OAuth {yandex_access_token}"}
+        )
+
+        if user_response.status_code != 200:
+            return RedirectResponse(
+                url=f"{settings.frontend_url}/?auth_error=user_info_failed"
             )
-            
-            if user_response.status_code != 200:
-                return RedirectResponse(
-                    url=f"{settings.frontend_url}/?auth_error=user_info_failed"
-                )
-            
-            yandex_user = user_response.json()
-            
+
+        yandex_user = user_response.json()
+
     except Exception as e:
         import logging
         logger = logging.getLogger(__name__)
@@ -300,20 +294,17 @@ async def yandex_callback(
                 user.yandex_id = str(yandex_id)
                 user.oauth_provider = "yandex"
                 await db.commit()
+                invalidate_user_cache(user.username)
     
     if not user:
         # Create new user
         # Generate unique username from yandex_id
         username = f"yandex_{yandex_id}"
         
-        # Generate a random password hash for OAuth users
-        # (They won't use password login, but DB has NOT NULL constraint)
-        import secrets
-        random_password = secrets.token_urlsafe(32)
-        
+        # OAuth users have no password: password login is impossible for them
         user = User(
             username=username,
-            password_hash=get_password_hash(random_password),
+            password_hash=UNUSABLE_PASSWORD_HASH,
             email=yandex_email.lower() if yandex_email else None,
             name=yandex_name,
             role=UserRole.USER,
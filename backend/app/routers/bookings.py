@@ -2,33 +2,66 @@
 Booking router - handles booking creation, availability checks, and webhooks.
 """
 
-from datetime import date, time
-from typing import List
-
-from fastapi import APIRouter, Depends, HTTPException, Query, Request, Security, status
-from fastapi.responses import JSONResponse
+import asyncio
+import base64
+import json
+from datetime import date, datetime, time
+from typing import List, Optional, Tuple
+
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response, Security, status
+from fastapi.responses import JSONResponse, StreamingResponse
 from fastapi.security import HTTPAuthorizationCredentials, HTTPBearer
-from sqlalchemy import desc, select
+from sqlalchemy import desc, func, or_, select, tuple_
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from app.auth import get_current_admin_user, get_current_user
-from app.database import get_db
-from app.models import Booking, BookingStatus, Table, User, UserRole
+from app.auth import get_current_admin_user, get_current_user, get_user_from_token
+from app.database import AsyncSessionLocal, get_db
+from app.models import (
+    Booking,
+    BookingStatus,
+    PaymentIntent,
+    PaymentIntentStatus,
+    Table,
+    User,
+    UserRole,
+    Zone,
+)
 from app.schemas import (
     BookingCreate,
     BookingPaymentResponse,
     BookingRead,
     BookingWebhookRequest,
     DateAvailabilityResponse,
+    PaymentStatusResponse,
+    RangeAvailabilityResponse,
 )
 from app.services.booking_service import (
+    booking_date_lock,
+    build_day_occupancy,
     calculate_deposit_amount,
-    find_available_table,
+    confirming_booking,
+    find_available_tables,
     get_day_availability,
+    get_range_availability,
+    invalidate_availability_cache,
+    transition_booking_status,
     validate_booking_request,
 )
+from app.services.payment_intents import add_payment_intent, payment_intent_worker
 from app.services.payment_service import payment_service
-from app.services.telegram_service import send_booking_notification
+from app.services.payment_webhooks import (
+    claim_webhook_event,
+    is_processed,
+    remember_processed,
+    webhook_event_lock,
+)
+from app.services.stats_service import booking_facts, record_booking_change
+from app.services.telegram_outbox import (
+    enqueue_booking_notification,
+    enqueue_booking_update_notification,
+    enqueue_payment_review_alert,
+    telegram_dispatcher,
+)
 
 router = APIRouter(prefix="/bookings", tags=["bookings"])
 
@@ -43,23 +76,7 @@ async def get_current_user_optional(
     if not credentials:
         return None
     try:
-        from jose import jwt
-
-        from app.auth import get_user_by_username
-        from app.database import settings
-        from app.schemas import TokenData
-
-        payload = jwt.decode(
-            credentials.credentials,
-            settings.secret_key,
-            algorithms=[settings.algorithm],
-        )
-        username: str = payload.get("sub")
-        if username is None:
-            return None
-        token_data = TokenData(username=username)
-        user = await get_user_by_username(db, username=token_data.username)
-        return user
+        return await get_user_from_token(db, credentials.credentials)
     except Exception:
         return None
 
@@ -67,7 +84,7 @@ async def get_current_user_optional(
 @router.get("/availability/{date_str}", response_model=DateAvailabilityResponse)
 async def get_date_availability(
     date_str: date,
-    guest_count: int = Query(2, ge=1, le=12),
+    guest_count: int = Query(2, ge=1, le=20),
     db: AsyncSession = Depends(get_db),
 ):
     """
@@ -80,6 +97,38 @@ async def get_date_availability(
     return await get_day_availability(db, date_str, guest_count)
 
 
+# Максимальная длина диапазона для календаря (два месяца)
+MAX_AVAILABILITY_RANGE_DAYS = 62
+
+
+@router.get("/availability", response_model=RangeAvailabilityResponse)
+async def get_range_availability_view(
+    date_from: date = Query(..., alias="from"),
+    date_to: date = Query(..., alias="to"),
+    guest_count: int = Query(2, ge=1, le=20),
+    include_slots: bool = Query(False, description="Include full slot grid per day"),
+    db: AsyncSession = Depends(get_db),
+):
+    """
+    Get availability summary for a date range (calendar shading).
+    All bookings of the window are fetched with a single query.
+    """
+    if date_to < date_from:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Дата окончания диапазона раньше даты начала",
+        )
+    if (date_to - date_from).days + 1 > MAX_AVAILABILITY_RANGE_DAYS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Диапазон не может превышать {MAX_AVAILABILITY_RANGE_DAYS} дней",
+        )
+
+    return await get_range_availability(
+        db, date_from, date_to, guest_count, include_slots
+    )
+
+
 @router.post(
     "", response_model=BookingPaymentResponse, status_code=status.HTTP_201_CREATED
 )
@@ -95,7 +144,7 @@ async def create_booking(
     2. Checks table availability (intervals).
     3. Auto-selects table if not provided.
     4. Links booking to user if authenticated.
-    5. Returns payment link.
+    5. Queues the payment; the link comes from /bookings/{id}/payment (or its SSE stream).
     """
     import logging
 
@@ -106,90 +155,92 @@ async def create_booking(
         if current_user:
             logger.info(f"Authenticated user: {current_user.id} ({current_user.username})")
 
-        # 1. Strict Business Logic Validation
-        logger.info("Starting validation...")
-        try:
-            await validate_booking_request(db, booking_data)
-            logger.info("Validation passed")
-        except ValueError as e:
-            error_message = str(e)
-            logger.error(f"Validation failed: {error_message}")
-            raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                detail=error_message
-            )
-        except Exception as e:
-            logger.error(f"Validation Unexpected Error: {type(e)} - {e}")
-            raise
-
-        # 2. Table Selection Logic
-        final_table_id = booking_data.table_id
-
-        if not final_table_id:
-            # Auto-select available table
-            final_table_id = await find_available_table(
-                db, booking_data.date, booking_data.time, booking_data.guest_count
-            )
-
-            if not final_table_id:
+        async with booking_date_lock(db, booking_data.date):
+            # Индекс занятости строится один раз и используется
+            # и валидацией, и автоподбором стола. Проверка и вставка идут
+            # под локом на дату: параллельные брони не получат один стол.
+            occupancy = await build_day_occupancy(db, booking_data.date)
+
+            # 1. Strict Business Logic Validation
+            logger.info("Starting validation...")
+            try:
+                await validate_booking_request(db, booking_data, occupancy)
+                logger.info("Validation passed")
+            except ValueError as e:
+                error_message = str(e)
+                logger.error(f"Validation failed: {error_message}")
                 raise HTTPException(
-                    status_code=status.HTTP_409_CONFLICT,
-                    detail="К сожалению, на это время все подходящие столы заняты.",
+                    status_code=status.HTTP_400_BAD_REQUEST,
+                    detail=error_message
+                )
+            except Exception as e:
+                logger.error(f"Validation Unexpected Error: {type(e)} - {e}")
+                raise
+
+            # 2. Table Selection Logic
+            table_ids = [booking_data.table_id] if booking_data.table_id else None
+
+            if not table_ids:
+                # Auto-select available table (or neighbouring tables for a large party)
+                table_ids = await find_available_tables(
+                    db,
+                    booking_data.date,
+                    booking_data.time,
+                    booking_data.guest_count,
+                    occupancy,
+                    booking_data.preferred_zone,
                 )
 
-        # 3. Calculate deposit
-        deposit_amount = calculate_deposit_amount(booking_data.guest_count)
-
-        # 4. Create booking record with user_id if authenticated
-        booking = Booking(
-            user_name=booking_data.user_name,
-            user_phone=booking_data.user_phone,
-            date=booking_data.date,
-            time=booking_data.time,
-            guest_count=booking_data.guest_count,
-            table_id=final_table_id,
-            user_id=current_user.id if current_user else None,
-            comment=booking_data.comment,
-            status=BookingStatus.PENDING,
-            deposit_amount=deposit_amount,
-        )
+                if not table_ids:
+                    raise HTTPException(
+                        status_code=status.HTTP_409_CONFLICT,
+                        detail="К сожалению, на это время все подходящие столы заняты.",
+                    )
 
-        db.add(booking)
-        await db.commit()
-        await db.refresh(booking)
-
-        # 5. Create payment in YooKassa
-        payment_url = ""
-        try:
-            description = f"Бронирование стола на {booking_data.date.strftime('%d.%m.%Y')} в {booking_data.time.strftime('%H:%M')} для {booking_data.guest_count} гостей"
-
-            # Assuming payment_service is configured
-            payment_info = await payment_service.create_payment(
-                amount=deposit_amount,
-                booking_id=booking.id,
-                description=description,
-                customer_phone=booking_data.user_phone,
-                customer_name=booking_data.user_name,
+            # 3. Calculate deposit
+            deposit_amount = calculate_deposit_amount(booking_data.guest_count)
+
+            # 4. Create booking record with user_id if authenticated
+            booking = Booking(
+                user_name=booking_data.user_name,
+                user_phone=booking_data.user_phone,
+                date=booking_data.date,
+                time=booking_data.time,
+                guest_count=booking_data.guest_count,
+                table_id=table_ids[0],
+                extra_tables_json=json.dumps(table_ids[1:]) if len(table_ids) > 1 else None,
+                user_id=current_user.id if current_user else None,
+                comment=booking_data.comment,
+                status=BookingStatus.PENDING,
+                deposit_amount=deposit_amount,
             )
 
-            confirmation = payment_info.get("confirmation", {})
-            payment_url = confirmation.get("confirmation_url", "")
+            db.add(booking)
+            await db.flush()
+            await record_booking_change(db, None, booking_facts(booking))
 
-            if not payment_url:
-                logger.warning(
-                    f"No confirmation URL in payment response: {payment_info}"
-                )
-                payment_url = f"https://yookassa.ru/payment?booking_id={booking.id}&amount={deposit_amount}"
+            # Намерение оплаты коммитится вместе с бронью: воркер не потеряет платеж
+            add_payment_intent(
+                db,
+                booking,
+                f"Бронирование стола на {booking_data.date.strftime('%d.%m.%Y')} "
+                f"в {booking_data.time.strftime('%H:%M')} для {booking_data.guest_count} гостей",
+            )
+            await db.commit()
+            await db.refresh(booking)
+
+        # Новая бронь PENDING держит стол на время оплаты
+        invalidate_availability_cache(booking.date)
 
-        except Exception as payment_error:
-            logger.error(f"Failed to create payment in YooKassa: {str(payment_error)}")
-            # Fallback URL for testing or manual handling
-            payment_url = f"https://yookassa.ru/payment?booking_id={booking.id}&amount={deposit_amount}"
+        # 5. Payment is created in YooKassa by the background worker
+        payment_intent_worker.notify()
 
         return BookingPaymentResponse(
-            booking_id=booking.id, 
-            payment_url=payment_url, 
-            status=booking.status
+            booking_id=booking.id,
+            status=booking.status,
+            payment_status=PaymentIntentStatus.PENDING,
+            payment_status_url=f"/api/bookings/{booking.id}/payment",
+            payment_events_url=f"/api/bookings/{booking.id}/payment/events",
         )
 
     except HTTPException:
@@ -227,53 +278,105 @@ async def yookassa_webhook(request: Request, db: AsyncSession = Depends(get_db))
         payment_status = payment_object.get("status")
         metadata = payment_object.get("metadata", {})
         booking_id = metadata.get("booking_id")
+        event = webhook_data.get("event")
 
         if not booking_id:
             return {"status": "ok", "message": "No booking_id in metadata"}
 
         booking_id = int(booking_id)
 
-        result = await db.execute(select(Booking).where(Booking.id == booking_id))
-        booking = result.scalar_one_or_none()
-
-        if not booking:
-            return {"status": "ok", "message": "Booking not found"}
+        # Повторная доставка: отвечаем сразу, бронь не читаем
+        if payment_id and is_processed(payment_id, event):
+            return {"status": "ok", "message": "Duplicate webhook"}
+        # Claim и изменение брони - одна транзакция; на SQLite вебхуки пишут по очереди
+        async with webhook_event_lock():
+            if payment_id and not await claim_webhook_event(db, payment_id, event, booking_id):
+                await db.rollback()
+                remember_processed(payment_id, event)
+                return {"status": "ok", "message": "Duplicate webhook"}
 
-        event = webhook_data.get("event")
+            result = await db.execute(select(Booking).where(Booking.id == booking_id))
+            booking = result.scalar_one_or_none()
 
-        if event == "payment.succeeded" and payment_status == "succeeded":
-            if booking.status != BookingStatus.CONFIRMED:
-                booking.status = BookingStatus.CONFIRMED
+            if not booking:
                 await db.commit()
-                await db.refresh(booking)
-
-                # Get table info for notification
-                table = None
-                if booking.table_id:
-                    result = await db.execute(
-                        select(Table).where(Table.id == booking.table_id)
+                return {"status": "ok", "message": "Booking not found"}
+
+            if payment_id and booking.payment_id is None:
+                booking.payment_id = payment_id
+
+            if event == "payment.succeeded" and payment_status == "succeeded":
+                # Истекший холд подтверждается только под локом даты, если стол свободен
+                async with confirming_booking(db, booking) as confirmed:
+                    if confirmed:
+                        # Get table info for notification
+                        table = None
+                        if booking.table_id:
+                            result = await db.execute(
+                                select(Table).where(Table.id == booking.table_id)
+                            )
+                            table = result.scalar_one_or_none()
+
+                        # Уведомление фиксируется вместе со статусом, отправит диспетчер
+                        await enqueue_booking_notification(db, booking, table)
+                    elif booking.status != BookingStatus.CONFIRMED and payment_id:
+                        # Оплата пришла после отмены или стол истекшего холда уже занят:
+                        # платеж сохраняется у брони, админам уходит алерт на возврат
+                        booking.payment_id = payment_id
+                        await enqueue_payment_review_alert(
+                            db,
+                            booking.id,
+                            payment_id,
+                            "бронь отменена"
+                            if booking.status == BookingStatus.CANCELLED
+                            else "стол занят после истечения холда",
+                        )
+                    await db.commit()
+                if payment_id:
+                    remember_processed(payment_id, event)
+
+                if booking.status != BookingStatus.CONFIRMED:
+                    logger.error(
+                        f"Payment {payment_id} succeeded for unconfirmed booking {booking_id}, "
+                        f"needs review"
+                    )
+                    telegram_dispatcher.notify()
+                    return {"status": "needs_review", "message": "Оплата требует разбора"}
+
+                if confirmed:
+                    invalidate_availability_cache(booking.date)
+                    telegram_dispatcher.notify()
+                    logger.info(
+                        f"Booking {booking_id} confirmed via YooKassa payment {payment_id}"
                     )
-                    table = result.scalar_one_or_none()
-
-                await send_booking_notification(booking, table)
-                logger.info(
-                    f"Booking {booking_id} confirmed via YooKassa payment {payment_id}"
-                )
 
-            return {"status": "confirmed", "message": "Бронирование подтверждено"}
+                return {"status": "confirmed", "message": "Бронирование подтверждено"}
 
-        elif event == "payment.canceled" or payment_status == "canceled":
-            booking.status = BookingStatus.CANCELLED
-            await db.commit()
-            return {"status": "cancelled", "message": "Платеж отменен"}
-        else:
-            return {"status": "ok", "message": f"Payment status: {payment_status}"}
+            elif event == "payment.canceled" or payment_status == "canceled":
+                cancelled = await transition_booking_status(db, booking, BookingStatus.CANCELLED)
+                await db.commit()
+                if payment_id:
+                    remember_processed(payment_id, event)
+
+                if cancelled:
+                    invalidate_availability_cache(booking.date)
+                elif booking.status == BookingStatus.CONFIRMED:
+                    # Запоздавшая отмена не снимает подтвержденную бронь
+                    return {"status": "ignored", "message": "Бронирование уже подтверждено"}
+                return {"status": "cancelled", "message": "Платеж отменен"}
+            else:
+                await db.rollback()
+                return {"status": "ok", "message": f"Payment status: {payment_status}"}
 
     except HTTPException:
         raise
     except Exception as e:
         logger.error(f"Error processing YooKassa webhook: {str(e)}", exc_info=True)
-        return {"status": "error", "message": str(e)}
+        # Не 200: YooKassa повторит доставку, повтор безопасен (payment_webhook_events)
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="Ошибка обработки webhook",
+        )
 
 
 @router.post("/{booking_id}/webhook", status_code=status.HTTP_200_OK)
@@ -292,66 +395,131 @@ async def booking_webhook(
         raise HTTPException(status_code=404, detail="Booking not found")
 
     if webhook_data.payment_status == "success":
-        booking.status = BookingStatus.CONFIRMED
-        await db.commit()
-        await db.refresh(booking)
+        async with confirming_booking(db, booking) as confirmed:
+            if not confirmed:
+                return {"status": booking.status.value.lower()}
 
-        table = None
-        if booking.table_id:
-            result = await db.execute(select(Table).where(Table.id == booking.table_id))
-            table = result.scalar_one_or_none()
+            table = None
+            if booking.table_id:
+                result = await db.execute(select(Table).where(Table.id == booking.table_id))
+                table = result.scalar_one_or_none()
 
-        await send_booking_notification(booking, table)
+            await enqueue_booking_notification(db, booking, table)
+            await db.commit()
+        invalidate_availability_cache(booking.date)
+        telegram_dispatcher.notify()
         return {"status": "confirmed"}
 
     elif webhook_data.payment_status == "failed":
-        booking.status = BookingStatus.CANCELLED
+        if not await transition_booking_status(db, booking, BookingStatus.CANCELLED):
+            return {"status": booking.status.value.lower()}
         await db.commit()
+        invalidate_availability_cache(booking.date)
         return {"status": "cancelled"}
 
     return {"status": "unknown"}
 
 
+# Постраничная выдача списка броней (админка, профиль пользователя)
+DEFAULT_BOOKINGS_PAGE_SIZE = 50
+MAX_BOOKINGS_PAGE_SIZE = 200
+
+
+def _encode_cursor(created_at: datetime, booking_id: int) -> str:
+    """Opaque cursor pointing at the last booking of a page."""
+    raw = f"{created_at.isoformat()}|{booking_id}".encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def _decode_cursor(cursor: str) -> Tuple[datetime, int]:
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode()
+        created_at, booking_id = raw.rsplit("|", 1)
+        return datetime.fromisoformat(created_at), int(booking_id)
+    except ValueError:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Некорректный курсор",
+        )
+
+
 @router.get("", response_model=List[BookingRead])
 async def get_bookings(
+    response: Response,
+    limit: int = Query(DEFAULT_BOOKINGS_PAGE_SIZE, ge=1, le=MAX_BOOKINGS_PAGE_SIZE),
+    cursor: Optional[str] = Query(None, description="X-Next-Cursor of the previous page"),
+    date_from: Optional[date] = Query(None, description="Booking date, inclusive"),
+    date_to: Optional[date] = Query(None, description="Booking date, inclusive"),
+    status_filter: Optional[List[BookingStatus]] = Query(None, alias="status"),
+    table_id: Optional[int] = Query(None),
+    zone: Optional[Zone] = Query(None),
+    phone: Optional[str] = Query(None, min_length=3, description="Phone number prefix"),
     db: AsyncSession = Depends(get_db),
     current_user: User | None = Depends(get_current_user_optional),
 ):
     """
-    Get all bookings with table_number.
+    Get bookings with table_number, newest first, one page at a time.
     Admin sees all, User sees own (by user_id), Guest sees none.
+
+    Keyset pagination over (created_at, id): pass the X-Next-Cursor header
+    of a page as ?cursor= to get the next one (no header on the last page).
+    X-Total-Count is the number of bookings matching the filters.
     """
     if not current_user:
         return []
 
-    query = select(Booking).order_by(desc(Booking.created_at))
+    after = _decode_cursor(cursor) if cursor else None
 
+    filters = []
     if current_user.role != UserRole.ADMIN:
         # Filter by user_id for reliable user-booking link
         # Fallback to phone matching for old bookings without user_id
-        from sqlalchemy import or_
-        query = query.where(
+        filters.append(
             or_(
                 Booking.user_id == current_user.id,
                 Booking.user_phone == current_user.username  # Legacy fallback
             )
         )
-
-    result = await db.execute(query)
-    bookings = result.scalars().all()
-
-    # Load table numbers for all bookings
-    table_ids = [b.table_id for b in bookings if b.table_id]
-    table_numbers = {}
-    if table_ids:
-        tables_result = await db.execute(select(Table).where(Table.id.in_(table_ids)))
-        tables = tables_result.scalars().all()
-        table_numbers = {t.id: t.table_number for t in tables}
+    if date_from is not None:
+        filters.append(Booking.date >= date_from)
+    if date_to is not None:
+        filters.append(Booking.date <= date_to)
+    if status_filter:
+        filters.append(Booking.status.in_(status_filter))
+    if table_id is not None:
+        filters.append(Booking.table_id == table_id)
+    if zone is not None:
+        filters.append(Table.zone == zone)
+    if phone is not None:
+        filters.append(Booking.user_phone.startswith(phone, autoescape=True))
+
+    # Счетчик по тем же фильтрам; таблицу столов подключаем только для зоны
+    count_query = select(func.count()).select_from(Booking)
+    if zone is not None:
+        count_query = count_query.join(Table, Booking.table_id == Table.id)
+    total = (await db.execute(count_query.where(*filters))).scalar_one()
+
+    # Номер стола - одним запросом через JOIN, лишняя строка показывает, есть ли следующая страница
+    query = (
+        select(Booking, Table.table_number)
+        .outerjoin(Table, Booking.table_id == Table.id)
+        .where(*filters)
+        .order_by(desc(Booking.created_at), desc(Booking.id))
+        .limit(limit + 1)
+    )
+    if after is not None:
+        query = query.where(tuple_(Booking.created_at, Booking.id) < after)
+
+    rows = (await db.execute(query)).all()
+    if len(rows) > limit:
+        rows = rows[:limit]
+        last = rows[-1].Booking
+        response.headers["X-Next-Cursor"] = _encode_cursor(last.created_at, last.id)
+    response.headers["X-Total-Count"] = str(total)
 
     # Convert to response with table_number and user_id
-    booking_responses = []
-    for booking in bookings:
-        booking_dict = {
+    return [
+        {
             "id": booking.id,
             "user_name": booking.user_name,
             "user_phone": booking.user_phone,
@@ -361,14 +529,76 @@ async def get_bookings(
             "status": booking.status,
             "deposit_amount": booking.deposit_amount,
             "table_id": booking.table_id,
-            "table_number": table_numbers.get(booking.table_id) if booking.table_id else None,
+            "table_number": table_number,
+            "extra_table_ids": booking.extra_table_ids,
             "user_id": booking.user_id,
             "comment": booking.comment,
             "created_at": booking.created_at,
         }
-        booking_responses.append(booking_dict)
+        for booking, table_number in rows
+    ]
+
+
+async def _payment_status(db: AsyncSession, booking_id: int) -> PaymentStatusResponse:
+    result = await db.execute(
+        select(PaymentIntent).where(PaymentIntent.booking_id == booking_id)
+    )
+    intent = result.scalar_one_or_none()
+    if not intent:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND, detail="Платеж не найден"
+        )
+    return PaymentStatusResponse(
+        booking_id=booking_id,
+        payment_status=intent.status,
+        payment_url=intent.confirmation_url,
+        attempts=intent.attempts,
+    )
+
+
+@router.get("/{booking_id}/payment", response_model=PaymentStatusResponse)
+async def get_payment_status(booking_id: int, db: AsyncSession = Depends(get_db)):
+    """Payment status of a booking; payment_url is set once the status is READY."""
+    return await _payment_status(db, booking_id)
 
-    return booking_responses
+
+# Сколько держать SSE-поток открытым и как часто перечитывать статус
+PAYMENT_EVENTS_TIMEOUT_SECONDS = 60
+PAYMENT_EVENTS_POLL_SECONDS = 1.0
+
+
+@router.get("/{booking_id}/payment/events")
+async def stream_payment_status(booking_id: int):
+    """
+    Server-Sent Events stream of the payment status: one `payment` event per
+    change, closed after READY/FAILED or a timeout (the client reconnects).
+    """
+    async with AsyncSessionLocal() as db:
+        current = await _payment_status(db, booking_id)
+
+    async def events():
+        nonlocal current
+        deadline = asyncio.get_running_loop().time() + PAYMENT_EVENTS_TIMEOUT_SECONDS
+        last = None
+        while True:
+            if current != last:
+                yield f"event: payment\ndata: {current.model_dump_json()}\n\n"
+                last = current
+            if current.payment_status != PaymentIntentStatus.PENDING:
+                return
+            if asyncio.get_running_loop().time() >= deadline:
+                return
+            # Воркер этого процесса будит сразу, другой процесс - через опрос БД
+            await payment_intent_worker.wait_for_update(booking_id, PAYMENT_EVENTS_POLL_SECONDS)
+            # Короткая сессия на чтение: соединение не держится весь поток
+            async with AsyncSessionLocal() as db:
+                current = await _payment_status(db, booking_id)
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
 
 
 @router.get("/{booking_id}", response_model=BookingRead)
@@ -410,9 +640,12 @@ async def update_booking_status(
     if not booking:
         raise HTTPException(status_code=404, detail="Бронирование не найдено")
 
+    before = booking_facts(booking)
     booking.status = booking_status
+    await record_booking_change(db, before, booking_facts(booking))
     await db.commit()
     await db.refresh(booking)
+    invalidate_availability_cache(booking.date)
 
     return booking
 
@@ -426,10 +659,8 @@ async def update_booking(
 ):
     """
     Update booking details (Admin only).
-    Sends Telegram notification if date/time changes for confirmed bookings.
+    Queues Telegram notification if date/time changes for confirmed bookings.
     """
-    from app.services.telegram_service import send_booking_update_notification
-    
     result = await db.execute(select(Booking).where(Booking.id == booking_id))
     booking = result.scalar_one_or_none()
 
@@ -437,6 +668,7 @@ async def update_booking(
         raise HTTPException(status_code=404, detail="Бронирование не найдено")
 
     # Store old values for comparison
+    before = booking_facts(booking)
     old_date = booking.date
     old_time = booking.time
     date_changed = old_date != booking_data.date
@@ -448,25 +680,35 @@ async def update_booking(
     booking.date = booking_data.date
     booking.time = booking_data.time
     booking.guest_count = booking_data.guest_count
+    if booking.table_id != booking_data.table_id:
+        # Стол сменили вручную - сдвинутые соседние столы больше не держим
+        booking.extra_tables_json = None
     booking.table_id = booking_data.table_id
     booking.comment = booking_data.comment
 
-    await db.commit()
-    await db.refresh(booking)
+    await record_booking_change(db, before, booking_facts(booking))
 
-    # Send Telegram notification if date or time changed for confirmed bookings
-    if (date_changed or time_changed) and booking.status.value == "CONFIRMED":
+    # Queue Telegram notification if date or time changed for confirmed bookings
+    notify = (date_changed or time_changed) and booking.status.value == "CONFIRMED"
+    if notify:
         # Load table for notification
         table = None
         if booking.table_id:
             table_result = await db.execute(select(Table).where(Table.id == booking.table_id))
             table = table_result.scalar_one_or_none()
         
-        await send_booking_update_notification(
+        await enqueue_booking_update_notification(
+            db,
             booking=booking,
             table=table,
             old_date=old_date if date_changed else None,
             old_time=old_time if time_changed else None
         )
 
+    await db.commit()
+    await db.refresh(booking)
+    invalidate_availability_cache(old_date, booking.date)
+    if notify:
+        telegram_dispatcher.notify()
+
     return booking
@@ -1,50 +1,97 @@
 """
 Menu router - handles menu and menu items.
 """
-from fastapi import APIRouter, Depends, HTTPException, status
+import json
+
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, Response, status
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select
-from typing import List
+from typing import List, Optional, Union
 
 from app.database import get_db
 from app.models import MenuCategory, MenuItem
-from app.schemas import MenuCategoryWithItems, MenuItemRead, MenuItemCreate, MenuCategoryCreate
+from app.schemas import (
+    MenuCategoryCompact,
+    MenuCategoryCreate,
+    MenuCategoryWithItems,
+    MenuItemCreate,
+    MenuItemRead,
+)
 from app.auth import get_current_admin_user
 from app.models import User
+from app.services.image_store import ImageStoreError, is_inline_image, store_upload
+from app.services.menu_service import (
+    MenuView,
+    etag_matches,
+    get_menu_snapshot,
+    invalidate_menu_snapshot,
+)
 
 router = APIRouter(prefix="/menu", tags=["menu"])
 
 
-@router.get("", response_model=List[MenuCategoryWithItems])
-async def get_menu(db: AsyncSession = Depends(get_db)):
+async def _apply_item_image(item: MenuItem, image_url: Optional[str]) -> None:
+    """
+    Set item image. A Base64 upload is resized into WebP variants in the image
+    store; an unchanged URL keeps its variants; any other URL is used as is.
+    """
+    if image_url == item.image_url:
+        return
+
+    if not is_inline_image(image_url):
+        item.image_url = image_url or None
+        item.image_variants_json = None
+        return
+
+    try:
+        variants = await store_upload(image_url)
+    except ImageStoreError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+
+    item.image_url = variants[-1]["url"]
+    item.image_variants_json = json.dumps(variants)
+
+
+@router.get("", response_model=Union[List[MenuCategoryWithItems], List[MenuCategoryCompact]])
+async def get_menu(
+    view: MenuView = Query(
+        MenuView.FULL,
+        description="compact - only titles, prices and flags, without descriptions and images",
+    ),
+    db: AsyncSession = Depends(get_db),
+    if_none_match: Optional[str] = Header(None),
+):
     """
     Get full menu with categories and items.
     Returns tree structure: categories with their items.
+    Served from a precomputed snapshot with a strong ETag (If-None-Match -> 304).
     """
-    # Get all categories ordered by sort_order
-    result = await db.execute(
-        select(MenuCategory).order_by(MenuCategory.sort_order)
-    )
-    categories = result.scalars().all()
-    
-    # Get all items
-    items_result = await db.execute(select(MenuItem))
-    all_items = items_result.scalars().all()
-    
-    # Group items by category
-    menu_data = []
-    for category in categories:
-        category_items = [item for item in all_items if item.category_id == category.id]
-        menu_data.append(
-            MenuCategoryWithItems(
-                id=category.id,
-                title=category.title,
-                sort_order=category.sort_order,
-                items=[MenuItemRead.model_validate(item) for item in category_items]
-            )
+    snapshot = await get_menu_snapshot(db, view)
+    headers = {
+        "ETag": snapshot.etag,
+        # Браузер всегда перепроверяет меню, но при совпадении ETag тело не передается
+        "Cache-Control": "no-cache",
+    }
+
+    if etag_matches(if_none_match, snapshot.etag):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+
+    return Response(content=snapshot.body, media_type="application/json", headers=headers)
+
+
+@router.get("/items/{item_id}", response_model=MenuItemRead)
+async def get_menu_item(item_id: int, db: AsyncSession = Depends(get_db)):
+    """Get a single menu item with description and images."""
+    result = await db.execute(select(MenuItem).where(MenuItem.id == item_id))
+    item = result.scalar_one_or_none()
+
+    if not item:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Блюдо не найдено"
         )
-    
-    return menu_data
+
+    return item
 
 
 @router.post("/categories", response_model=MenuCategoryWithItems, status_code=status.HTTP_201_CREATED)
@@ -61,6 +108,7 @@ async def create_category(
     
     db.add(category)
     await db.commit()
+    invalidate_menu_snapshot()
     await db.refresh(category)
     
     return MenuCategoryWithItems(
@@ -93,6 +141,7 @@ async def update_category(
     category.sort_order = category_data.sort_order
     
     await db.commit()
+    invalidate_menu_snapshot()
     await db.refresh(category)
     
     # Get items for this category
@@ -125,6 +174,7 @@ async def delete_category(
     
     await db.delete(category)
     await db.commit()
+    invalidate_menu_snapshot()
     
     return None
 
@@ -151,14 +201,15 @@ async def create_menu_item(
         description=item_data.description,
         price=item_data.price,
         weight=item_data.weight,
-        image_url=item_data.image_url,
         category_id=item_data.category_id,
         is_spicy=item_data.is_spicy,
         is_vegan=item_data.is_vegan
     )
+    await _apply_item_image(item, item_data.image_url)
     
     db.add(item)
     await db.commit()
+    invalidate_menu_snapshot()
     await db.refresh(item)
     
     return item
@@ -186,12 +237,13 @@ async def update_menu_item(
     item.description = item_data.description
     item.price = item_data.price
     item.weight = item_data.weight
-    item.image_url = item_data.image_url
+    await _apply_item_image(item, item_data.image_url)
     item.category_id = item_data.category_id
     item.is_spicy = item_data.is_spicy
     item.is_vegan = item_data.is_vegan
     
     await db.commit()
+    invalidate_menu_snapshot()
     await db.refresh(item)
     
     return item
@@ -215,6 +267,7 @@ async def delete_menu_item(
     
     await db.delete(item)
     await db.commit()
+    invalidate_menu_snapshot()
     
     return None
 
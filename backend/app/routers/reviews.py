@@ -2,8 +2,9 @@
 Reviews router - handles review creation and management.
 """
 
+import asyncio
 import json
-from typing import List, Optional
+from typing import Any, Dict, List, Optional, Tuple
 
 from fastapi import APIRouter, Depends, HTTPException, Query, status
 from sqlalchemy import desc, select
@@ -13,6 +14,12 @@ from app.auth import get_current_admin_user, get_current_user
 from app.database import get_db
 from app.models import Review, User
 from app.schemas import ReviewCreate, ReviewRead
+from app.services.image_store import (
+    ImageStoreError,
+    build_srcset,
+    is_inline_image,
+    store_upload,
+)
 
 router = APIRouter(prefix="/reviews", tags=["reviews"])
 
@@ -29,17 +36,47 @@ def map_review_to_schema(review: Review) -> ReviewRead:
         except Exception:
             images = []
 
+    image_srcsets: List[Optional[str]] = [None] * len(images)
+    if review.image_variants_json:
+        try:
+            variants = json.loads(review.image_variants_json)
+            image_srcsets = [build_srcset(v) if v else None for v in variants]
+        except (ValueError, KeyError, TypeError):
+            pass
+
     return ReviewRead(
         id=review.id,
         author=review.author,
         rating=review.rating,
         text=review.text,
         images=images,
+        image_srcsets=image_srcsets,
         created_at=review.created_at,
         is_approved=review.is_approved,
     )
 
 
+async def _store_review_images(
+    images: List[str],
+) -> Tuple[List[str], List[Optional[List[Dict[str, Any]]]]]:
+    """
+    Store Base64 uploads as WebP variants.
+    Returns main image URLs and, for each image, its variants (None for plain URLs).
+    """
+    async def store_one(image: str):
+        if not is_inline_image(image):
+            return image, None
+        variants = await store_upload(image)
+        return variants[-1]["url"], variants
+
+    try:
+        stored = await asyncio.gather(*(store_one(image) for image in images))
+    except ImageStoreError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+
+    return [url for url, _ in stored], [variants for _, variants in stored]
+
+
 @router.post("", response_model=ReviewRead, status_code=status.HTTP_201_CREATED)
 async def create_review(
     review_data: ReviewCreate, 
@@ -57,8 +94,9 @@ async def create_review(
             detail="Оставить отзыв могут только пользователи, вошедшие через Яндекс"
         )
     
-    # Сериализуем список картинок в строку JSON для БД
-    images_json_str = json.dumps(review_data.images) if review_data.images else "[]"
+    # Base64-картинки сохраняем в хранилище как WebP-варианты, в БД - только URL
+    images, image_variants = await _store_review_images(review_data.images)
+    images_json_str = json.dumps(images)
 
     # ЛОГИКА МОДЕРАЦИИ:
     # Если рейтинг >= 4, публикуем сразу (True). Иначе - на модерацию (False).
@@ -69,6 +107,7 @@ async def create_review(
         rating=review_data.rating,
         text=review_data.text if review_data.text else "",
         images_json=images_json_str,
+        image_variants_json=json.dumps(image_variants) if any(image_variants) else None,
         is_approved=should_auto_approve,
     )
 
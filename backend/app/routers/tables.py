@@ -11,6 +11,9 @@ from app.models import Table
 from app.schemas import TableRead, TableCreate
 from app.auth import get_current_admin_user
 from app.models import User
+from app.services.booking_service import invalidate_availability_cache
+from app.services.analytics_service import reset_analytics_days
+from app.services.stats_service import rebuild_daily_stats
 
 router = APIRouter(prefix="/tables", tags=["tables"])
 
@@ -47,6 +50,8 @@ async def create_table(
     db.add(table)
     await db.commit()
     await db.refresh(table)
+    # Состав столов влияет на сетки доступности всех дат
+    invalidate_availability_cache()
     
     return table
 
@@ -68,6 +73,8 @@ async def update_table(
             detail="Стол не найден"
         )
     
+    zone_changed = table.zone != table_data.zone
+
     # Update fields
     table.table_number = table_data.table_number
     table.zone = table_data.zone
@@ -76,9 +83,16 @@ async def update_table(
     table.y = table_data.y
     table.rotation = table_data.rotation
     table.is_active = table_data.is_active
-    
+
+    if zone_changed:
+        # Брони стола переезжают в другую зону дневной сводки (редкая операция)
+        await db.flush()
+        await rebuild_daily_stats(db)
+        await reset_analytics_days(db)
+
     await db.commit()
     await db.refresh(table)
+    invalidate_availability_cache()
     
     return table
 
@@ -101,6 +115,7 @@ async def delete_table(
     
     await db.delete(table)
     await db.commit()
+    invalidate_availability_cache()
     
     return None
 
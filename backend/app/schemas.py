@@ -7,7 +7,7 @@ from typing import Dict, List, Optional
 
 from pydantic import BaseModel, Field, field_validator, model_validator
 
-from app.models import BookingStatus, UserRole, Zone
+from app.models import BookingStatus, PaymentIntentStatus, UserRole, Zone
 
 # ============ USER SCHEMAS ============
 
@@ -148,6 +148,8 @@ class MenuItemRead(BaseModel):
     price: float
     weight: int
     image_url: Optional[str]
+    # Для <img srcset>: "url 320w, url 800w, url 1600w"
+    image_srcset: Optional[str] = None
     category_id: int
     is_spicy: bool
     is_vegan: bool
@@ -162,6 +164,27 @@ class MenuCategoryWithItems(MenuCategoryRead):
     items: List[MenuItemRead] = []
 
 
+class MenuItemCompact(BaseModel):
+    """Menu item without description and images (hall tablet, Telegram bot)."""
+
+    id: int
+    title: str
+    price: float
+    weight: int
+    category_id: int
+    is_spicy: bool
+    is_vegan: bool
+
+    class Config:
+        from_attributes = True
+
+
+class MenuCategoryCompact(MenuCategoryRead):
+    """Menu category with compact items."""
+
+    items: List[MenuItemCompact] = []
+
+
 # ============ BOOKING SCHEMAS ============
 
 # --- New Availability Schemas ---
@@ -186,6 +209,27 @@ class DateAvailabilityResponse(BaseModel):
     min_advance_hours: int
 
 
+class DayAvailabilitySummary(BaseModel):
+    """Availability summary for one day of a date range."""
+
+    date: date
+    is_available: bool
+    first_available_time: Optional[time] = None
+    available_slots_count: int
+    time_slots: Optional[List[TimeSlotAvailability]] = None  # Only with include_slots=true
+
+
+class RangeAvailabilityResponse(BaseModel):
+    """Availability for a date range (calendar view)."""
+
+    date_from: date
+    date_to: date
+    guest_count: int
+    days: List[DayAvailabilitySummary]
+    working_hours: Dict[str, time]
+    min_advance_hours: int
+
+
 # --- Existing Booking Schemas ---
 
 
@@ -198,6 +242,7 @@ class BookingCreate(BaseModel):
     time: time
     guest_count: int = Field(..., gt=0, le=20)
     table_id: Optional[int] = None
+    preferred_zone: Optional[Zone] = None  # Used for auto-selection when table_id is empty
     comment: Optional[str] = None
 
     @field_validator("time", mode="before")
@@ -272,6 +317,7 @@ class BookingRead(BaseModel):
     deposit_amount: float
     table_id: Optional[int]
     table_number: Optional[str] = None  # Custom table number for display
+    extra_table_ids: List[int] = []  # Neighbouring tables combined for a large party
     user_id: Optional[int] = None
     comment: Optional[str]
     created_at: datetime
@@ -295,11 +341,27 @@ class BookingAvailabilityResponse(BaseModel):
 
 
 class BookingPaymentResponse(BaseModel):
-    """Response with payment link after booking creation."""
+    """
+    Response after booking creation. The payment is created in the background:
+    payment_url is empty until payment_status is READY (poll payment_status_url
+    or stream payment_events_url).
+    """
 
     booking_id: int
-    payment_url: str
+    payment_url: Optional[str] = None
     status: BookingStatus
+    payment_status: PaymentIntentStatus
+    payment_status_url: str
+    payment_events_url: str
+
+
+class PaymentStatusResponse(BaseModel):
+    """Payment intent status of a booking."""
+
+    booking_id: int
+    payment_status: PaymentIntentStatus
+    payment_url: Optional[str] = None
+    attempts: int
 
 
 class BookingWebhookRequest(BaseModel):
@@ -331,6 +393,84 @@ class StatsResponse(BaseModel):
     cancelled_bookings: int
 
 
+class DailyStats(StatsResponse):
+    """Statistics of one booking date."""
+
+    date: date
+
+
+class ZoneStats(StatsResponse):
+    """Statistics of one hall zone (None - bookings without a table)."""
+
+    zone: Optional[Zone] = None
+
+
+class WeekdayStats(StatsResponse):
+    """Statistics of one weekday (0 - Monday)."""
+
+    weekday: int
+
+
+# ============ ANALYTICS SCHEMAS ============
+
+
+class OccupancyCell(BaseModel):
+    """Occupancy of a zone at one hour of one weekday (0 - Monday)."""
+
+    zone: Zone
+    weekday: int
+    hour: int
+    occupancy: float  # percent of table-minutes
+
+
+class OccupancyHeatmapResponse(BaseModel):
+    """Occupancy heatmap zone x weekday x hour for a date range."""
+
+    date_from: date
+    date_to: date
+    hours: List[int]
+    cells: List[OccupancyCell]
+
+
+class RevenuePoint(BaseModel):
+    """Deposits of confirmed bookings in one period of the revenue series."""
+
+    period_start: date
+    deposits: float
+    bookings: int
+    guests: int
+
+
+# ============ RESTAURANT SETTINGS SCHEMAS ============
+
+
+class RestaurantSettingsUpdate(BaseModel):
+    """Schema for updating restaurant booking settings."""
+
+    opening_time: time
+    closing_time: time
+    last_booking_time: time
+    min_advance_hours: int = Field(..., ge=0, le=72)
+    booking_duration_hours: int = Field(..., ge=1, le=12)
+    timezone: str = "Europe/Moscow"
+
+    @model_validator(mode="after")
+    def validate_hours_order(self):
+        """Validate that working hours are consistent."""
+        if not (self.opening_time <= self.last_booking_time <= self.closing_time):
+            raise ValueError(
+                "Время последней посадки должно быть между открытием и закрытием"
+            )
+        return self
+
+
+class RestaurantSettingsRead(RestaurantSettingsUpdate):
+    """Schema for reading restaurant booking settings."""
+
+    class Config:
+        from_attributes = True
+
+
 # ============ REVIEW SCHEMAS ============
 
 
@@ -353,6 +493,8 @@ class ReviewRead(BaseModel):
     text: Optional[str]  # Может быть None
     # Возвращаем список
     images: List[str] = []
+    # srcset для каждой картинки из images (None - вариантов нет)
+    image_srcsets: List[Optional[str]] = []
     created_at: datetime
     is_approved: bool
 
@@ -0,0 +1,295 @@
+"""
+Booking analytics: hall occupancy heatmaps and deposit revenue series.
+
+Occupancy is counted in table-minutes per zone and hour of the day from
+confirmed bookings. A closed day (before today in the restaurant timezone)
+is computed once and stored in booking_analytics_days; any booking write
+on that date deletes the stored row (see stats_service). Revenue comes
+from the booking_daily_stats rollup.
+"""
+
+import enum
+import json
+from array import array
+from collections import defaultdict
+from datetime import date, datetime, timedelta
+from itertools import accumulate
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import and_, delete, func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.database import is_sqlite
+from app.models import (
+    Booking,
+    BookingAnalyticsDay,
+    BookingDailyStats,
+    BookingStatus,
+    Table,
+    Zone,
+)
+from app.services.booking_service import get_settings, get_timezone
+
+if is_sqlite:
+    from sqlalchemy.dialects.sqlite import insert as upsert
+else:
+    from sqlalchemy.dialects.postgresql import insert as upsert
+
+MINUTES_PER_DAY = 24 * 60
+HOURS_PER_DAY = 24
+
+# Зона -> занятые стол-минуты по часам суток (24 значения)
+DayOccupancy = Dict[str, List[int]]
+
+
+class RevenueBucket(str, enum.Enum):
+    """Period of one point of the revenue series."""
+
+    DAY = "day"
+    WEEK = "week"
+    MONTH = "month"
+
+
+def _bucket_start(day: date, bucket: RevenueBucket) -> date:
+    if bucket == RevenueBucket.WEEK:
+        return day - timedelta(days=day.weekday())
+    if bucket == RevenueBucket.MONTH:
+        return day.replace(day=1)
+    return day
+
+
+def _next_bucket(start: date, bucket: RevenueBucket) -> date:
+    if bucket == RevenueBucket.WEEK:
+        return start + timedelta(days=7)
+    if bucket == RevenueBucket.MONTH:
+        return (start.replace(day=28) + timedelta(days=4)).replace(day=1)
+    return start + timedelta(days=1)
+
+
+def _date_range(date_from: date, date_to: date) -> Iterable[date]:
+    for offset in range((date_to - date_from).days + 1):
+        yield date_from + timedelta(days=offset)
+
+
+def compute_day_occupancy(
+    bookings: Iterable[Tuple[int, int]],
+    zone_by_table: Dict[int, str],
+    duration_minutes: int,
+) -> DayOccupancy:
+    """
+    Загрузка одного дня по броням (table_id, минута начала).
+
+    Для каждой зоны строится разностный массив по минутам суток (+1 в начале
+    брони, -1 в конце), префиксная сумма дает число занятых столов в каждую
+    минуту, суммы по срезам по 60 минут - стол-минуты по часам.
+    Брони после полуночи обрезаются концом дня.
+    """
+    diffs: Dict[str, array] = {}
+    for table_id, start in bookings:
+        zone = zone_by_table.get(table_id)
+        if zone is None:
+            continue
+        diff = diffs.get(zone)
+        if diff is None:
+            diff = diffs[zone] = array("i", [0]) * (MINUTES_PER_DAY + 1)
+        diff[start] += 1
+        diff[min(start + duration_minutes, MINUTES_PER_DAY)] -= 1
+
+    occupancy: DayOccupancy = {}
+    for zone, diff in diffs.items():
+        busy = array("i", accumulate(diff[:MINUTES_PER_DAY]))
+        occupancy[zone] = [sum(busy[hour * 60:(hour + 1) * 60]) for hour in range(HOURS_PER_DAY)]
+    return occupancy
+
+
+async def _zone_by_table(db: AsyncSession) -> Dict[int, str]:
+    """Зона каждого стола, включая неактивные (на них могли быть брони)."""
+    result = await db.execute(select(Table.id, Table.zone))
+    return {table_id: zone.value for table_id, zone in result.tuples()}
+
+
+async def _zone_capacity(db: AsyncSession) -> Dict[str, int]:
+    """Количество активных столов в каждой зоне."""
+    result = await db.execute(
+        select(Table.zone, func.count(Table.id))
+        .where(Table.is_active == True)
+        .group_by(Table.zone)
+    )
+    return {zone.value: count for zone, count in result.tuples()}
+
+
+async def _compute_days(
+    db: AsyncSession, days: List[date], duration_minutes: int
+) -> Dict[date, DayOccupancy]:
+    """Загрузка дней по подтвержденным броням, одним запросом на весь диапазон."""
+    result = await db.execute(
+        select(Booking.date, Booking.table_id, Booking.time, Booking.extra_tables_json).where(
+            and_(
+                Booking.date >= min(days),
+                Booking.date <= max(days),
+                Booking.status == BookingStatus.CONFIRMED,
+                Booking.table_id.isnot(None),
+            )
+        )
+    )
+
+    wanted = set(days)
+    bookings_by_date: Dict[date, List[Tuple[int, int]]] = defaultdict(list)
+    for booking_date, table_id, start_time, extra_tables_json in result.tuples():
+        if booking_date not in wanted:
+            continue
+        start = start_time.hour * 60 + start_time.minute
+        day_bookings = bookings_by_date[booking_date]
+        day_bookings.append((table_id, start))
+        if extra_tables_json:
+            day_bookings.extend((extra_id, start) for extra_id in json.loads(extra_tables_json))
+
+    zone_by_table = await _zone_by_table(db)
+    return {
+        day: compute_day_occupancy(bookings_by_date.get(day, ()), zone_by_table, duration_minutes)
+        for day in days
+    }
+
+
+async def get_days_occupancy(
+    db: AsyncSession, date_from: date, date_to: date
+) -> Dict[date, DayOccupancy]:
+    """
+    Загрузка по дням диапазона. Закрытые дни берутся из booking_analytics_days,
+    недостающие считаются и сохраняются; сегодня и будущие дни считаются каждый раз.
+    """
+    settings = await get_settings(db)
+    today = datetime.now(get_timezone(settings)).date()
+
+    result = await db.execute(
+        select(BookingAnalyticsDay.date, BookingAnalyticsDay.occupancy_json).where(
+            and_(BookingAnalyticsDay.date >= date_from, BookingAnalyticsDay.date <= date_to)
+        )
+    )
+    occupancy = {day: json.loads(payload) for day, payload in result.tuples()}
+
+    missing = [day for day in _date_range(date_from, date_to) if day not in occupancy]
+    if not missing:
+        return occupancy
+
+    computed = await _compute_days(db, missing, settings.booking_duration_hours * 60)
+    occupancy.update(computed)
+
+    closed = [
+        {"date": day, "occupancy_json": json.dumps(computed[day])}
+        for day in missing
+        if day < today
+    ]
+    if closed:
+        # Параллельный запрос мог уже сохранить тот же день - результат одинаковый
+        stmt = upsert(BookingAnalyticsDay).on_conflict_do_nothing(index_elements=["date"])
+        await db.execute(stmt, closed)
+        await db.commit()
+
+    return occupancy
+
+
+async def get_occupancy_heatmap(db: AsyncSession, date_from: date, date_to: date) -> dict:
+    """
+    Тепловая карта загрузки: зона x день недели (0 - понедельник) x час.
+
+    occupancy - процент занятых стол-минут от всех стол-минут активных столов
+    зоны за все такие дни недели диапазона. Часы - рабочие часы ресторана.
+    """
+    settings = await get_settings(db)
+    days_occupancy = await get_days_occupancy(db, date_from, date_to)
+    capacity = await _zone_capacity(db)
+
+    weekday_days = [0] * 7
+    # (зона, день недели) -> стол-минуты по часам
+    minutes: Dict[Tuple[str, int], List[int]] = {}
+    for day, day_occupancy in days_occupancy.items():
+        weekday = day.weekday()
+        weekday_days[weekday] += 1
+        for zone, hours in day_occupancy.items():
+            acc = minutes.get((zone, weekday))
+            minutes[(zone, weekday)] = hours if acc is None else [a + b for a, b in zip(acc, hours)]
+
+    first_hour = settings.opening_time.hour
+    last_hour = settings.closing_time.hour + (1 if settings.closing_time.minute else 0)
+    hours = list(range(first_hour, min(last_hour, HOURS_PER_DAY)))
+
+    cells = []
+    for zone in Zone:
+        tables = capacity.get(zone.value, 0)
+        if not tables:
+            continue
+        for weekday in range(7):
+            available = tables * 60 * weekday_days[weekday]
+            if not available:
+                continue
+            zone_minutes = minutes.get((zone.value, weekday))
+            for hour in hours:
+                busy = zone_minutes[hour] if zone_minutes else 0
+                cells.append({
+                    "zone": zone,
+                    "weekday": weekday,
+                    "hour": hour,
+                    "occupancy": round(min(100.0, busy * 100.0 / available), 1),
+                })
+
+    return {"date_from": date_from, "date_to": date_to, "hours": hours, "cells": cells}
+
+
+async def get_revenue_series(
+    db: AsyncSession,
+    date_from: date,
+    date_to: date,
+    bucket: RevenueBucket = RevenueBucket.WEEK,
+    zone: Optional[Zone] = None,
+) -> List[dict]:
+    """
+    Депозиты подтвержденных броней по периодам из дневной сводки.
+    Периоды без броней возвращаются с нулями, чтобы ряд был непрерывным.
+    """
+    filters = [BookingDailyStats.zone == zone.value] if zone else []
+    result = await db.execute(
+        select(
+            BookingDailyStats.date,
+            func.sum(BookingDailyStats.deposits_total),
+            func.sum(BookingDailyStats.bookings_count),
+            func.sum(BookingDailyStats.guests_total),
+        )
+        .where(
+            BookingDailyStats.date >= date_from,
+            BookingDailyStats.date <= date_to,
+            BookingDailyStats.status == BookingStatus.CONFIRMED,
+            *filters,
+        )
+        .group_by(BookingDailyStats.date)
+    )
+
+    series: Dict[date, List[float]] = {}
+    start = _bucket_start(date_from, bucket)
+    while start <= date_to:
+        series[start] = [0.0, 0, 0]
+        start = _next_bucket(start, bucket)
+
+    for day, deposits, count, guests in result.tuples():
+        point = series[_bucket_start(day, bucket)]
+        point[0] += deposits or 0.0
+        point[1] += count or 0
+        point[2] += guests or 0
+
+    return [
+        {
+            "period_start": period_start,
+            "deposits": float(deposits),
+            "bookings": int(count),
+            "guests": int(guests),
+        }
+        for period_start, (deposits, count, guests) in series.items()
+    ]
+
+
+async def reset_analytics_days(db: AsyncSession) -> None:
+    """
+    Удаляет все сохраненные дни (смена зоны стола или длительности брони
+    меняет загрузку прошлых дней). Коммит делает вызывающий код.
+    """
+    await db.execute(delete(BookingAnalyticsDay))
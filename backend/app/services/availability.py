@@ -0,0 +1,104 @@
+"""
+Availability engine - per-day table occupancy index for the booking grid.
+"""
+
+from bisect import bisect_right
+from datetime import date, time
+from typing import Dict, Iterable, List, Set, Tuple
+
+# Шаг сетки бронирования в минутах
+SLOT_STEP_MINUTES = 30
+
+
+def time_to_minutes(value: time) -> int:
+    """Convert time of day to minutes since midnight."""
+    return value.hour * 60 + value.minute
+
+
+def minutes_to_time(value: int) -> time:
+    """Convert minutes since midnight to time of day."""
+    return time(value // 60, value % 60)
+
+
+class DayOccupancy:
+    """
+    Занятость столов на один день.
+
+    Строится один раз из занятых интервалов и хранит:
+    - для каждого стола битовую маску занятых слотов сетки (шаг 30 минут);
+    - для каждого слота множество занятых столов;
+    - для каждого стола отсортированный список начал броней
+      (для проверки произвольного времени, не попадающего в сетку).
+
+    Все брони длятся одинаково (booking_duration_hours), поэтому пересечение
+    интервалов сводится к условию |start - other_start| < duration.
+    """
+
+    def __init__(
+        self,
+        target_date: date,
+        opening_time: time,
+        last_booking_time: time,
+        duration_hours: int,
+        occupied: Iterable[Tuple[int, time]],
+    ):
+        self.date = target_date
+        self.duration = duration_hours * 60
+        self.first_slot = time_to_minutes(opening_time)
+
+        last_slot = time_to_minutes(last_booking_time)
+        self.slot_minutes: List[int] = list(
+            range(self.first_slot, last_slot + 1, SLOT_STEP_MINUTES)
+        )
+        self.slot_times: List[time] = [minutes_to_time(m) for m in self.slot_minutes]
+
+        # table_id -> отсортированные начала броней (в минутах)
+        self._starts: Dict[int, List[int]] = {}
+        for table_id, start_time in occupied:
+            self._starts.setdefault(table_id, []).append(time_to_minutes(start_time))
+        for starts in self._starts.values():
+            starts.sort()
+
+        # table_id -> битовая маска занятых слотов
+        self._masks: Dict[int, int] = {}
+        for table_id, starts in self._starts.items():
+            mask = 0
+            for start in starts:
+                mask |= self._blocked_slots_mask(start)
+            self._masks[table_id] = mask
+
+        # slot index -> множество занятых столов
+        self._busy_by_slot: List[Set[int]] = [set() for _ in self.slot_minutes]
+        for table_id, mask in self._masks.items():
+            while mask:
+                low_bit = mask & -mask
+                self._busy_by_slot[low_bit.bit_length() - 1].add(table_id)
+                mask ^= low_bit
+
+    def _blocked_slots_mask(self, start: int) -> int:
+        """Bitmask of grid slots that overlap a booking starting at `start`."""
+        # Слот s пересекается с бронью b, если b - duration < s < b + duration
+        lo = (start - self.duration - self.first_slot) // SLOT_STEP_MINUTES + 1
+        hi = -((self.first_slot - start - self.duration) // SLOT_STEP_MINUTES) - 1
+        lo = max(lo, 0)
+        hi = min(hi, len(self.slot_minutes) - 1)
+        if hi < lo:
+            return 0
+        return ((1 << (hi - lo + 1)) - 1) << lo
+
+    def busy_tables(self, slot_index: int) -> Set[int]:
+        """Tables occupied at the given grid slot."""
+        return self._busy_by_slot[slot_index]
+
+    def is_table_free(self, table_id: int, start_time: time) -> bool:
+        """Check a table for an arbitrary start time (not only grid slots)."""
+        starts = self._starts.get(table_id)
+        if not starts:
+            return True
+        start = time_to_minutes(start_time)
+        idx = bisect_right(starts, start - self.duration)
+        return idx == len(starts) or starts[idx] >= start + self.duration
+
+    def free_tables(self, table_ids: Iterable[int], start_time: time) -> List[int]:
+        """Filter table ids free at the given start time, preserving order."""
+        return [tid for tid in table_ids if self.is_table_free(tid, start_time)]
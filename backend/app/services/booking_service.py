@@ -1,11 +1,35 @@
-from datetime import date, datetime, time, timedelta
-from typing import Any, Dict, List, Optional
+import asyncio
+import json
+import weakref
+from contextlib import asynccontextmanager
+from datetime import date, datetime, time, timedelta, timezone
+from typing import Any, AsyncIterator, Dict, FrozenSet, List, Optional, Set, Tuple
 from zoneinfo import ZoneInfo
 
-from sqlalchemy import and_, select
+from sqlalchemy import and_, func, or_, select, text, update
 from sqlalchemy.ext.asyncio import AsyncSession
-
-from app.models import Booking, BookingStatus, RestaurantSettings, Table
+from sqlalchemy.orm.attributes import set_committed_value
+
+from app.database import is_sqlite
+from app.database import settings as app_settings
+from app.models import (
+    Booking,
+    BookingStatus,
+    PaymentIntent,
+    PaymentIntentStatus,
+    RestaurantSettings,
+    Table,
+    Zone,
+)
+from app.services.availability import DayOccupancy
+from app.services.cache import TTLCache
+from app.services.stats_service import (
+    BookingFacts,
+    booking_facts,
+    record_booking_change,
+    record_booking_changes,
+)
+from app.services.table_allocator import TableInfo, TableLayout, choose_tables
 
 # Настройки по умолчанию, если таблица настроек пуста
 DEFAULT_SETTINGS = {
@@ -18,136 +42,301 @@ DEFAULT_SETTINGS = {
 }
 
 
+# Настройки меняются редко: держим их в кэше процесса.
+# TTL ограничивает расхождение между воркерами, запись через админку
+# сбрасывает кэш явно (invalidate_settings_cache).
+SETTINGS_CACHE_KEY = "restaurant_settings"
+settings_cache = TTLCache(ttl_seconds=app_settings.restaurant_settings_ttl_seconds, max_entries=1)
+
+
+def _detached_settings(settings: RestaurantSettings) -> RestaurantSettings:
+    """Копия настроек, не привязанная к сессии (безопасна для разделения между запросами)."""
+    return RestaurantSettings(
+        **{
+            column.name: getattr(settings, column.name)
+            for column in RestaurantSettings.__table__.columns
+        }
+    )
+
+
 async def get_settings(db: AsyncSession) -> RestaurantSettings:
     """
-    Получает настройки из БД. Если их нет, возвращает дефолтный объект (не сохраненный в БД).
+    Получает настройки из кэша или из БД. Если их нет, возвращает дефолтный объект (не сохраненный в БД).
     """
+    cached = settings_cache.get(SETTINGS_CACHE_KEY)
+    if cached is not None:
+        return cached
+
     result = await db.execute(select(RestaurantSettings))
     settings = result.scalar_one_or_none()
 
     if not settings:
-        return RestaurantSettings(**DEFAULT_SETTINGS)
+        settings = RestaurantSettings(**DEFAULT_SETTINGS)
+    else:
+        settings = _detached_settings(settings)
+
+    settings_cache.set(SETTINGS_CACHE_KEY, settings)
     return settings
 
 
-async def get_occupied_intervals(
-    db: AsyncSession, target_date: date, duration_hours: int
-) -> List[Dict[str, Any]]:
+def invalidate_settings_cache() -> None:
     """
-    Получает список занятых интервалов для всех столов на указанную дату.
-    Возвращает: [{'table_id': 1, 'start': datetime, 'end': datetime}, ...]
-    Учитываются только подтвержденные брони.
+    Сбросить кэш настроек (вызывать после записи в restaurant_settings).
+    Сетки доступности зависят от настроек и сбрасываются вместе с ними.
     """
-    query = select(Booking).where(
+    settings_cache.invalidate()
+    invalidate_availability_cache()
+
+
+def hold_cutoff() -> datetime:
+    """
+    Граница холда: брони PENDING, созданные раньше этого момента, считаются истекшими.
+    """
+    cutoff = datetime.now(timezone.utc) - timedelta(
+        minutes=app_settings.booking_hold_minutes
+    )
+    # SQLite хранит created_at (CURRENT_TIMESTAMP) как наивное UTC-время
+    return cutoff.replace(tzinfo=None) if is_sqlite else cutoff
+
+
+def _occupied_bookings_query(*columns):
+    """
+    Базовый запрос броней, занимающих стол: подтвержденные брони и
+    неистекшие холды PENDING (гость в процессе оплаты).
+    Выбираются только нужные колонки, без загрузки ORM-объектов Booking.
+    """
+    return select(*columns).where(
         and_(
-            Booking.date == target_date,
-            Booking.status == BookingStatus.CONFIRMED,
+            or_(
+                Booking.status == BookingStatus.CONFIRMED,
+                and_(
+                    Booking.status == BookingStatus.PENDING,
+                    Booking.created_at >= hold_cutoff(),
+                ),
+            ),
             Booking.table_id.isnot(None),
         )
     )
-    result = await db.execute(query)
-    bookings = result.scalars().all()
-
-    intervals = []
-    for booking in bookings:
-        # start_dt создается наивным (без timezone), так как date/time в БД обычно хранятся без TZ
-        start_dt = datetime.combine(booking.date, booking.time)
-        end_dt = start_dt + timedelta(hours=duration_hours)
-        intervals.append(
-            {"table_id": booking.table_id, "start": start_dt, "end": end_dt}
+
+
+def _append_booking_tables(
+    intervals: List[Tuple[int, time]],
+    table_id: int,
+    start_time: time,
+    extra_tables_json: Optional[str],
+) -> None:
+    """Основной стол брони и сдвинутые к нему соседние столы (для больших компаний)."""
+    intervals.append((table_id, start_time))
+    if extra_tables_json:
+        intervals.extend(
+            (extra_table_id, start_time) for extra_table_id in json.loads(extra_tables_json)
         )
+
+
+async def get_occupied_intervals(
+    db: AsyncSession, target_date: date
+) -> List[Tuple[int, time]]:
+    """
+    Получает список занятых интервалов для всех столов на указанную дату.
+    Возвращает кортежи (table_id, start_time); длительность брони одинакова
+    для всех (booking_duration_hours).
+    Учитываются подтвержденные брони и неистекшие холды PENDING.
+    """
+    query = _occupied_bookings_query(
+        Booking.table_id, Booking.time, Booking.extra_tables_json
+    ).where(Booking.date == target_date)
+    result = await db.execute(query)
+
+    intervals: List[Tuple[int, time]] = []
+    for table_id, start_time, extra_tables_json in result.tuples():
+        _append_booking_tables(intervals, table_id, start_time, extra_tables_json)
     return intervals
 
 
-async def get_day_availability(
-    db: AsyncSession, target_date: date, guest_count: int
-) -> Dict[str, Any]:
+async def get_hold_expiry_by_date(
+    db: AsyncSession, date_from: date, date_to: date
+) -> Dict[date, float]:
     """
-    Основная функция для формирования сетки бронирования.
+    Через сколько секунд истекает самый ранний действующий холд PENDING
+    на каждую дату диапазона (даты без холдов не возвращаются).
     """
-    settings = await get_settings(db)
+    cutoff = hold_cutoff()
+    result = await db.execute(
+        select(Booking.date, func.min(Booking.created_at))
+        .where(
+            and_(
+                Booking.status == BookingStatus.PENDING,
+                Booking.created_at >= cutoff,
+                Booking.table_id.isnot(None),
+                Booking.date >= date_from,
+                Booking.date <= date_to,
+            )
+        )
+        .group_by(Booking.date)
+    )
+    # Холд истекает через hold_minutes после created_at, то есть когда cutoff дойдет до created_at
+    return {
+        booking_date: (earliest - cutoff).total_seconds()
+        for booking_date, earliest in result.tuples()
+    }
+
+
+async def get_occupied_intervals_by_date(
+    db: AsyncSession, date_from: date, date_to: date
+) -> Dict[date, List[Tuple[int, time]]]:
+    """
+    Занятые интервалы за диапазон дат (включительно) одним запросом,
+    сгруппированные по дате.
+    """
+    query = _occupied_bookings_query(
+        Booking.date, Booking.table_id, Booking.time, Booking.extra_tables_json
+    ).where(and_(Booking.date >= date_from, Booking.date <= date_to))
+    result = await db.execute(query)
+
+    intervals_by_date: Dict[date, List[Tuple[int, time]]] = {}
+    for booking_date, table_id, start_time, extra_tables_json in result.tuples():
+        _append_booking_tables(
+            intervals_by_date.setdefault(booking_date, []),
+            table_id,
+            start_time,
+            extra_tables_json,
+        )
+    return intervals_by_date
 
+
+def get_timezone(settings: RestaurantSettings) -> ZoneInfo:
+    """Часовой пояс ресторана с фолбэком на Москву."""
     try:
-        tz = ZoneInfo(settings.timezone)
+        return ZoneInfo(settings.timezone)
     except Exception:
-        tz = ZoneInfo("Europe/Moscow")  # Fallback
+        return ZoneInfo("Europe/Moscow")  # Fallback
+
+
+def _make_day_occupancy(
+    target_date: date,
+    settings: RestaurantSettings,
+    occupied_intervals: List[Tuple[int, time]],
+) -> DayOccupancy:
+    return DayOccupancy(
+        target_date,
+        settings.opening_time,
+        settings.last_booking_time,
+        settings.booking_duration_hours,
+        occupied_intervals,
+    )
 
-    now = datetime.now(tz)
 
-    # 1. Получаем список столов, подходящих по вместимости
-    tables_result = await db.execute(
-        select(Table).where(and_(Table.is_active == True, Table.seats >= guest_count))
-    )
-    suitable_tables = tables_result.scalars().all()
-    suitable_table_ids = {t.id for t in suitable_tables}
-
-    # Если столов под такое кол-во гостей нет вообще
-    if not suitable_table_ids:
-        return {
-            "date": target_date,
-            "time_slots": [],
-            "working_hours": {
-                "open": settings.opening_time,
-                "close": settings.closing_time,
-            },
-            "min_advance_hours": settings.min_advance_hours,
-        }
+async def build_day_occupancy(
+    db: AsyncSession,
+    target_date: date,
+    settings: Optional[RestaurantSettings] = None,
+) -> DayOccupancy:
+    """
+    Строит индекс занятости столов на день (один запрос к броням).
+    Результат переиспользуется сеткой доступности, валидацией и автоподбором стола.
+    """
+    if settings is None:
+        settings = await get_settings(db)
+
+    occupied_intervals = await get_occupied_intervals(db, target_date)
+    return _make_day_occupancy(target_date, settings, occupied_intervals)
+
 
-    # 2. Получаем занятые интервалы на этот день
-    occupied_intervals = await get_occupied_intervals(
-        db, target_date, settings.booking_duration_hours
+async def get_table_layout(db: AsyncSession) -> TableLayout:
+    """Схема активных столов (только нужные для подбора колонки)."""
+    result = await db.execute(
+        select(Table.id, Table.zone, Table.seats, Table.x, Table.y).where(
+            Table.is_active == True
+        )
     )
+    return TableLayout(TableInfo(*row) for row in result.tuples())
 
-    # 3. Генерируем временные слоты с шагом 30 минут
-    time_slots = []
 
-    # Старт перебора: от времени открытия
-    current_dt = datetime.combine(target_date, settings.opening_time).replace(tzinfo=tz)
+async def _get_grid_tables(
+    db: AsyncSession, guest_count: int
+) -> Tuple[Set[int], Optional[TableLayout]]:
+    """
+    Столы для сетки доступности.
+    Возвращает подходящие по вместимости столы, а если таких нет - схему зала
+    для подбора комбинации соседних столов (большая компания).
+    Пустое множество и None - компанию такого размера не посадить вообще.
+    """
+    layout = await get_table_layout(db)
+    suitable_table_ids = {t.id for t in layout.tables if t.seats >= guest_count}
+    if suitable_table_ids:
+        return suitable_table_ids, None
+
+    if choose_tables(layout, layout.table_ids, guest_count) is None:
+        return set(), None
+    return set(), layout
 
-    # Конец перебора: время последней посадки
-    limit_dt = datetime.combine(target_date, settings.last_booking_time).replace(
-        tzinfo=tz
-    )
 
-    # Пороговое время: Текущее время + min_advance_hours
-    min_booking_threshold = now + timedelta(hours=settings.min_advance_hours)
+def _min_booking_threshold(settings: RestaurantSettings) -> datetime:
+    """
+    Пороговое время (текущее время + min_advance_hours) в локальном наивном
+    времени ресторана, чтобы не навешивать tzinfo на каждый слот.
+    """
+    now = datetime.now(get_timezone(settings))
+    return (now + timedelta(hours=settings.min_advance_hours)).replace(tzinfo=None)
 
-    while current_dt <= limit_dt:
-        slot_time = current_dt.time()
-        slot_end_dt = current_dt + timedelta(hours=settings.booking_duration_hours)
 
+def _build_base_slots(
+    occupancy: DayOccupancy,
+    suitable_table_ids: Set[int],
+    combine_layout: Optional[TableLayout] = None,
+    guest_count: int = 0,
+) -> List[Dict[str, Any]]:
+    """
+    Занятость столов по слотам сетки (шаг 30 минут, от открытия до последней посадки).
+    Не зависит от текущего времени, поэтому может кэшироваться.
+    Для больших компаний (combine_layout) слот доступен, если из свободных
+    соседних столов можно собрать нужное число мест.
+    """
+    base_slots = []
+    all_table_ids = combine_layout.table_ids if combine_layout else set()
+
+    for slot_index, slot_time in enumerate(occupancy.slot_times):
+        if combine_layout:
+            busy = occupancy.busy_tables(slot_index) & all_table_ids
+            combination = choose_tables(
+                combine_layout, all_table_ids - busy, guest_count
+            )
+            available_count = 1 if combination else 0
+        else:
+            busy = occupancy.busy_tables(slot_index) & suitable_table_ids
+            available_count = len(suitable_table_ids) - len(busy)
+
+        base_slots.append(
+            {
+                "time": slot_time,
+                "available_tables_count": available_count,
+                "occupied_table_ids": sorted(busy),
+            }
+        )
+    return base_slots
+
+
+def _apply_time_rules(
+    target_date: date,
+    base_slots: List[Dict[str, Any]],
+    min_booking_threshold: datetime,
+) -> List[Dict[str, Any]]:
+    """Итоговая сетка: поверх занятости применяется правило min_advance_hours."""
+    time_slots = []
+    for base_slot in base_slots:
         is_available = True
         reason = None
         available_count = 0
         slot_occupied_tables = []
 
         # ПРОВЕРКА 1: Правило min_advance_hours (или прошло ли время)
-        if current_dt < min_booking_threshold:
+        if datetime.combine(target_date, base_slot["time"]) < min_booking_threshold:
             is_available = False
             reason = "too_late"  # Слишком поздно для бронирования
         else:
             # ПРОВЕРКА 2: Наличие свободных столов
-            free_tables = 0
-
-            for table_id in suitable_table_ids:
-                is_table_busy = False
-
-                for interval in occupied_intervals:
-                    if interval["table_id"] == table_id:
-                        # Приводим интервалы из БД к TZ-aware для сравнения
-                        occ_start = interval["start"].replace(tzinfo=tz)
-                        occ_end = interval["end"].replace(tzinfo=tz)
-
-                        # Проверка пересечения интервалов:
-                        if current_dt < occ_end and slot_end_dt > occ_start:
-                            is_table_busy = True
-                            slot_occupied_tables.append(table_id)
-                            break
-
-                if not is_table_busy:
-                    free_tables += 1
-
-            available_count = free_tables
+            available_count = base_slot["available_tables_count"]
+            slot_occupied_tables = base_slot["occupied_table_ids"]
 
             if available_count == 0:
                 is_available = False
@@ -155,15 +344,113 @@ async def get_day_availability(
 
         time_slots.append(
             {
-                "time": slot_time,
+                "time": base_slot["time"],
                 "is_available": is_available,
                 "available_tables_count": available_count,
                 "occupied_table_ids": slot_occupied_tables,
                 "reason": reason,
             }
         )
+    return time_slots
+
+
+# Кэш сеток доступности: date -> {guest_count: base_slots}.
+# Хранится только занятость (без правила min_advance_hours, которое
+# пересчитывается на каждый запрос). Сбрасывается при изменении броней
+# на дату, столов или настроек; TTL ограничивает расхождение между воркерами.
+# Холд PENDING занимает стол только до истечения, а сетка проверяет его при
+# сборке: запись дня с холдами живет не дольше, чем до истечения самого
+# раннего из них, чтобы истекший холд не показывался занятым до снятия холда.
+availability_cache = TTLCache(
+    ttl_seconds=app_settings.availability_cache_ttl_seconds, max_entries=512
+)
+# Растет при каждом сбросе: сетка, собранная до сброса, в кэш не попадет
+_availability_generation = 0
 
-        current_dt += timedelta(minutes=30)
+
+def invalidate_availability_cache(*target_dates: Optional[date]) -> None:
+    """
+    Сбросить кэш доступности для указанных дат.
+    Без аргументов сбрасывает кэш целиком (изменение столов или настроек).
+    """
+    global _availability_generation
+    _availability_generation += 1
+    if not target_dates:
+        availability_cache.invalidate()
+        return
+    for target_date in target_dates:
+        if target_date is not None:
+            availability_cache.invalidate(target_date)
+
+
+def _get_cached_base_slots(
+    target_date: date, guest_count: int
+) -> Optional[List[Dict[str, Any]]]:
+    return availability_cache.get(target_date, {}).get(guest_count)
+
+
+def _cache_base_slots(
+    target_date: date,
+    guest_count: int,
+    base_slots: List[Dict[str, Any]],
+    generation: int,
+    hold_expires_in: Optional[float] = None,
+) -> None:
+    """
+    Кладет сетку в кэш, если за время ее сборки (между await) кэш не сбрасывали:
+    иначе сетка могла не увидеть только что закоммиченную бронь.
+    hold_expires_in - секунды до истечения самого раннего холда на дату.
+    """
+    if generation != _availability_generation:
+        return
+    ttl = availability_cache.ttl_seconds
+    if hold_expires_in is not None:
+        ttl = min(ttl, hold_expires_in)
+    cached = availability_cache.get(target_date)
+    if cached is not None:
+        # Сетки других guest_count в записи не должны жить дольше своего срока
+        ttl = min(ttl, availability_cache.expires_in(target_date) or 0)
+    if ttl <= 0:
+        return
+    # Новый словарь вместо изменения закэшированного
+    by_guest_count = dict(cached or {})
+    by_guest_count[guest_count] = base_slots
+    availability_cache.set(target_date, by_guest_count, ttl)
+
+
+async def get_day_availability(
+    db: AsyncSession, target_date: date, guest_count: int
+) -> Dict[str, Any]:
+    """
+    Основная функция для формирования сетки бронирования.
+    """
+    settings = await get_settings(db)
+
+    base_slots = _get_cached_base_slots(target_date, guest_count)
+    if base_slots is None:
+        generation = _availability_generation
+        # 1. Получаем список столов, подходящих по вместимости
+        suitable_table_ids, combine_layout = await _get_grid_tables(db, guest_count)
+
+        base_slots = []
+        hold_expires_in = None
+        # Если посадить такое кол-во гостей нельзя вообще, сетка пустая
+        if suitable_table_ids or combine_layout:
+            # 2. Строим индекс занятости на этот день
+            occupancy = await build_day_occupancy(db, target_date, settings)
+            base_slots = _build_base_slots(
+                occupancy, suitable_table_ids, combine_layout, guest_count
+            )
+            hold_expires_in = (
+                await get_hold_expiry_by_date(db, target_date, target_date)
+            ).get(target_date)
+
+        _cache_base_slots(target_date, guest_count, base_slots, generation, hold_expires_in)
+
+    # 3. Правило min_advance_hours применяется к текущему времени на каждый запрос
+    time_slots = _apply_time_rules(
+        target_date, base_slots, _min_booking_threshold(settings)
+    )
 
     return {
         "date": target_date,
@@ -176,16 +463,107 @@ async def get_day_availability(
     }
 
 
-async def validate_booking_request(db: AsyncSession, booking_data: Any):
+async def get_range_availability(
+    db: AsyncSession,
+    date_from: date,
+    date_to: date,
+    guest_count: int,
+    include_slots: bool = False,
+) -> Dict[str, Any]:
     """
-    Строгая валидация входящего запроса на создание брони.
+    Доступность на диапазон дат (для календаря) за один проход:
+    один запрос настроек, один запрос столов и один запрос броней на весь диапазон
+    (дни, уже лежащие в кэше доступности, не пересчитываются).
+    Для каждого дня возвращается сводка (первый свободный слот, число свободных слотов)
+    и, по запросу, полная сетка слотов.
     """
     settings = await get_settings(db)
 
-    try:
-        tz = ZoneInfo(settings.timezone)
-    except Exception:
-        tz = ZoneInfo("Europe/Moscow")
+    dates = [
+        date_from + timedelta(days=offset)
+        for offset in range((date_to - date_from).days + 1)
+    ]
+    base_slots_by_date = {
+        current_date: _get_cached_base_slots(current_date, guest_count)
+        for current_date in dates
+    }
+    missing_dates = [d for d, slots in base_slots_by_date.items() if slots is None]
+
+    if missing_dates:
+        generation = _availability_generation
+        suitable_table_ids, combine_layout = await _get_grid_tables(db, guest_count)
+
+        intervals_by_date: Dict[date, List[Tuple[int, time]]] = {}
+        hold_expiry_by_date: Dict[date, float] = {}
+        if suitable_table_ids or combine_layout:
+            intervals_by_date = await get_occupied_intervals_by_date(
+                db, missing_dates[0], missing_dates[-1]
+            )
+            hold_expiry_by_date = await get_hold_expiry_by_date(
+                db, missing_dates[0], missing_dates[-1]
+            )
+
+        for current_date in missing_dates:
+            base_slots = []
+            if suitable_table_ids or combine_layout:
+                occupancy = _make_day_occupancy(
+                    current_date, settings, intervals_by_date.get(current_date, [])
+                )
+                base_slots = _build_base_slots(
+                    occupancy, suitable_table_ids, combine_layout, guest_count
+                )
+            _cache_base_slots(
+                current_date,
+                guest_count,
+                base_slots,
+                generation,
+                hold_expiry_by_date.get(current_date),
+            )
+            base_slots_by_date[current_date] = base_slots
+
+    min_booking_threshold = _min_booking_threshold(settings)
+
+    days = []
+    for current_date in dates:
+        time_slots = _apply_time_rules(
+            current_date, base_slots_by_date[current_date], min_booking_threshold
+        )
+
+        available_times = [slot["time"] for slot in time_slots if slot["is_available"]]
+        days.append(
+            {
+                "date": current_date,
+                "is_available": bool(available_times),
+                "first_available_time": available_times[0] if available_times else None,
+                "available_slots_count": len(available_times),
+                "time_slots": time_slots if include_slots else None,
+            }
+        )
+
+    return {
+        "date_from": date_from,
+        "date_to": date_to,
+        "guest_count": guest_count,
+        "days": days,
+        "working_hours": {
+            "open": settings.opening_time,
+            "close": settings.closing_time,
+        },
+        "min_advance_hours": settings.min_advance_hours,
+    }
+
+
+async def validate_booking_request(
+    db: AsyncSession,
+    booking_data: Any,
+    occupancy: Optional[DayOccupancy] = None,
+):
+    """
+    Строгая валидация входящего запроса на создание брони.
+    Можно передать заранее построенный индекс занятости на дату брони.
+    """
+    settings = await get_settings(db)
+    tz = get_timezone(settings)
 
     now = datetime.now(tz)
     booking_dt = datetime.combine(booking_data.date, booking_data.time).replace(
@@ -214,66 +592,230 @@ async def validate_booking_request(db: AsyncSession, booking_data: Any):
                 f"Стол №{table.id} слишком мал для {booking_data.guest_count} гостей."
             )
 
-        occupied = await get_occupied_intervals(
-            db, booking_data.date, settings.booking_duration_hours
-        )
-        slot_end = booking_dt + timedelta(hours=settings.booking_duration_hours)
+        if occupancy is None:
+            occupancy = await build_day_occupancy(db, booking_data.date, settings)
+
+        if not occupancy.is_table_free(booking_data.table_id, booking_data.time):
+            raise ValueError(
+                f"Стол №{booking_data.table_id} уже занят на это время."
+            )
+
+
+async def find_available_tables(
+    db: AsyncSession,
+    date_val: date,
+    time_val: time,
+    guest_count: int,
+    occupancy: Optional[DayOccupancy] = None,
+    preferred_zone: Optional[Zone] = None,
+) -> Optional[List[int]]:
+    """
+    Автоматический подбор свободного стола (см. table_allocator.choose_tables).
+    Возвращает [table_id] или несколько соседних столов для большой компании
+    (основной стол первым). Можно передать заранее построенный индекс занятости.
+    """
+    layout = await get_table_layout(db)
+    if not layout.tables:
+        return None
+
+    if occupancy is None:
+        occupancy = await build_day_occupancy(db, date_val)
 
-        for interval in occupied:
-            if interval["table_id"] == booking_data.table_id:
-                occ_start = interval["start"].replace(tzinfo=tz)
-                occ_end = interval["end"].replace(tzinfo=tz)
+    free_table_ids = set(occupancy.free_tables((t.id for t in layout.tables), time_val))
+    return choose_tables(layout, free_table_ids, guest_count, preferred_zone)
 
-                if booking_dt < occ_end and slot_end > occ_start:
-                    raise ValueError(
-                        f"Стол №{booking_data.table_id} уже занят на это время."
-                    )
 
+# Пространство ключей advisory-локов PostgreSQL для выделения столов
+BOOKING_LOCK_NAMESPACE = 7301
 
-async def find_available_table(
-    db: AsyncSession, date_val: date, time_val: time, guest_count: int
-) -> Optional[int]:
+# Локальные локи по датам для SQLite (один процесс разработки)
+_local_date_locks: "weakref.WeakValueDictionary[date, asyncio.Lock]" = (
+    weakref.WeakValueDictionary()
+)
+
+
+@asynccontextmanager
+async def booking_date_lock(db: AsyncSession, target_date: date) -> AsyncIterator[None]:
     """
-    Автоматический поиск подходящего свободного стола.
+    Сериализует проверку занятости и вставку брони на одну дату,
+    чтобы два параллельных запроса не получили один и тот же стол.
+
+    PostgreSQL: транзакционный advisory-лок на дату (общий для всех воркеров),
+    снимается при commit/rollback текущей транзакции.
+    SQLite: asyncio.Lock внутри процесса.
+
+    Индекс занятости нужно строить и коммитить бронь внутри блока.
     """
-    settings = await get_settings(db)
-    try:
-        tz = ZoneInfo(settings.timezone)
-    except Exception:
-        tz = ZoneInfo("Europe/Moscow")
+    if is_sqlite:
+        lock = _local_date_locks.get(target_date)
+        if lock is None:
+            lock = asyncio.Lock()
+            _local_date_locks[target_date] = lock
+        async with lock:
+            yield
+    else:
+        await db.execute(
+            text("SELECT pg_advisory_xact_lock(:namespace, :key)"),
+            {"namespace": BOOKING_LOCK_NAMESPACE, "key": target_date.toordinal()},
+        )
+        yield
+
+
+async def release_expired_holds(db: AsyncSession) -> int:
+    """
+    Отменяет брони PENDING с истекшим холдом одним UPDATE.
+    Возвращает количество отмененных броней.
 
+    Брони, которым воркер выдал ручную ссылку на оплату (намерение FAILED со
+    ссылкой fallback_payment_url), не отменяются: гость еще может заплатить.
+    Стол за ними после холда все равно свободен, а запоздавшую оплату
+    подтверждает confirming_booking или отдает на ручной разбор.
+    """
+    manual_payment_link = (
+        select(PaymentIntent.id)
+        .where(
+            and_(
+                PaymentIntent.booking_id == Booking.id,
+                PaymentIntent.status == PaymentIntentStatus.FAILED,
+                PaymentIntent.confirmation_url.isnot(None),
+            )
+        )
+        .exists()
+    )
     result = await db.execute(
-        select(Table)
-        .where(and_(Table.is_active == True, Table.seats >= guest_count))
-        .order_by(Table.seats)
+        update(Booking)
+        .where(
+            and_(
+                Booking.status == BookingStatus.PENDING,
+                Booking.created_at < hold_cutoff(),
+                ~manual_payment_link,
+            )
+        )
+        .values(status=BookingStatus.CANCELLED)
+        .returning(
+            Booking.date, Booking.table_id, Booking.guest_count, Booking.deposit_amount
+        )
+        .execution_options(synchronize_session=False)
     )
-    candidate_tables = result.scalars().all()
+    released = result.all()
+    released_dates = [row.date for row in released]
+
+    # Дневная сводка: каждая отмененная бронь переходит PENDING -> CANCELLED
+    changes = []
+    for row in released:
+        facts = BookingFacts(
+            row.date, row.table_id, BookingStatus.PENDING, row.guest_count, row.deposit_amount
+        )
+        changes.append((facts, facts._replace(status=BookingStatus.CANCELLED)))
+    await record_booking_changes(db, changes)
+    await db.commit()
 
-    if not candidate_tables:
-        return None
+    if released_dates:
+        invalidate_availability_cache(*set(released_dates))
+    return len(released_dates)
+
+
+# Переходы статуса по событиям оплаты: только из PENDING в конечное состояние.
+# Повторный или запоздавший вебхук не меняет подтвержденную или отмененную
+# бронь; ручная смена статуса в админке идет мимо этой таблицы.
+BOOKING_STATUS_TRANSITIONS: Dict[BookingStatus, FrozenSet[BookingStatus]] = {
+    BookingStatus.PENDING: frozenset({BookingStatus.CONFIRMED, BookingStatus.CANCELLED}),
+}
 
-    occupied = await get_occupied_intervals(
-        db, date_val, settings.booking_duration_hours
+
+def can_transition(current: BookingStatus, target: BookingStatus) -> bool:
+    """Whether the booking status may move from current to target."""
+    return target in BOOKING_STATUS_TRANSITIONS.get(current, frozenset())
+
+
+def hold_expired(booking: Booking) -> bool:
+    """Холд PENDING-брони истек: стол уже считается свободным (_occupied_bookings_query)."""
+    return booking.created_at is not None and booking.created_at < hold_cutoff()
+
+
+async def _compare_and_set_status(
+    db: AsyncSession, booking: Booking, target: BookingStatus, *conditions
+) -> bool:
+    """UPDATE статуса при условии, что в БД он все еще тот, который видели."""
+    before = booking_facts(booking)
+    result = await db.execute(
+        update(Booking)
+        .where(and_(Booking.id == booking.id, Booking.status == booking.status, *conditions))
+        .values(status=target)
+        .returning(Booking.id)
+        .execution_options(synchronize_session=False)
     )
+    if result.scalar_one_or_none() is None:
+        return False
+    set_committed_value(booking, "status", target)
+    await record_booking_change(db, before, booking_facts(booking))
+    return True
 
-    booking_start = datetime.combine(date_val, time_val).replace(tzinfo=tz)
-    booking_end = booking_start + timedelta(hours=settings.booking_duration_hours)
 
-    for table in candidate_tables:
-        is_busy = False
-        for interval in occupied:
-            if interval["table_id"] == table.id:
-                occ_start = interval["start"].replace(tzinfo=tz)
-                occ_end = interval["end"].replace(tzinfo=tz)
+async def transition_booking_status(
+    db: AsyncSession, booking: Booking, target: BookingStatus
+) -> bool:
+    """
+    Переводит бронь в статус target, если это разрешает BOOKING_STATUS_TRANSITIONS.
 
-                if booking_start < occ_end and booking_end > occ_start:
-                    is_busy = True
-                    break
+    UPDATE проверяет, что статус в БД все еще тот, который видели
+    (compare-and-set), поэтому параллельное изменение (другой вебхук,
+    снятие холда) не перезаписывается: статус перечитывается и проверка
+    повторяется. Дневная сводка обновляется здесь же, коммит делает
+    вызывающий код. Возвращает True, если статус изменен.
 
-        if not is_busy:
-            return table.id
+    Бронь со столом подтверждается только пока ее холд действует: после
+    истечения стол мог занять другой гость, такую бронь подтверждает
+    confirming_booking с повторной проверкой стола.
+    """
+    while can_transition(booking.status, target):
+        guard_hold = (
+            target == BookingStatus.CONFIRMED
+            and booking.status == BookingStatus.PENDING
+            and booking.table_id is not None
+        )
+        conditions = [Booking.created_at >= hold_cutoff()] if guard_hold else []
+        if await _compare_and_set_status(db, booking, target, *conditions):
+            return True
+        await db.refresh(booking, attribute_names=["status", "created_at"])
+        if guard_hold and booking.status == BookingStatus.PENDING:
+            # Холд истек - без лока даты не подтверждаем
+            return False
+    return False
+
+
+async def _confirm_expired_hold(db: AsyncSession, booking: Booking) -> bool:
+    """Подтверждает бронь с истекшим холдом, если ее столы все еще свободны (под локом даты)."""
+    occupancy = await build_day_occupancy(db, booking.date)
+    table_ids = [booking.table_id, *booking.extra_table_ids]
+    if not all(occupancy.is_table_free(table_id, booking.time) for table_id in table_ids):
+        return False
+    return await _compare_and_set_status(db, booking, BookingStatus.CONFIRMED)
+
+
+@asynccontextmanager
+async def confirming_booking(db: AsyncSession, booking: Booking) -> AsyncIterator[bool]:
+    """
+    Подтверждение оплаченной брони. Выдает True, если бронь переведена в
+    CONFIRMED; коммитить нужно внутри блока.
 
-    return None
+    Пока холд действует, стол за бронью закреплен, и хватает compare-and-set.
+    Если холд истек, стол мог занять другой гость: под booking_date_lock
+    занятость проверяется заново, и при занятом столе бронь остается
+    неподтвержденной (оплату нужно разобрать вручную).
+    """
+    if not (
+        booking.status == BookingStatus.PENDING
+        and booking.table_id is not None
+        and hold_expired(booking)
+    ):
+        confirmed = await transition_booking_status(db, booking, BookingStatus.CONFIRMED)
+        if confirmed or booking.status != BookingStatus.PENDING or booking.table_id is None:
+            yield confirmed
+            return
+
+    async with booking_date_lock(db, booking.date):
+        yield await _confirm_expired_hold(db, booking)
 
 
 def calculate_deposit_amount(guests_count: int) -> float:
@@ -1,83 +1,234 @@
 """
 Email service for sending verification codes.
+
+Emails are put on an in-process queue and delivered by a background worker,
+so request handlers never wait for SMTP. The worker keeps one SMTP
+connection open between messages and runs the blocking smtplib calls in a
+dedicated thread.
 """
+import asyncio
 import smtplib
 import os
+import time
+from concurrent.futures import ThreadPoolExecutor
 from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
-from typing import Optional
+from typing import NamedTuple, Optional
 import logging
 
+from app.database import settings
+
 logger = logging.getLogger(__name__)
 
+# Хосты локального отладочного SMTP-сервера: для них логин не нужен
+# (например, python -m aiosmtpd -n -l localhost:1025)
+LOCAL_SMTP_HOSTS = ("localhost", "127.0.0.1")
+
+
+class EmailJob(NamedTuple):
+    """Message waiting for delivery and the number of failed attempts so far."""
+
+    message: MIMEMultipart
+    attempts: int = 0
+
 
 class EmailService:
     """Service for sending emails."""
-    
-    def __init__(self):
+
+    def __init__(
+        self,
+        queue_size: int,
+        max_attempts: int,
+        retry_base_seconds: float,
+        idle_timeout_seconds: float,
+    ):
         self.smtp_host = os.getenv("SMTP_HOST", "smtp.gmail.com")
         self.smtp_port = int(os.getenv("SMTP_PORT", "587"))
         self.smtp_user = os.getenv("SMTP_USER", "")
         self.smtp_password = os.getenv("SMTP_PASSWORD", "")
-        self.from_email = os.getenv("FROM_EMAIL", self.smtp_user)
+        # Без логина (локальный отладочный сервер) отправителя берем условного
+        self.from_email = os.getenv("FROM_EMAIL", self.smtp_user) or "noreply@localhost"
         self.use_tls = os.getenv("SMTP_USE_TLS", "true").lower() == "true"
-    
-    async def send_verification_code(self, email: str, code: str) -> bool:
+        self.use_ssl = os.getenv("SMTP_SSL", "false").lower() == "true"
+
+        self.max_attempts = max_attempts
+        self.retry_base_seconds = retry_base_seconds
+        self.idle_timeout_seconds = idle_timeout_seconds
+        self._queue: "asyncio.Queue[EmailJob]" = asyncio.Queue(maxsize=queue_size)
+        self._task: Optional[asyncio.Task] = None
+        # Один поток: соединение SMTP используется строго последовательно
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._smtp: Optional[smtplib.SMTP] = None
+
+    @property
+    def is_configured(self) -> bool:
+        """SMTP credentials are set, or a local debug server is used."""
+        return bool(self.smtp_user and self.smtp_password) or self.smtp_host in LOCAL_SMTP_HOSTS
+
+    def start(self) -> None:
+        """Start the delivery worker on the running event loop."""
+        if self._task is None or self._task.done():
+            self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="smtp")
+            self._task = asyncio.create_task(self._run(), name="email-sender")
+
+    async def stop(self) -> None:
+        """Stop the worker and close the SMTP connection (queued emails are dropped)."""
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+
+        if self._queue.qsize():
+            logger.warning(f"{self._queue.qsize()} queued emails were not sent")
+        await asyncio.get_running_loop().run_in_executor(self._executor, self._close)
+        self._executor.shutdown(wait=False)
+        self._executor = None
+
+    def enqueue(self, message: MIMEMultipart) -> bool:
+        """Queue a message for delivery. Returns False if the queue is full."""
+        try:
+            self._queue.put_nowait(EmailJob(message))
+            return True
+        except asyncio.QueueFull:
+            logger.error(f"Email queue is full, message to {message['To']} dropped")
+            return False
+
+    def enqueue_verification_code(self, email: str, code: str) -> bool:
         """
-        Send verification code to email.
-        Returns True if sent successfully, False otherwise.
+        Queue the verification code email and return immediately.
+        Returns True if queued, False otherwise (the code is then logged).
         """
-        if not self.smtp_user or not self.smtp_password:
+        if not self.is_configured:
             logger.warning("SMTP credentials not configured. Email will not be sent.")
             logger.info(f"Verification code for {email}: {code}")
             return False
-        
-        try:
-            # Create message
-            msg = MIMEMultipart()
-            msg['From'] = self.from_email
-            msg['To'] = email
-            msg['Subject'] = "Код подтверждения - Трактир Сеновал"
-            
-            # Email body
-            body = f"""
-            <html>
-                <body style="font-family: Arial, sans-serif; line-height: 1.6; color: #333;">
-                    <div style="max-width: 600px; margin: 0 auto; padding: 20px;">
-                        <h2 style="color: #D4AF37;">Трактир Сеновал</h2>
-                        <p>Здравствуйте!</p>
-                        <p>Ваш код подтверждения для регистрации:</p>
-                        <div style="background-color: #f4f4f4; padding: 20px; text-align: center; margin: 20px 0;">
-                            <h1 style="color: #D4AF37; font-size: 32px; letter-spacing: 8px; margin: 0;">{code}</h1>
-                        </div>
-                        <p>Код действителен в течение 10 минут.</p>
-                        <p style="color: #666; font-size: 12px; margin-top: 30px;">
-                            Если вы не запрашивали этот код, проигнорируйте это письмо.
-                        </p>
-                    </div>
-                </body>
-            </html>
-            """
-            
-            msg.attach(MIMEText(body, 'html', 'utf-8'))
-            
-            # Send email
-            with smtplib.SMTP(self.smtp_host, self.smtp_port) as server:
-                if self.use_tls:
-                    server.starttls()
-                server.login(self.smtp_user, self.smtp_password)
-                server.send_message(msg)
-            
-            logger.info(f"Verification code sent to {email}")
-            return True
-            
-        except Exception as e:
-            logger.error(f"Failed to send email to {email}: {str(e)}")
-            # In development, log the code instead
+
+        if not self.enqueue(self._verification_message(email, code)):
             logger.info(f"Verification code for {email}: {code}")
             return False
+        return True
 
+    def _verification_message(self, email: str, code: str) -> MIMEMultipart:
+        msg = MIMEMultipart()
+        msg['From'] = self.from_email
+        msg['To'] = email
+        msg['Subject'] = "Код подтверждения - Трактир Сеновал"
 
-# Global instance
-email_service = EmailService()
+        # Email body
+        body = f"""
+        <html>
+            <body style="font-family: Arial, sans-serif; line-height: 1.6; color: #333;">
+                <div style="max-width: 600px; margin: 0 auto; padding: 20px;">
+                    <h2 style="color: #D4AF37;">Трактир Сеновал</h2>
+                    <p>Здравствуйте!</p>
+                    <p>Ваш код подтверждения для регистрации:</p>
+                    <div style="background-color: #f4f4f4; padding: 20px; text-align: center; margin: 20px 0;">
+                        <h1 style="color: #D4AF37; font-size: 32px; letter-spacing: 8px; margin: 0;">{code}</h1>
+                    </div>
+                    <p>Код действителен в течение 10 минут.</p>
+                    <p style="color: #666; font-size: 12px; margin-top: 30px;">
+                        Если вы не запрашивали этот код, проигнорируйте это письмо.
+                    </p>
+                </div>
+            </body>
+        </html>
+        """
+
+        msg.attach(MIMEText(body, 'html', 'utf-8'))
+        return msg
+
+    # ---- Выполняется в потоке SMTP ----
+
+    def _connect(self) -> smtplib.SMTP:
+        if self.use_ssl:
+            server = smtplib.SMTP_SSL(self.smtp_host, self.smtp_port, timeout=30)
+        else:
+            server = smtplib.SMTP(self.smtp_host, self.smtp_port, timeout=30)
+            if self.use_tls:
+                server.starttls()
+        if self.smtp_user and self.smtp_password:
+            server.login(self.smtp_user, self.smtp_password)
+        return server
+
+    def _close(self) -> None:
+        if self._smtp is None:
+            return
+        try:
+            self._smtp.quit()
+        except (smtplib.SMTPException, OSError):
+            self._smtp.close()
+        self._smtp = None
+
+    def _send(self, message: MIMEMultipart) -> None:
+        if self._smtp is None:
+            self._smtp = self._connect()
+        try:
+            self._smtp.send_message(message)
+        except smtplib.SMTPServerDisconnected:
+            # Сервер закрыл простаивающее соединение - переподключаемся один раз
+            self._smtp = self._connect()
+            self._smtp.send_message(message)
 
+    # ---- Воркер ----
+
+    async def _deliver(self, job: EmailJob) -> None:
+        loop = asyncio.get_running_loop()
+        started = time.perf_counter()
+        try:
+            await loop.run_in_executor(self._executor, self._send, job.message)
+        except (smtplib.SMTPException, OSError) as e:
+            await loop.run_in_executor(self._executor, self._close)
+            attempts = job.attempts + 1
+            if attempts >= self.max_attempts:
+                logger.error(
+                    f"Failed to send email to {job.message['To']} after {attempts} attempts: {str(e)}"
+                )
+                return
+            delay = self.retry_base_seconds * 2 ** (attempts - 1)
+            logger.warning(
+                f"Failed to send email to {job.message['To']} (attempt {attempts}), "
+                f"retrying in {delay:.0f}s: {str(e)}"
+            )
+            # Повтор через очередь: остальные письма не ждут окончания паузы
+            loop.call_later(delay, self._requeue, job._replace(attempts=attempts))
+            return
+
+        logger.info(
+            f"Email sent to {job.message['To']} in {(time.perf_counter() - started) * 1000:.0f} ms"
+        )
+
+    def _requeue(self, job: EmailJob) -> None:
+        try:
+            self._queue.put_nowait(job)
+        except asyncio.QueueFull:
+            logger.error(f"Email queue is full, retry to {job.message['To']} dropped")
+
+    async def _run(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            try:
+                job = await asyncio.wait_for(self._queue.get(), self.idle_timeout_seconds)
+            except asyncio.TimeoutError:
+                # Писем давно не было - не держим соединение открытым
+                await loop.run_in_executor(self._executor, self._close)
+                continue
+
+            try:
+                await self._deliver(job)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Email sender error: {str(e)}", exc_info=True)
+
+
+# Global instance
+email_service = EmailService(
+    queue_size=settings.email_queue_size,
+    max_attempts=settings.email_max_attempts,
+    retry_base_seconds=settings.email_retry_base_seconds,
+    idle_timeout_seconds=settings.email_idle_timeout_seconds,
+)
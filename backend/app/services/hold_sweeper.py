@@ -0,0 +1,57 @@
+"""
+Background sweeper that releases expired PENDING booking holds.
+"""
+import asyncio
+import logging
+from typing import Optional
+
+from app.database import AsyncSessionLocal, settings
+from app.services.booking_service import release_expired_holds
+
+logger = logging.getLogger(__name__)
+
+
+class HoldSweeper:
+    """Periodically cancels PENDING bookings whose hold window has expired."""
+
+    def __init__(self, interval_seconds: int):
+        self.interval_seconds = interval_seconds
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self) -> None:
+        """Start the sweeper loop on the running event loop."""
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run(), name="hold-sweeper")
+
+    async def stop(self) -> None:
+        """Stop the sweeper loop."""
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+
+    async def sweep_once(self) -> int:
+        """Run a single sweep and return the number of released holds."""
+        async with AsyncSessionLocal() as db:
+            released = await release_expired_holds(db)
+        if released:
+            logger.info(f"Released {released} expired booking holds")
+        return released
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                await self.sweep_once()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Hold sweeper error: {str(e)}", exc_info=True)
+            await asyncio.sleep(self.interval_seconds)
+
+
+# Global instance
+hold_sweeper = HoldSweeper(settings.hold_sweep_interval_seconds)
@@ -0,0 +1,103 @@
+"""
+Application-scoped HTTP clients for external APIs (YooKassa, Telegram, Yandex OAuth).
+"""
+
+import importlib.util
+import logging
+from typing import Dict, NamedTuple, Optional
+
+import httpx
+
+from app.database import settings
+
+logger = logging.getLogger(__name__)
+
+# Имена upstream-сервисов
+YOOKASSA = "yookassa"
+TELEGRAM = "telegram"
+YANDEX_OAUTH = "yandex_oauth"
+
+# HTTP/2 нужен пакет h2 (httpx[http2]); без него клиенты работают по HTTP/1.1 с keep-alive
+HTTP2_AVAILABLE = importlib.util.find_spec("h2") is not None
+
+
+class UpstreamConfig(NamedTuple):
+    """Connection settings of one upstream."""
+
+    base_url: str
+    timeout: httpx.Timeout
+    limits: httpx.Limits
+
+
+UPSTREAMS: Dict[str, UpstreamConfig] = {
+    YOOKASSA: UpstreamConfig(
+        settings.yookassa_api_url,
+        httpx.Timeout(30.0, connect=5.0),
+        httpx.Limits(max_connections=20, max_keepalive_connections=10, keepalive_expiry=60),
+    ),
+    TELEGRAM: UpstreamConfig(
+        settings.telegram_api_url,
+        httpx.Timeout(10.0, connect=5.0),
+        httpx.Limits(max_connections=10, max_keepalive_connections=5, keepalive_expiry=60),
+    ),
+    # oauth.yandex.ru и login.yandex.ru: у httpx отдельный пул соединений на каждый хост
+    YANDEX_OAUTH: UpstreamConfig(
+        "",
+        httpx.Timeout(10.0, connect=5.0),
+        httpx.Limits(max_connections=20, max_keepalive_connections=10, keepalive_expiry=60),
+    ),
+}
+
+
+class HttpClients:
+    """
+    One httpx.AsyncClient per upstream, shared by all requests of the process.
+
+    A client keeps a pool of open connections, so DNS, TCP and TLS handshakes
+    happen once per connection instead of on every call. Clients are opened
+    in the app lifespan (or lazily on first use in scripts) and closed on
+    shutdown.
+    """
+
+    def __init__(self, upstreams: Dict[str, UpstreamConfig]):
+        self.upstreams = upstreams
+        self._clients: Dict[str, httpx.AsyncClient] = {}
+
+    def _create(self, name: str) -> httpx.AsyncClient:
+        config = self.upstreams[name]
+        return httpx.AsyncClient(
+            base_url=config.base_url,
+            timeout=config.timeout,
+            limits=config.limits,
+            http2=HTTP2_AVAILABLE,
+        )
+
+    def open(self) -> None:
+        """Create clients for all upstreams."""
+        for name in self.upstreams:
+            self.get(name)
+        logger.info(f"HTTP clients ready: {', '.join(self._clients)} (HTTP/2: {HTTP2_AVAILABLE})")
+
+    def get(self, name: str) -> httpx.AsyncClient:
+        """Client of the upstream, created on first use."""
+        client = self._clients.get(name)
+        if client is None or client.is_closed:
+            client = self._clients[name] = self._create(name)
+        return client
+
+    def override(self, name: str, client: Optional[httpx.AsyncClient]) -> None:
+        """Replace the client of an upstream (mock transports in tests and benchmarks)."""
+        if client is None:
+            self._clients.pop(name, None)
+        else:
+            self._clients[name] = client
+
+    async def aclose(self) -> None:
+        """Close all clients and their connection pools."""
+        for client in self._clients.values():
+            await client.aclose()
+        self._clients.clear()
+
+
+# Global instance
+http_clients = HttpClients(UPSTREAMS)
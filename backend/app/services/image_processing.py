@@ -0,0 +1,53 @@
+"""
+Image processing - resizes uploads into WebP derivatives.
+
+Runs inside worker processes (see image_store.ImageProcessor), so this module
+must stay importable without the rest of the application.
+"""
+
+import io
+from typing import List, Tuple
+
+from PIL import Image, ImageOps
+
+# Ширины производных изображений: миниатюра, экран телефона, полный размер
+VARIANT_WIDTHS = (320, 800, 1600)
+WEBP_QUALITY = 80
+
+# Защита от "декомпрессионных бомб": ~ 40 мегапикселей хватает любой камере телефона
+Image.MAX_IMAGE_PIXELS = 40_000_000
+
+
+def render_variants(data: bytes) -> List[Tuple[int, bytes]]:
+    """
+    Normalise an uploaded image and render WebP variants.
+
+    Applies EXIF orientation, drops all metadata (EXIF, GPS, ICC), converts
+    to RGB/RGBA and downsizes to each of VARIANT_WIDTHS. Widths larger than
+    the original are skipped, the original width is used instead.
+    Returns [(width, webp_bytes)] sorted by width.
+    """
+    with Image.open(io.BytesIO(data)) as source:
+        source.load()
+        image = ImageOps.exif_transpose(source)
+
+    has_alpha = image.mode in ("RGBA", "LA") or (
+        image.mode == "P" and "transparency" in image.info
+    )
+    image = image.convert("RGBA" if has_alpha else "RGB")
+
+    widths = sorted({min(width, image.width) for width in VARIANT_WIDTHS})
+    variants = []
+    for width in widths:
+        if width == image.width:
+            resized = image
+        else:
+            height = max(1, round(image.height * width / image.width))
+            resized = image.resize((width, height), Image.Resampling.LANCZOS)
+
+        buffer = io.BytesIO()
+        # Сохраняем без exif/icc_profile - метаданные в публичные файлы не попадают
+        resized.save(buffer, format="WEBP", quality=WEBP_QUALITY, method=4)
+        variants.append((width, buffer.getvalue()))
+
+    return variants
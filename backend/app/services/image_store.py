@@ -0,0 +1,229 @@
+"""
+Image store - keeps uploaded images as content-addressed files instead of Base64 in the database.
+"""
+
+import abc
+import asyncio
+import base64
+import binascii
+import hashlib
+import logging
+import multiprocessing
+import os
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Dict, List, Optional, Tuple
+
+from PIL import Image, UnidentifiedImageError
+from starlette.staticfiles import StaticFiles
+
+from app.database import settings
+from app.services.image_processing import render_variants
+
+logger = logging.getLogger(__name__)
+
+# Сигнатуры поддерживаемых форматов -> расширение файла
+IMAGE_SIGNATURES = (
+    (b"\xff\xd8\xff", "jpg"),
+    (b"\x89PNG\r\n\x1a\n", "png"),
+    (b"GIF87a", "gif"),
+    (b"GIF89a", "gif"),
+)
+
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+
+
+class ImageStoreError(ValueError):
+    """Uploaded value is not a supported image."""
+
+
+def detect_image_type(data: bytes) -> Optional[str]:
+    """Return file extension for supported image bytes, or None."""
+    if data[:4] == b"RIFF" and data[8:12] == b"WEBP":
+        return "webp"
+    for signature, extension in IMAGE_SIGNATURES:
+        if data.startswith(signature):
+            return extension
+    return None
+
+
+def is_inline_image(value: Optional[str]) -> bool:
+    """True for a data URL or a bare Base64 payload (not an http(s) or relative URL)."""
+    if not value:
+        return False
+    if value.startswith("data:"):
+        return True
+    return not value.startswith(("http://", "https://", "/")) and len(value) > 256
+
+
+def decode_inline_image(value: str) -> Tuple[bytes, str]:
+    """
+    Decode a data URL ("data:image/png;base64,...") or bare Base64 string.
+    Returns (bytes, extension); raises ImageStoreError for anything that is not an image.
+    """
+    payload = value
+    if value.startswith("data:"):
+        header, _, payload = value.partition(",")
+        if ";base64" not in header:
+            raise ImageStoreError("Изображение должно быть в формате Base64")
+
+    try:
+        data = base64.b64decode(payload, validate=False)
+    except (binascii.Error, ValueError):
+        raise ImageStoreError("Некорректные данные изображения")
+
+    if len(data) > settings.max_image_bytes:
+        raise ImageStoreError("Изображение слишком большое")
+
+    extension = detect_image_type(data)
+    if extension is None:
+        raise ImageStoreError("Неподдерживаемый формат изображения (JPEG, PNG, GIF, WebP)")
+    return data, extension
+
+
+class ImageStore(abc.ABC):
+    """
+    Backend interface: put() saves bytes and returns a public URL.
+    Keys are content hashes, so files never change and can be cached forever.
+    """
+
+    @abc.abstractmethod
+    def put(self, data: bytes, extension: str) -> str:
+        """Save bytes and return their public URL."""
+
+    @abc.abstractmethod
+    def get(self, url: str) -> Optional[bytes]:
+        """Bytes of a file stored by this backend, None for foreign URLs."""
+
+    @abc.abstractmethod
+    def delete(self, url: str) -> None:
+        """Remove a file stored by this backend; foreign URLs are ignored."""
+
+    @staticmethod
+    def make_key(data: bytes, extension: str) -> str:
+        digest = hashlib.sha256(data).hexdigest()
+        # Два уровня каталогов, чтобы не складывать тысячи файлов в одну папку
+        return f"{digest[:2]}/{digest[2:4]}/{digest}.{extension}"
+
+
+class LocalImageStore(ImageStore):
+    """Files on local disk under root, served by the API at base_url."""
+
+    def __init__(self, root: str, base_url: str):
+        self.root = os.path.abspath(root)
+        self.base_url = base_url.rstrip("/")
+
+    def _path_for_url(self, url: str) -> Optional[str]:
+        if not url.startswith(self.base_url + "/"):
+            return None
+        key = url[len(self.base_url) + 1:]
+        path = os.path.abspath(os.path.join(self.root, *key.split("/")))
+        return path if path.startswith(self.root + os.sep) else None
+
+    def get(self, url: str) -> Optional[bytes]:
+        path = self._path_for_url(url)
+        if path is None or not os.path.exists(path):
+            return None
+        with open(path, "rb") as f:
+            return f.read()
+
+    def delete(self, url: str) -> None:
+        path = self._path_for_url(url)
+        if path is not None and os.path.exists(path):
+            os.remove(path)
+
+    def put(self, data: bytes, extension: str) -> str:
+        key = self.make_key(data, extension)
+        path = os.path.join(self.root, *key.split("/"))
+
+        if not os.path.exists(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            # Атомарная запись: читатели никогда не видят недописанный файл
+            fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+            try:
+                with os.fdopen(fd, "wb") as f:
+                    f.write(data)
+                os.replace(tmp_path, path)
+            except Exception:
+                if os.path.exists(tmp_path):
+                    os.remove(tmp_path)
+                raise
+            logger.info(f"Stored image {key} ({len(data)} bytes)")
+
+        return f"{self.base_url}/{key}"
+
+
+class ImmutableStaticFiles(StaticFiles):
+    """StaticFiles with long-lived caching: content-addressed files never change."""
+
+    def file_response(self, *args, **kwargs):
+        response = super().file_response(*args, **kwargs)
+        response.headers["Cache-Control"] = IMMUTABLE_CACHE_CONTROL
+        return response
+
+
+class ImageProcessor:
+    """
+    Process pool for image resizing: decoding and encoding large photos is
+    CPU-bound and would block the event loop for hundreds of milliseconds.
+    """
+
+    def __init__(self, workers: int):
+        self.workers = workers
+        self._executor: Optional[ProcessPoolExecutor] = None
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        if self._executor is None:
+            # spawn: дочерние процессы не наследуют event loop и соединения с БД
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.workers,
+                mp_context=multiprocessing.get_context("spawn"),
+            )
+        return self._executor
+
+    async def render(self, data: bytes) -> List[Tuple[int, bytes]]:
+        loop = asyncio.get_running_loop()
+        try:
+            return await loop.run_in_executor(self._get_executor(), render_variants, data)
+        except BrokenProcessPool:
+            # Воркер упал (например, OOM на огромной картинке) - следующий запрос создаст новый пул
+            self.shutdown()
+            raise
+        except (UnidentifiedImageError, Image.DecompressionBombError, OSError) as e:
+            logger.warning(f"Image processing failed: {str(e)}")
+            raise ImageStoreError("Не удалось обработать изображение")
+
+    def shutdown(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+
+def build_srcset(variants: List[Dict[str, Any]]) -> str:
+    """srcset attribute value: "url 320w, url 800w, ..."."""
+    return ", ".join(f"{variant['url']} {variant['width']}w" for variant in variants)
+
+
+def store_variants(rendered: List[Tuple[int, bytes]]) -> List[Dict[str, Any]]:
+    """Save rendered variants; returns [{"url", "width"}] sorted by width."""
+    return [
+        {"url": image_store.put(webp, "webp"), "width": width}
+        for width, webp in rendered
+    ]
+
+
+async def store_upload(value: str) -> List[Dict[str, Any]]:
+    """
+    Process an inline Base64 upload into stored WebP variants.
+    The largest variant is the main image URL; the original (with its EXIF) is not kept.
+    """
+    data, _ = decode_inline_image(value)
+    rendered = await image_processor.render(data)
+    # Запись на диск не должна блокировать event loop
+    return await asyncio.to_thread(store_variants, rendered)
+
+
+# Global instances
+image_store: ImageStore = LocalImageStore(settings.media_root, settings.media_base_url)
+image_processor = ImageProcessor(settings.image_workers)
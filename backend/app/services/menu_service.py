@@ -0,0 +1,138 @@
+"""
+Menu service - precomputed menu snapshot for the public menu endpoint.
+"""
+
+import asyncio
+import enum
+import hashlib
+from typing import Dict, List, NamedTuple, Optional
+
+from pydantic import BaseModel, TypeAdapter
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import load_only
+
+from app.database import settings
+from app.models import MenuCategory, MenuItem
+from app.schemas import (
+    MenuCategoryCompact,
+    MenuCategoryWithItems,
+    MenuItemCompact,
+    MenuItemRead,
+)
+from app.services.cache import TTLCache
+
+
+class MenuView(str, enum.Enum):
+    """Menu representation: full (descriptions, images) or compact (titles and prices)."""
+
+    FULL = "full"
+    COMPACT = "compact"
+
+
+# Схемы и колонки для каждого представления. Компактное меню не читает
+# description и image_* - это самые тяжелые колонки таблицы.
+VIEW_SCHEMAS = {
+    MenuView.FULL: (MenuCategoryWithItems, MenuItemRead),
+    MenuView.COMPACT: (MenuCategoryCompact, MenuItemCompact),
+}
+COMPACT_COLUMNS = (
+    MenuItem.id,
+    MenuItem.title,
+    MenuItem.price,
+    MenuItem.weight,
+    MenuItem.category_id,
+    MenuItem.is_spicy,
+    MenuItem.is_vegan,
+)
+
+menu_adapters = {
+    view: TypeAdapter(List[category_schema])
+    for view, (category_schema, _) in VIEW_SCHEMAS.items()
+}
+menu_adapter = menu_adapters[MenuView.FULL]
+
+# Меню меняется несколько раз в неделю: готовый JSON живет до изменения через API.
+# TTL нужен только для других воркеров uvicorn, до которых не доходит invalidate.
+menu_cache = TTLCache(ttl_seconds=settings.menu_cache_ttl_seconds, max_entries=len(MenuView))
+_build_lock = asyncio.Lock()
+# Растет при каждом изменении меню: снимок, собранный до изменения, в кэш не попадет
+_generation = 0
+
+
+class MenuSnapshot(NamedTuple):
+    """Serialized menu and its strong ETag (hash of the bytes)."""
+
+    body: bytes
+    etag: str
+
+
+def make_etag(body: bytes) -> str:
+    return '"' + hashlib.sha256(body).hexdigest()[:32] + '"'
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """If-None-Match check (weak comparison, as required for GET)."""
+    if not if_none_match:
+        return False
+    for candidate in if_none_match.split(","):
+        candidate = candidate.strip()
+        if candidate == "*" or candidate.removeprefix("W/") == etag:
+            return True
+    return False
+
+
+async def build_menu(db: AsyncSession, view: MenuView = MenuView.FULL) -> List[BaseModel]:
+    """Categories with their items, in a stable order."""
+    category_schema, item_schema = VIEW_SCHEMAS[view]
+
+    categories = (
+        await db.execute(select(MenuCategory).order_by(MenuCategory.sort_order, MenuCategory.id))
+    ).scalars().all()
+
+    items_query = select(MenuItem).order_by(MenuItem.id)
+    if view == MenuView.COMPACT:
+        items_query = items_query.options(load_only(*COMPACT_COLUMNS))
+    items = (await db.execute(items_query)).scalars().all()
+
+    # Группировка за один проход вместо перебора всех блюд для каждой категории
+    items_by_category: Dict[int, List[BaseModel]] = {}
+    for item in items:
+        items_by_category.setdefault(item.category_id, []).append(
+            item_schema.model_validate(item)
+        )
+
+    return [
+        category_schema(
+            id=category.id,
+            title=category.title,
+            sort_order=category.sort_order,
+            items=items_by_category.get(category.id, []),
+        )
+        for category in categories
+    ]
+
+
+async def get_menu_snapshot(db: AsyncSession, view: MenuView = MenuView.FULL) -> MenuSnapshot:
+    """Return the cached snapshot of a view, building it once after each change."""
+    snapshot = menu_cache.get(view)
+    if snapshot is not None:
+        return snapshot
+
+    # Один построитель на воркер: остальные запросы ждут готовый снимок
+    async with _build_lock:
+        snapshot = menu_cache.get(view)
+        if snapshot is None:
+            generation = _generation
+            body = menu_adapters[view].dump_json(await build_menu(db, view))
+            snapshot = MenuSnapshot(body=body, etag=make_etag(body))
+            if generation == _generation:
+                menu_cache.set(view, snapshot)
+    return snapshot
+
+
+def invalidate_menu_snapshot() -> None:
+    """Drop the snapshots of all views (call after any category/item change)."""
+    global _generation
+    _generation += 1
+    menu_cache.invalidate()
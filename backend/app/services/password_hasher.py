@@ -0,0 +1,106 @@
+"""
+Bounded thread pool for bcrypt hashing and verification.
+"""
+
+import asyncio
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Optional
+
+from app.database import settings
+
+logger = logging.getLogger(__name__)
+
+# Ожидание свободного потока дольше этого порога попадает в лог
+SLOW_WAIT_SECONDS = 1.0
+
+
+class PasswordHasherBusy(Exception):
+    """Too many password operations are already waiting for a worker thread."""
+
+
+class PasswordHasher:
+    """
+    Runs bcrypt calls in a dedicated thread pool: one call takes ~200-300 ms
+    of CPU and would block the event loop for every other request.
+    bcrypt releases the GIL, so threads run in parallel.
+
+    Concurrency is limited by a semaphore of the pool size, so the wait
+    happens on the event loop where it can be measured. The queue is
+    bounded: past max_queue waiting calls new ones fail fast with
+    PasswordHasherBusy instead of piling up.
+    """
+
+    def __init__(self, workers: int, max_queue: int):
+        self.workers = workers
+        self.max_queue = max_queue
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._slots: Optional[asyncio.Semaphore] = None
+        self._waiting = 0
+        self._running = 0
+        self._completed = 0
+        self._rejected = 0
+        self._total_wait = 0.0
+        self._max_wait = 0.0
+
+    def _get_executor(self) -> ThreadPoolExecutor:
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(
+                max_workers=self.workers, thread_name_prefix="bcrypt"
+            )
+            self._slots = asyncio.Semaphore(self.workers)
+        return self._executor
+
+    async def run(self, func: Callable[..., Any], *args: Any) -> Any:
+        """Run func(*args) in the pool, waiting in the bounded queue if all threads are busy."""
+        executor = self._get_executor()
+        if self._waiting >= self.max_queue:
+            self._rejected += 1
+            raise PasswordHasherBusy()
+
+        queued_at = time.monotonic()
+        self._waiting += 1
+        try:
+            await self._slots.acquire()
+        finally:
+            self._waiting -= 1
+
+        wait = time.monotonic() - queued_at
+        self._total_wait += wait
+        self._max_wait = max(self._max_wait, wait)
+        if wait > SLOW_WAIT_SECONDS:
+            logger.warning(f"Password hashing waited {wait:.2f}s for a worker thread")
+
+        self._running += 1
+        try:
+            return await asyncio.get_running_loop().run_in_executor(executor, func, *args)
+        finally:
+            self._running -= 1
+            self._completed += 1
+            self._slots.release()
+
+    def metrics(self) -> Dict[str, Any]:
+        """Queue and throughput counters since start."""
+        return {
+            "workers": self.workers,
+            "max_queue": self.max_queue,
+            "running": self._running,
+            "waiting": self._waiting,
+            "completed": self._completed,
+            "rejected": self._rejected,
+            "avg_wait_ms": round(self._total_wait * 1000 / self._completed, 2)
+            if self._completed
+            else 0.0,
+            "max_wait_ms": round(self._max_wait * 1000, 2),
+        }
+
+    def shutdown(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+            self._slots = None
+
+
+# Global instance
+password_hasher = PasswordHasher(settings.password_hash_workers, settings.password_hash_max_queue)
@@ -0,0 +1,360 @@
+"""
+Payment intents: YooKassa payments are created by a background worker,
+so booking creation does not wait for the payment API.
+"""
+import asyncio
+import logging
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, Optional
+
+from sqlalchemy import and_, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.database import AsyncSessionLocal, is_sqlite, settings
+from app.models import Booking, BookingStatus, PaymentIntent, PaymentIntentStatus
+from app.services.booking_service import hold_cutoff
+from app.services.payment_service import PaymentService, payment_service
+
+logger = logging.getLogger(__name__)
+
+
+def _now() -> datetime:
+    now = datetime.now(timezone.utc)
+    return now.replace(tzinfo=None) if is_sqlite else now
+
+
+def fallback_payment_url(booking_id: int, amount: float) -> str:
+    """Ссылка для ручной обработки, если платеж в YooKassa создать не удалось."""
+    return f"https://yookassa.ru/payment?booking_id={booking_id}&amount={amount}"
+
+
+def add_payment_intent(db: AsyncSession, booking: Booking, description: str) -> PaymentIntent:
+    """Создает намерение оплаты брони в текущей транзакции (коммит делает вызывающий код)."""
+    intent = PaymentIntent(
+        booking_id=booking.id,
+        amount=booking.deposit_amount,
+        description=description,
+        status=PaymentIntentStatus.PENDING,
+        attempts=0,
+        next_attempt_at=_now(),
+    )
+    db.add(intent)
+    return intent
+
+
+class CircuitBreaker:
+    """
+    Stops calling an upstream after failure_threshold consecutive failures
+    and lets a trial call through after reset_seconds.
+    """
+
+    def __init__(self, failure_threshold: int, reset_seconds: float):
+        self.failure_threshold = failure_threshold
+        self.reset_seconds = reset_seconds
+        self._failures = 0
+        self._open_until = 0.0
+
+    def allow(self) -> bool:
+        return time.monotonic() >= self._open_until
+
+    def retry_after(self) -> float:
+        """Seconds until the breaker lets calls through again."""
+        return max(0.0, self._open_until - time.monotonic())
+
+    def record_success(self) -> None:
+        self._failures = 0
+        self._open_until = 0.0
+
+    def record_failure(self) -> None:
+        self._failures += 1
+        if self._failures >= self.failure_threshold:
+            self._open_until = time.monotonic() + self.reset_seconds
+            logger.warning(
+                f"YooKassa circuit open for {self.reset_seconds:.0f}s "
+                f"after {self._failures} consecutive failures"
+            )
+
+
+class PaymentIntentWorker:
+    """
+    Picks due PENDING intents, creates their payments in YooKassa with
+    retries (exponential backoff) and a circuit breaker, and stores the
+    confirmation URL.
+
+    An intent is claimed by moving its next_attempt_at past a lease, so
+    several uvicorn workers do not process it at the same time. A payment
+    retried after a lost lease is deduplicated by the YooKassa
+    Idempotence-Key of the booking.
+    """
+
+    def __init__(
+        self,
+        payments: PaymentService,
+        poll_interval_seconds: float,
+        max_attempts: int,
+        retry_base_seconds: float,
+        concurrency: int,
+        breaker: CircuitBreaker,
+        lease_seconds: float = 60.0,
+        batch_size: int = 50,
+    ):
+        self.payments = payments
+        self.poll_interval_seconds = poll_interval_seconds
+        self.max_attempts = max_attempts
+        self.retry_base_seconds = retry_base_seconds
+        self.concurrency = concurrency
+        self.breaker = breaker
+        self.lease_seconds = lease_seconds
+        self.batch_size = batch_size
+        self._task: Optional[asyncio.Task] = None
+        self._wakeup = asyncio.Event()
+        # booking_id -> события для ожидающих статуса (SSE)
+        self._waiters: Dict[int, List[asyncio.Event]] = {}
+
+    def start(self) -> None:
+        """Start the worker loop on the running event loop."""
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run(), name="payment-intents")
+
+    async def stop(self) -> None:
+        """Stop the worker loop."""
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+
+    def notify(self) -> None:
+        """Wake the worker up (a new intent was committed)."""
+        self._wakeup.set()
+
+    async def wait_for_update(self, booking_id: int, timeout: float) -> None:
+        """Wait until this worker updates the intent of the booking, or timeout."""
+        event = asyncio.Event()
+        self._waiters.setdefault(booking_id, []).append(event)
+        try:
+            await asyncio.wait_for(event.wait(), timeout)
+        except asyncio.TimeoutError:
+            pass
+        finally:
+            waiters = self._waiters.get(booking_id, [])
+            if event in waiters:
+                waiters.remove(event)
+            if not waiters:
+                self._waiters.pop(booking_id, None)
+
+    def _signal(self, booking_id: int) -> None:
+        for event in self._waiters.get(booking_id, []):
+            event.set()
+
+    async def _claim_due(self) -> List[int]:
+        now = _now()
+        async with AsyncSessionLocal() as db:
+            result = await db.execute(
+                select(PaymentIntent.id)
+                .where(
+                    and_(
+                        PaymentIntent.status == PaymentIntentStatus.PENDING,
+                        PaymentIntent.next_attempt_at <= now,
+                    )
+                )
+                .order_by(PaymentIntent.next_attempt_at)
+                .limit(self.batch_size)
+            )
+            claimed = []
+            for intent_id in result.scalars().all():
+                lease = await db.execute(
+                    update(PaymentIntent)
+                    .where(
+                        and_(
+                            PaymentIntent.id == intent_id,
+                            PaymentIntent.status == PaymentIntentStatus.PENDING,
+                            PaymentIntent.next_attempt_at <= now,
+                        )
+                    )
+                    .values(next_attempt_at=now + timedelta(seconds=self.lease_seconds))
+                    .execution_options(synchronize_session=False)
+                )
+                if lease.rowcount == 1:
+                    claimed.append(intent_id)
+            await db.commit()
+        return claimed
+
+    async def _save(self, intent_id: int, booking_id: int, **values) -> None:
+        async with AsyncSessionLocal() as db:
+            await db.execute(
+                update(PaymentIntent)
+                .where(PaymentIntent.id == intent_id)
+                .values(**values)
+                .execution_options(synchronize_session=False)
+            )
+            if values.get("payment_id"):
+                # id платежа хранится и в брони: по нему идет сверка с YooKassa
+                await db.execute(
+                    update(Booking)
+                    .where(Booking.id == booking_id)
+                    .values(payment_id=values["payment_id"])
+                    .execution_options(synchronize_session=False)
+                )
+            await db.commit()
+        self._signal(booking_id)
+
+    async def _process(self, intent_id: int) -> None:
+        # Данные для платежа читаем и сессию закрываем до запроса к YooKassa
+        async with AsyncSessionLocal() as db:
+            result = await db.execute(
+                select(
+                    PaymentIntent.booking_id,
+                    PaymentIntent.amount,
+                    PaymentIntent.description,
+                    PaymentIntent.attempts,
+                    Booking.user_phone,
+                    Booking.user_name,
+                    Booking.status,
+                    Booking.created_at,
+                )
+                .join(Booking, Booking.id == PaymentIntent.booking_id)
+                .where(PaymentIntent.id == intent_id)
+            )
+            row = result.one_or_none()
+        if row is None:
+            return
+        booking_id, amount, description, attempts, phone, name, booking_status, created_at = row
+
+        hold_expired = created_at is not None and created_at < hold_cutoff()
+        if booking_status != BookingStatus.PENDING or hold_expired:
+            # Бронь отменена или ее холд истек: платеж в YooKassa не создаем
+            await self._save(
+                intent_id,
+                booking_id,
+                status=PaymentIntentStatus.FAILED,
+                last_error="Booking hold expired"
+                if booking_status == BookingStatus.PENDING
+                else f"Booking is {booking_status.value}",
+            )
+            return
+
+        if not self.breaker.allow():
+            # YooKassa недоступна: попытку не тратим, ждем закрытия прерывателя
+            await self._save(
+                intent_id,
+                booking_id,
+                next_attempt_at=_now() + timedelta(seconds=self.breaker.retry_after()),
+            )
+            return
+
+        attempts += 1
+        try:
+            payment_info = await self.payments.create_payment(
+                amount=amount,
+                booking_id=booking_id,
+                description=description,
+                customer_phone=phone,
+                customer_name=name,
+            )
+        except ValueError as e:
+            # YooKassa не настроена - повторять бессмысленно
+            await self._save(
+                intent_id,
+                booking_id,
+                status=PaymentIntentStatus.FAILED,
+                attempts=attempts,
+                confirmation_url=fallback_payment_url(booking_id, amount),
+                last_error=str(e),
+            )
+            return
+        except Exception as e:
+            self.breaker.record_failure()
+            if attempts >= self.max_attempts:
+                logger.error(f"Payment for booking {booking_id} failed after {attempts} attempts: {e}")
+                await self._save(
+                    intent_id,
+                    booking_id,
+                    status=PaymentIntentStatus.FAILED,
+                    attempts=attempts,
+                    confirmation_url=fallback_payment_url(booking_id, amount),
+                    last_error=str(e),
+                )
+            else:
+                delay = self.retry_base_seconds * 2 ** (attempts - 1)
+                logger.warning(
+                    f"Payment for booking {booking_id} failed (attempt {attempts}), retrying in {delay:.0f}s: {e}"
+                )
+                await self._save(
+                    intent_id,
+                    booking_id,
+                    attempts=attempts,
+                    next_attempt_at=_now() + timedelta(seconds=delay),
+                    last_error=str(e),
+                )
+            return
+
+        self.breaker.record_success()
+        payment_url = payment_info.get("confirmation", {}).get("confirmation_url", "")
+        if not payment_url:
+            logger.warning(f"No confirmation URL in payment response: {payment_info}")
+            payment_url = fallback_payment_url(booking_id, amount)
+        await self._save(
+            intent_id,
+            booking_id,
+            status=PaymentIntentStatus.READY,
+            attempts=attempts,
+            payment_id=payment_info.get("id"),
+            confirmation_url=payment_url,
+            last_error=None,
+        )
+
+    async def process_due(self) -> int:
+        """Process all due intents once; returns how many were processed."""
+        claimed = await self._claim_due()
+        if not claimed:
+            return 0
+
+        slots = asyncio.Semaphore(self.concurrency)
+
+        async def process(intent_id: int) -> None:
+            async with slots:
+                try:
+                    await self._process(intent_id)
+                except Exception as e:
+                    # Аренда истечет, и намерение возьмут снова
+                    logger.error(f"Payment intent {intent_id} error: {str(e)}", exc_info=True)
+
+        await asyncio.gather(*(process(intent_id) for intent_id in claimed))
+        return len(claimed)
+
+    async def _run(self) -> None:
+        while True:
+            self._wakeup.clear()
+            try:
+                processed = await self.process_due()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Payment intent worker error: {str(e)}", exc_info=True)
+                processed = 0
+
+            if processed < self.batch_size:
+                # Новые намерения будят воркер сразу, повторы подбираются по таймеру
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), self.poll_interval_seconds)
+                except asyncio.TimeoutError:
+                    pass
+
+
+# Global instance
+payment_intent_worker = PaymentIntentWorker(
+    payment_service,
+    poll_interval_seconds=settings.payment_poll_interval_seconds,
+    max_attempts=settings.payment_max_attempts,
+    retry_base_seconds=settings.payment_retry_base_seconds,
+    concurrency=settings.payment_worker_concurrency,
+    breaker=CircuitBreaker(
+        settings.payment_circuit_failure_threshold,
+        settings.payment_circuit_reset_seconds,
+    ),
+)
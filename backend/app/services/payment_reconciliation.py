@@ -0,0 +1,392 @@
+"""
+Reconciliation of bookings with YooKassa payments.
+
+Catches bookings whose webhook never arrived: the payments created in a time
+window are read from the YooKassa list API page by page (100 per request),
+compared with the PENDING/CONFIRMED bookings in one query, and corrections
+are applied in batched UPDATEs. Runs in the background (PaymentReconciler)
+and from the command line (reconcile_payments.py).
+"""
+import asyncio
+import logging
+from datetime import date, datetime, timedelta, timezone
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+from sqlalchemy import and_, or_, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.database import AsyncSessionLocal, settings
+from app.models import Booking, BookingStatus, Table
+from app.services.booking_service import (
+    confirming_booking,
+    hold_cutoff,
+    invalidate_availability_cache,
+)
+from app.services.payment_service import PaymentService, payment_service
+from app.services.stats_service import BookingFacts, record_booking_changes
+from app.services.telegram_outbox import (
+    enqueue_booking_notification,
+    enqueue_payment_review_alert,
+    telegram_dispatcher,
+)
+
+logger = logging.getLogger(__name__)
+
+# Статусы платежа YooKassa, после которых он уже не изменится
+PAYMENT_SUCCEEDED = "succeeded"
+PAYMENT_CANCELED = "canceled"
+
+PAGE_SIZE = 100  # максимум list API
+UPDATE_BATCH_SIZE = 500
+
+
+class PaymentOutcome(NamedTuple):
+    """Final payment of a booking in YooKassa."""
+
+    payment_id: str
+    status: str
+
+
+class ReconciliationResult(NamedTuple):
+    """What a reconciliation run found and changed."""
+
+    payments: int  # платежей в выгрузке
+    bookings: int  # броней PENDING/CONFIRMED, найденных по платежам
+    confirmed: List[int]
+    cancelled: List[int]
+    payment_ids_set: int
+    # Расхождения, которые нельзя исправить автоматически: подтвержденная бронь
+    # с отмененным платежом, оплаченная бронь, которая уже отменена или удалена
+    # или стол которой после истечения холда занят
+    needs_review: List[int]
+
+
+async def fetch_payment_outcomes(
+    payments: PaymentService, created_from: datetime, created_to: datetime
+) -> Tuple[Dict[int, PaymentOutcome], int]:
+    """
+    Read all payments created in the window and pick the final one per booking.
+
+    A succeeded payment wins over canceled ones (the guest retried); payments
+    still in progress are skipped. Returns outcomes by booking id and the
+    number of payments read.
+    """
+    outcomes: Dict[int, PaymentOutcome] = {}
+    seen = 0
+    cursor: Optional[str] = None
+    while True:
+        page = await payments.list_payments(created_from, created_to, cursor, PAGE_SIZE)
+        for item in page.get("items", []):
+            seen += 1
+            status = item.get("status")
+            booking_id = (item.get("metadata") or {}).get("booking_id")
+            if status not in (PAYMENT_SUCCEEDED, PAYMENT_CANCELED) or not booking_id:
+                continue
+            try:
+                booking_id = int(booking_id)
+            except ValueError:
+                continue
+            current = outcomes.get(booking_id)
+            if current is None or current.status != PAYMENT_SUCCEEDED:
+                outcomes[booking_id] = PaymentOutcome(item["id"], status)
+
+        cursor = page.get("next_cursor")
+        if not cursor:
+            return outcomes, seen
+
+
+async def _apply_status(
+    db: AsyncSession, booking_ids: List[int], target: BookingStatus
+) -> List[Tuple[int, date]]:
+    """
+    Переводит PENDING-брони в target пачками UPDATE (разрешенные переходы -
+    BOOKING_STATUS_TRANSITIONS). Бронь, статус которой уже изменился
+    (вебхук, снятие холда), условие WHERE пропускает.
+    Возвращает (id, дата) измененных броней.
+
+    Бронь со столом пачкой подтверждается, только пока действует ее холд:
+    брони с истекшим холдом подтверждает _confirm_expired_holds.
+    """
+    conditions = [Booking.status == BookingStatus.PENDING]
+    if target == BookingStatus.CONFIRMED:
+        conditions.append(or_(Booking.table_id.is_(None), Booking.created_at >= hold_cutoff()))
+    changed = []
+    for start in range(0, len(booking_ids), UPDATE_BATCH_SIZE):
+        result = await db.execute(
+            update(Booking)
+            .where(
+                and_(
+                    Booking.id.in_(booking_ids[start:start + UPDATE_BATCH_SIZE]),
+                    *conditions,
+                )
+            )
+            .values(status=target)
+            .returning(
+                Booking.id, Booking.date, Booking.table_id, Booking.guest_count, Booking.deposit_amount
+            )
+            .execution_options(synchronize_session=False)
+        )
+        rows = result.all()
+        changes = []
+        for row in rows:
+            facts = BookingFacts(
+                row.date, row.table_id, BookingStatus.PENDING, row.guest_count, row.deposit_amount
+            )
+            changes.append((facts, facts._replace(status=target)))
+        await record_booking_changes(db, changes)
+        changed.extend((row.id, row.date) for row in rows)
+    return changed
+
+
+async def _enqueue_confirmations(db: AsyncSession, booking_ids: List[int]) -> None:
+    if not booking_ids:
+        return
+    bookings = (
+        await db.execute(select(Booking).where(Booking.id.in_(booking_ids)))
+    ).scalars().all()
+    table_ids = {booking.table_id for booking in bookings if booking.table_id}
+    tables = {}
+    if table_ids:
+        tables = {
+            table.id: table
+            for table in (
+                await db.execute(select(Table).where(Table.id.in_(table_ids)))
+            ).scalars().all()
+        }
+    for booking in bookings:
+        await enqueue_booking_notification(db, booking, tables.get(booking.table_id))
+
+
+async def _confirm_expired_holds(
+    db: AsyncSession, booking_ids: List[int]
+) -> Tuple[List[Tuple[int, date]], List[int]]:
+    """
+    Оплаченные брони с истекшим холдом: по одной, под локом даты и с
+    повторной проверкой стола (confirming_booking), каждая в своей транзакции.
+    Возвращает подтвержденные (id, дата) и брони, стол которых уже занят.
+    """
+    confirmed: List[Tuple[int, date]] = []
+    taken: List[int] = []
+    if not booking_ids:
+        return confirmed, taken
+
+    bookings = (
+        await db.execute(
+            select(Booking).where(
+                and_(Booking.id.in_(booking_ids), Booking.status == BookingStatus.PENDING)
+            )
+        )
+    ).scalars().all()
+    for booking in bookings:
+        async with confirming_booking(db, booking) as ok:
+            if ok:
+                await _enqueue_confirmations(db, [booking.id])
+            await db.commit()
+        if ok:
+            confirmed.append((booking.id, booking.date))
+        elif booking.status == BookingStatus.PENDING:
+            taken.append(booking.id)
+    return confirmed, taken
+
+
+async def _flag_paid_for_review(
+    db: AsyncSession, outcomes: Dict[int, PaymentOutcome], missing: List[int], taken: List[int]
+) -> None:
+    """
+    Оплата прошла, а бронь не подтверждена (отменена, удалена или ее стол
+    занят): id платежа сохраняется у брони, админам ставится алерт в outbox
+    (повторная сверка его не дублирует). Коммитит вызывающий код.
+    """
+    existing = set(taken)
+    if missing:
+        existing.update(
+            (await db.execute(select(Booking.id).where(Booking.id.in_(missing)))).scalars().all()
+        )
+    for booking_id in missing + taken:
+        payment_id = outcomes[booking_id].payment_id
+        if booking_id in taken:
+            reason = "стол занят после истечения холда"
+        elif booking_id in existing:
+            reason = "бронь отменена"
+        else:
+            reason = "бронь не найдена"
+        if booking_id in existing:
+            await db.execute(
+                update(Booking)
+                .where(Booking.id == booking_id)
+                .values(payment_id=payment_id)
+                .execution_options(synchronize_session=False)
+            )
+        await enqueue_payment_review_alert(
+            db, booking_id, payment_id, reason, booking_exists=booking_id in existing
+        )
+
+
+async def reconcile_payments(
+    db: AsyncSession,
+    created_from: datetime,
+    created_to: datetime,
+    payments: PaymentService = payment_service,
+    dry_run: bool = False,
+) -> ReconciliationResult:
+    """
+    Сверяет брони с платежами YooKassa, созданными в [created_from, created_to).
+
+    Оплаченная PENDING-бронь подтверждается (с уведомлением в Telegram),
+    PENDING-бронь с отмененным платежом отменяется, у брони сохраняется id
+    платежа. Подтвержденные брони не отменяются - такие случаи попадают в
+    needs_review. Оплата брони, которую подтвердить нельзя, тоже попадает в
+    needs_review: платеж сохраняется у брони, админам уходит алерт.
+    При dry_run ничего не меняется.
+    """
+    outcomes, seen = await fetch_payment_outcomes(payments, created_from, created_to)
+    if not outcomes:
+        return ReconciliationResult(seen, 0, [], [], 0, [])
+
+    # Один запрос: брони из выгрузки, статус которых еще может зависеть от оплаты
+    rows = (
+        await db.execute(
+            select(Booking.id, Booking.status, Booking.payment_id).where(
+                and_(
+                    Booking.id.in_(list(outcomes)),
+                    Booking.status.in_([BookingStatus.PENDING, BookingStatus.CONFIRMED]),
+                )
+            )
+        )
+    ).all()
+
+    to_confirm: List[int] = []
+    to_cancel: List[int] = []
+    needs_review: List[int] = []
+    payment_ids: List[Dict[str, object]] = []
+    found = set()
+    for row in rows:
+        found.add(row.id)
+        outcome = outcomes[row.id]
+        if row.payment_id is None or (
+            row.payment_id != outcome.payment_id and outcome.status == PAYMENT_SUCCEEDED
+        ):
+            payment_ids.append({"id": row.id, "payment_id": outcome.payment_id})
+
+        if row.status == BookingStatus.PENDING:
+            if outcome.status == PAYMENT_SUCCEEDED:
+                to_confirm.append(row.id)
+            else:
+                to_cancel.append(row.id)
+        elif outcome.status == PAYMENT_CANCELED:
+            needs_review.append(row.id)
+
+    # Оплачено, но бронь уже отменена или удалена
+    paid_missing = [
+        booking_id
+        for booking_id, outcome in outcomes.items()
+        if outcome.status == PAYMENT_SUCCEEDED and booking_id not in found
+    ]
+    needs_review.extend(paid_missing)
+
+    if dry_run:
+        return ReconciliationResult(
+            seen, len(rows), to_confirm, to_cancel, len(payment_ids), sorted(needs_review)
+        )
+
+    confirmed = await _apply_status(db, to_confirm, BookingStatus.CONFIRMED)
+    cancelled = await _apply_status(db, to_cancel, BookingStatus.CANCELLED)
+    if payment_ids:
+        # UPDATE по первичному ключу пакетом (executemany)
+        await db.execute(update(Booking), payment_ids)
+    await _enqueue_confirmations(db, [booking_id for booking_id, _ in confirmed])
+    await db.commit()
+
+    confirmed_ids = {booking_id for booking_id, _ in confirmed}
+    late_confirmed, taken = await _confirm_expired_holds(
+        db, [booking_id for booking_id in to_confirm if booking_id not in confirmed_ids]
+    )
+    confirmed += late_confirmed
+    # Оплачено, но стол после истечения холда занял другой гость
+    needs_review.extend(taken)
+    if paid_missing or taken:
+        await _flag_paid_for_review(db, outcomes, paid_missing, taken)
+        await db.commit()
+
+    changed_dates = {booking_date for _, booking_date in confirmed + cancelled}
+    if changed_dates:
+        invalidate_availability_cache(*changed_dates)
+    if confirmed or paid_missing or taken:
+        telegram_dispatcher.notify()
+
+    return ReconciliationResult(
+        seen,
+        len(rows),
+        [booking_id for booking_id, _ in confirmed],
+        [booking_id for booking_id, _ in cancelled],
+        len(payment_ids),
+        sorted(needs_review),
+    )
+
+
+class PaymentReconciler:
+    """
+    Periodically reconciles the last lookback_hours of payments.
+
+    Every uvicorn worker runs its own reconciler; the UPDATEs only touch
+    PENDING bookings and notifications are deduplicated in the outbox, so
+    overlapping runs are harmless.
+    """
+
+    def __init__(self, payments: PaymentService, interval_seconds: int, lookback_hours: int):
+        self.payments = payments
+        self.interval_seconds = interval_seconds
+        self.lookback_hours = lookback_hours
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self) -> None:
+        """Start the reconciler loop on the running event loop."""
+        if not self.payments.auth_header:
+            logger.info("YooKassa credentials not configured, payment reconciliation disabled")
+            return
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run(), name="payment-reconciler")
+
+    async def stop(self) -> None:
+        """Stop the reconciler loop."""
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+
+    async def reconcile_once(self) -> ReconciliationResult:
+        """Run a single reconciliation of the lookback window."""
+        created_to = datetime.now(timezone.utc)
+        created_from = created_to - timedelta(hours=self.lookback_hours)
+        async with AsyncSessionLocal() as db:
+            result = await reconcile_payments(db, created_from, created_to, self.payments)
+        if result.confirmed or result.cancelled:
+            logger.info(
+                f"Payment reconciliation: confirmed {len(result.confirmed)}, "
+                f"cancelled {len(result.cancelled)} bookings"
+            )
+        if result.needs_review:
+            logger.warning(f"Payment reconciliation: bookings need review: {result.needs_review}")
+        return result
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                await self.reconcile_once()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Payment reconciliation error: {str(e)}", exc_info=True)
+            await asyncio.sleep(self.interval_seconds)
+
+
+# Global instance
+payment_reconciler = PaymentReconciler(
+    payment_service,
+    interval_seconds=settings.payment_reconcile_interval_seconds,
+    lookback_hours=settings.payment_reconcile_lookback_hours,
+)
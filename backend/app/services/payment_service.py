@@ -4,20 +4,21 @@ Payment service for YooKassa integration.
 import httpx
 import base64
 import logging
+from datetime import datetime, timezone
 from typing import Optional, Dict, Any
 
-logger = logging.getLogger(__name__)
+from app.services.http_clients import YOOKASSA, HttpClients, http_clients
 
-# YooKassa API endpoints
-YOOKASSA_API_URL = "https://api.yookassa.ru/v3"
-YOOKASSA_SANDBOX_URL = "https://api.yookassa.ru/v3"  # Same URL, but uses test credentials
+logger = logging.getLogger(__name__)
 
 
 class PaymentService:
     """Service for handling YooKassa payments."""
     
-    def __init__(self):
+    def __init__(self, clients: HttpClients):
         from app.database import settings
+        # API URL (YOOKASSA_API_URL) и пул соединений - в общем клиенте yookassa
+        self.clients = clients
         self.shop_id = settings.yookassa_shop_id
         self.secret_key = settings.yookassa_secret_key
         self.return_url = settings.yookassa_return_url
@@ -84,24 +85,23 @@ class PaymentService:
                 payment_data["receipt"]["customer"]["full_name"] = customer_name
         
         try:
-            async with httpx.AsyncClient(timeout=30.0) as client:
-                response = await client.post(
-                    f"{YOOKASSA_API_URL}/payments",
-                    json=payment_data,
-                    headers={
-                        "Authorization": self.auth_header,
-                        "Idempotence-Key": f"booking_{booking_id}_{int(amount * 100)}",
-                        "Content-Type": "application/json"
-                    }
-                )
-                
-                response.raise_for_status()
-                payment_info = response.json()
-                
-                logger.info(f"Payment created: {payment_info.get('id')} for booking {booking_id}")
-                
-                return payment_info
-                
+            response = await self.clients.get(YOOKASSA).post(
+                "/payments",
+                json=payment_data,
+                headers={
+                    "Authorization": self.auth_header,
+                    "Idempotence-Key": f"booking_{booking_id}_{int(amount * 100)}",
+                    "Content-Type": "application/json"
+                }
+            )
+
+            response.raise_for_status()
+            payment_info = response.json()
+
+            logger.info(f"Payment created: {payment_info.get('id')} for booking {booking_id}")
+
+            return payment_info
+
         except httpx.HTTPStatusError as e:
             logger.error(f"YooKassa API error: {e.response.status_code} - {e.response.text}")
             raise Exception(f"Ошибка создания платежа: {e.response.status_code}")
@@ -123,18 +123,17 @@ class PaymentService:
             raise ValueError("YooKassa credentials not configured")
         
         try:
-            async with httpx.AsyncClient(timeout=30.0) as client:
-                response = await client.get(
-                    f"{YOOKASSA_API_URL}/payments/{payment_id}",
-                    headers={
-                        "Authorization": self.auth_header,
-                        "Content-Type": "application/json"
-                    }
-                )
-                
-                response.raise_for_status()
-                return response.json()
-                
+            response = await self.clients.get(YOOKASSA).get(
+                f"/payments/{payment_id}",
+                headers={
+                    "Authorization": self.auth_header,
+                    "Content-Type": "application/json"
+                }
+            )
+
+            response.raise_for_status()
+            return response.json()
+
         except httpx.HTTPStatusError as e:
             logger.error(f"YooKassa API error: {e.response.status_code} - {e.response.text}")
             raise Exception(f"Ошибка получения статуса платежа: {e.response.status_code}")
@@ -142,6 +141,49 @@ class PaymentService:
             logger.error(f"Error getting payment status: {str(e)}", exc_info=True)
             raise
     
+    async def list_payments(
+        self,
+        created_from: datetime,
+        created_to: datetime,
+        cursor: Optional[str] = None,
+        limit: int = 100,
+    ) -> Dict[str, Any]:
+        """
+        Get one page of payments created in [created_from, created_to).
+        
+        Args:
+            created_from: Window start (aware datetime)
+            created_to: Window end, exclusive (aware datetime)
+            cursor: next_cursor of the previous page
+            limit: Page size, at most 100
+        
+        Returns:
+            Dict with "items" and, if there are more pages, "next_cursor"
+        """
+        if not self.shop_id or not self.secret_key:
+            raise ValueError("YooKassa credentials not configured")
+
+        params = {
+            "created_at.gte": _api_timestamp(created_from),
+            "created_at.lt": _api_timestamp(created_to),
+            "limit": limit,
+        }
+        if cursor:
+            params["cursor"] = cursor
+
+        try:
+            response = await self.clients.get(YOOKASSA).get(
+                "/payments",
+                params=params,
+                headers={"Authorization": self.auth_header},
+            )
+            response.raise_for_status()
+            return response.json()
+
+        except httpx.HTTPStatusError as e:
+            logger.error(f"YooKassa API error: {e.response.status_code} - {e.response.text}")
+            raise Exception(f"Ошибка получения списка платежей: {e.response.status_code}")
+
     def verify_webhook(self, webhook_data: Dict[str, Any]) -> bool:
         """
         Verify webhook data from YooKassa.
@@ -164,6 +206,11 @@ class PaymentService:
         return True
 
 
+def _api_timestamp(moment: datetime) -> str:
+    """ISO 8601 in UTC with milliseconds, as YooKassa filters expect (2024-06-01T10:00:00.000Z)."""
+    return moment.astimezone(timezone.utc).strftime("%Y-%m-%dT%H:%M:%S.%f")[:-3] + "Z"
+
+
 # Global instance
-payment_service = PaymentService()
+payment_service = PaymentService(http_clients)
 
@@ -0,0 +1,77 @@
+"""
+Idempotency store for YooKassa webhooks.
+
+YooKassa redelivers a notification until it gets 200 in time, so the same
+(payment id, event) pair can arrive many times, also concurrently. The pair
+is recorded in payment_webhook_events in the same transaction as the
+booking change; the unique constraint lets exactly one delivery through.
+An in-process LRU in front answers most duplicates without the database.
+
+SQLite has a single writer: concurrent deliveries are applied one at a time
+(webhook_event_lock), otherwise they fail with "database is locked".
+"""
+import asyncio
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Optional
+
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.database import is_sqlite, settings
+from app.models import PaymentWebhookEvent
+from app.services.cache import TTLCache
+
+if is_sqlite:
+    from sqlalchemy.dialects.sqlite import insert as upsert
+else:
+    from sqlalchemy.dialects.postgresql import insert as upsert
+
+# Повторы YooKassa идут до суток; строки в БД остаются и после вытеснения из LRU
+processed_webhooks = TTLCache(
+    ttl_seconds=settings.webhook_dedup_ttl_seconds,
+    max_entries=settings.webhook_dedup_max_entries,
+)
+
+
+# SQLite: вебхуки внутри процесса пишут по очереди (PostgreSQL ждет на уникальном индексе)
+_sqlite_webhook_lock = asyncio.Lock()
+
+
+@asynccontextmanager
+async def webhook_event_lock() -> AsyncIterator[None]:
+    """
+    Сериализует транзакцию вебхука (claim_webhook_event ... commit) на SQLite.
+    На PostgreSQL не блокирует: параллельные доставки разводит уникальный индекс.
+    """
+    if is_sqlite:
+        async with _sqlite_webhook_lock:
+            yield
+    else:
+        yield
+
+
+def is_processed(payment_id: str, event: str) -> bool:
+    """The event was already applied by this process (no database access)."""
+    return processed_webhooks.get((payment_id, event), False)
+
+
+def remember_processed(payment_id: str, event: str) -> None:
+    processed_webhooks.set((payment_id, event), True)
+
+
+async def claim_webhook_event(
+    db: AsyncSession, payment_id: str, event: str, booking_id: Optional[int]
+) -> bool:
+    """
+    Записывает событие в текущей транзакции (коммит делает вызывающий код).
+    Возвращает False, если это событие уже обработано: тогда бронь трогать нельзя.
+
+    Параллельная доставка того же события ждет на уникальном индексе,
+    пока первая транзакция не завершится, и получает False.
+    """
+    result = await db.execute(
+        upsert(PaymentWebhookEvent)
+        .values(payment_id=payment_id, event=event, booking_id=booking_id)
+        .on_conflict_do_nothing(index_elements=["payment_id", "event"])
+        .returning(PaymentWebhookEvent.id)
+    )
+    return result.scalar_one_or_none() is not None
@@ -0,0 +1,294 @@
+"""
+Booking statistics: dashboard totals and the booking_daily_stats rollup.
+
+The rollup holds one row per (date, zone, status) with the number of
+bookings, guests and deposits. Every write that creates a booking or
+changes its status, date, table, guests or deposit applies the difference
+in the same transaction, so reports over a date range read a few hundred
+rollup rows instead of scanning bookings.
+"""
+
+from collections import defaultdict
+from datetime import date
+from typing import Dict, Iterable, List, NamedTuple, Optional, Tuple
+
+from sqlalchemy import String, cast, delete, func, insert, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.database import is_sqlite
+from app.models import (
+    Booking,
+    BookingAnalyticsDay,
+    BookingDailyStats,
+    BookingStatus,
+    Table,
+    Zone,
+)
+
+if is_sqlite:
+    from sqlalchemy.dialects.sqlite import insert as upsert
+else:
+    from sqlalchemy.dialects.postgresql import insert as upsert
+
+# Ключ зоны в сводке для броней без стола
+NO_ZONE = "NONE"
+
+
+class BookingFacts(NamedTuple):
+    """Поля брони, от которых зависит ее вклад в дневную сводку."""
+
+    date: date
+    table_id: Optional[int]
+    status: BookingStatus
+    guest_count: int
+    deposit_amount: float
+
+
+def booking_facts(booking: Booking) -> BookingFacts:
+    """Снимок брони для record_booking_change (делать до и после изменения)."""
+    return BookingFacts(
+        booking.date,
+        booking.table_id,
+        booking.status,
+        booking.guest_count,
+        booking.deposit_amount,
+    )
+
+
+# Ключ строки сводки -> [брони, гости, депозиты]
+RollupDeltas = Dict[Tuple[date, str, BookingStatus], List[float]]
+
+
+async def _table_zones(db: AsyncSession, table_ids: Iterable[int]) -> Dict[int, str]:
+    table_ids = set(table_ids)
+    if not table_ids:
+        return {}
+    result = await db.execute(
+        select(Table.id, Table.zone).where(Table.id.in_(table_ids))
+    )
+    return {table_id: zone.value for table_id, zone in result.tuples()}
+
+
+async def _apply_deltas(db: AsyncSession, deltas: RollupDeltas) -> None:
+    rows = [
+        {
+            "date": day,
+            "zone": zone,
+            "status": booking_status,
+            "bookings_count": int(count),
+            "guests_total": int(guests),
+            "deposits_total": deposits,
+        }
+        for (day, zone, booking_status), (count, guests, deposits) in deltas.items()
+        if count or guests or deposits
+    ]
+    if not rows:
+        return
+
+    # UPSERT с приращением: параллельные транзакции не теряют изменения друг друга
+    stmt = upsert(BookingDailyStats)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=["date", "zone", "status"],
+        set_={
+            "bookings_count": BookingDailyStats.bookings_count + stmt.excluded.bookings_count,
+            "guests_total": BookingDailyStats.guests_total + stmt.excluded.guests_total,
+            "deposits_total": BookingDailyStats.deposits_total + stmt.excluded.deposits_total,
+        },
+    )
+    await db.execute(stmt, rows)
+
+
+async def record_booking_changes(
+    db: AsyncSession,
+    changes: Iterable[Tuple[Optional[BookingFacts], Optional[BookingFacts]]],
+) -> None:
+    """
+    Применяет к сводке изменения броней: пары (было, стало), None - брони не было.
+    Заодно сбрасывает сохраненную загрузку затронутых дат (analytics_service).
+    Выполняется в текущей транзакции, коммит делает вызывающий код.
+    """
+    changes = [(before, after) for before, after in changes if before != after]
+    if not changes:
+        return
+
+    # Загрузка зала считается по подтвержденным броням
+    stale_dates = {
+        facts.date
+        for change in changes
+        for facts in change
+        if facts is not None and facts.status == BookingStatus.CONFIRMED
+    }
+    if stale_dates:
+        await db.execute(
+            delete(BookingAnalyticsDay).where(BookingAnalyticsDay.date.in_(stale_dates))
+        )
+
+    zones = await _table_zones(
+        db,
+        (
+            facts.table_id
+            for change in changes
+            for facts in change
+            if facts is not None and facts.table_id is not None
+        ),
+    )
+
+    deltas: RollupDeltas = defaultdict(lambda: [0, 0, 0.0])
+    for before, after in changes:
+        for facts, sign in ((before, -1), (after, 1)):
+            if facts is None:
+                continue
+            zone = zones.get(facts.table_id, NO_ZONE)
+            delta = deltas[(facts.date, zone, facts.status)]
+            delta[0] += sign
+            delta[1] += sign * facts.guest_count
+            delta[2] += sign * facts.deposit_amount
+
+    await _apply_deltas(db, deltas)
+
+
+async def record_booking_change(
+    db: AsyncSession,
+    before: Optional[BookingFacts],
+    after: Optional[BookingFacts],
+) -> None:
+    """Применяет к сводке изменение одной брони (см. record_booking_changes)."""
+    await record_booking_changes(db, [(before, after)])
+
+
+async def rebuild_daily_stats(db: AsyncSession) -> int:
+    """
+    Пересчитывает сводку целиком по таблице bookings (миграция, смена зоны стола).
+    Возвращает количество строк сводки. Коммит делает вызывающий код.
+    """
+    zone = func.coalesce(cast(Table.zone, String), NO_ZONE)
+    await db.execute(delete(BookingDailyStats))
+    await db.execute(
+        insert(BookingDailyStats).from_select(
+            ["date", "zone", "status", "bookings_count", "guests_total", "deposits_total"],
+            select(
+                Booking.date,
+                zone,
+                Booking.status,
+                func.count(Booking.id),
+                func.coalesce(func.sum(Booking.guest_count), 0),
+                func.coalesce(func.sum(Booking.deposit_amount), 0.0),
+            )
+            .outerjoin(Table, Booking.table_id == Table.id)
+            .group_by(Booking.date, zone, Booking.status),
+        )
+    )
+    result = await db.execute(select(func.count()).select_from(BookingDailyStats))
+    return result.scalar_one()
+
+
+class StatsTotals:
+    """Накопитель показателей одной группы (день, зона, день недели или все брони)."""
+
+    def __init__(self):
+        self.total_bookings = 0
+        self.confirmed_bookings = 0
+        self.pending_bookings = 0
+        self.cancelled_bookings = 0
+        self.total_guests = 0
+        self.total_deposits = 0.0
+
+    def add(self, booking_status: BookingStatus, count: int, guests: int, deposits: float) -> None:
+        self.total_bookings += count
+        if booking_status == BookingStatus.CONFIRMED:
+            # Гости и депозиты считаются только по подтвержденным броням
+            self.confirmed_bookings += count
+            self.total_guests += guests
+            self.total_deposits += deposits
+        elif booking_status == BookingStatus.PENDING:
+            self.pending_bookings += count
+        elif booking_status == BookingStatus.CANCELLED:
+            self.cancelled_bookings += count
+
+    def as_dict(self) -> dict:
+        return {
+            "total_deposits": float(self.total_deposits),
+            "total_guests": int(self.total_guests),
+            "total_bookings": self.total_bookings,
+            "confirmed_bookings": self.confirmed_bookings,
+            "pending_bookings": self.pending_bookings,
+            "cancelled_bookings": self.cancelled_bookings,
+        }
+
+
+async def get_overall_stats(db: AsyncSession) -> dict:
+    """Итоги по всем броням одним запросом с GROUP BY status."""
+    result = await db.execute(
+        select(
+            Booking.status,
+            func.count(Booking.id),
+            func.coalesce(func.sum(Booking.guest_count), 0),
+            func.coalesce(func.sum(Booking.deposit_amount), 0.0),
+        ).group_by(Booking.status)
+    )
+    totals = StatsTotals()
+    for booking_status, count, guests, deposits in result.tuples():
+        totals.add(booking_status, count, guests, deposits)
+    return totals.as_dict()
+
+
+async def _grouped_rollup(db: AsyncSession, key, date_from: date, date_to: date, *filters):
+    result = await db.execute(
+        select(
+            key,
+            BookingDailyStats.status,
+            func.sum(BookingDailyStats.bookings_count),
+            func.sum(BookingDailyStats.guests_total),
+            func.sum(BookingDailyStats.deposits_total),
+        )
+        .where(
+            BookingDailyStats.date >= date_from,
+            BookingDailyStats.date <= date_to,
+            *filters,
+        )
+        .group_by(key, BookingDailyStats.status)
+    )
+    return result.tuples()
+
+
+async def get_daily_stats(
+    db: AsyncSession, date_from: date, date_to: date, zone: Optional[Zone] = None
+) -> List[dict]:
+    """Показатели по дням диапазона (только дни с бронями), из сводки."""
+    filters = [BookingDailyStats.zone == zone.value] if zone else []
+    by_date: Dict[date, StatsTotals] = defaultdict(StatsTotals)
+    for day, booking_status, count, guests, deposits in await _grouped_rollup(
+        db, BookingDailyStats.date, date_from, date_to, *filters
+    ):
+        by_date[day].add(booking_status, count, guests, deposits)
+    return [{"date": day, **by_date[day].as_dict()} for day in sorted(by_date)]
+
+
+async def get_zone_stats(db: AsyncSession, date_from: date, date_to: date) -> List[dict]:
+    """Показатели по зонам за диапазон, из сводки. Брони без стола - zone=None."""
+    by_zone: Dict[str, StatsTotals] = defaultdict(StatsTotals)
+    for zone, booking_status, count, guests, deposits in await _grouped_rollup(
+        db, BookingDailyStats.zone, date_from, date_to
+    ):
+        by_zone[zone].add(booking_status, count, guests, deposits)
+    return [
+        {"zone": None if zone == NO_ZONE else Zone(zone), **by_zone[zone].as_dict()}
+        for zone in sorted(by_zone)
+    ]
+
+
+async def get_weekday_stats(
+    db: AsyncSession, date_from: date, date_to: date, zone: Optional[Zone] = None
+) -> List[dict]:
+    """
+    Показатели по дням недели (0 - понедельник) за диапазон.
+    Сводка группируется по датам в БД, дни недели считаются здесь:
+    так не нужны функции дат, разные в SQLite и PostgreSQL.
+    """
+    filters = [BookingDailyStats.zone == zone.value] if zone else []
+    by_weekday: Dict[int, StatsTotals] = {weekday: StatsTotals() for weekday in range(7)}
+    for day, booking_status, count, guests, deposits in await _grouped_rollup(
+        db, BookingDailyStats.date, date_from, date_to, *filters
+    ):
+        by_weekday[day.weekday()].add(booking_status, count, guests, deposits)
+    return [{"weekday": weekday, **totals.as_dict()} for weekday, totals in by_weekday.items()]
@@ -0,0 +1,181 @@
+"""
+Table allocator - picks the best free table (or group of neighbouring tables) for a booking.
+"""
+
+from bisect import bisect_left
+from math import hypot
+from typing import Dict, FrozenSet, Iterable, List, NamedTuple, Optional, Sequence, Set
+
+from app.models import Zone
+
+# Веса оценки кандидата (меньше - лучше)
+WASTE_WEIGHT = 10.0  # каждое пустующее место
+ZONE_MISMATCH_WEIGHT = 25.0  # стол не в зале, выбранном гостем
+SCARCITY_WEIGHT = 20.0  # занимаем один из последних свободных столов такого размера
+COMBINE_WEIGHT = 15.0  # каждый дополнительный стол в комбинации
+DISTANCE_WEIGHT = 0.05  # за единицу расстояния между столами комбинации
+
+# Столы считаются соседними, если расстояние между центрами на схеме зала не больше этого
+ADJACENCY_DISTANCE = 260.0
+# Максимум столов, которые можно сдвинуть для одной компании
+MAX_COMBINED_TABLES = 3
+
+
+class TableInfo(NamedTuple):
+    """Layout data of an active table needed for allocation."""
+
+    id: int
+    zone: Zone
+    seats: int
+    x: float
+    y: float
+
+
+def _distance(a: TableInfo, b: TableInfo) -> float:
+    return hypot(a.x - b.x, a.y - b.y)
+
+
+def _zone_penalty(zone: Zone, preferred_zone: Optional[Zone]) -> float:
+    if preferred_zone is None or zone == preferred_zone:
+        return 0.0
+    return ZONE_MISMATCH_WEIGHT
+
+
+def _best_single(
+    free_tables: Sequence[TableInfo],
+    guest_count: int,
+    preferred_zone: Optional[Zone],
+) -> Optional[TableInfo]:
+    """Best single table: minimal seat waste, preferred zone, keep scarce large tables."""
+    candidates = [t for t in free_tables if t.seats >= guest_count]
+    if not candidates:
+        return None
+
+    free_seats = sorted(t.seats for t in free_tables)
+
+    def cost(table: TableInfo) -> float:
+        # Сколько свободных столов не меньше этого: чем меньше, тем ценнее стол
+        same_or_larger = len(free_seats) - bisect_left(free_seats, table.seats)
+        return (
+            WASTE_WEIGHT * (table.seats - guest_count)
+            + _zone_penalty(table.zone, preferred_zone)
+            + SCARCITY_WEIGHT / same_or_larger
+        )
+
+    return min(candidates, key=lambda t: (cost(t), t.id))
+
+
+class TableLayout:
+    """
+    Active tables prepared for allocation.
+
+    Zone grouping and neighbour lists are computed once per layout and reused
+    for every slot of the day.
+    """
+
+    def __init__(self, tables: Iterable[TableInfo]):
+        self.tables: List[TableInfo] = sorted(tables, key=lambda t: t.id)
+        self.by_id: Dict[int, TableInfo] = {t.id: t for t in self.tables}
+
+        self.by_zone: Dict[Zone, List[TableInfo]] = {}
+        for table in self.tables:
+            self.by_zone.setdefault(table.zone, []).append(table)
+
+        self.neighbours: Dict[int, List[int]] = {
+            table.id: [
+                other.id
+                for other in self.by_zone[table.zone]
+                if other.id != table.id and _distance(table, other) <= ADJACENCY_DISTANCE
+            ]
+            for table in self.tables
+        }
+
+    @property
+    def table_ids(self) -> Set[int]:
+        return set(self.by_id)
+
+
+def _best_combination(
+    layout: TableLayout,
+    free_table_ids: Set[int],
+    guest_count: int,
+    preferred_zone: Optional[Zone],
+) -> Optional[List[int]]:
+    """
+    Best group of neighbouring tables in one zone for a party larger than any free table.
+    Enumerates only connected groups (by ADJACENCY_DISTANCE) up to MAX_COMBINED_TABLES.
+    """
+    best_key = None
+    best_ids: Optional[List[int]] = None
+
+    for zone, zone_tables in layout.by_zone.items():
+        free_zone_ids = [t.id for t in zone_tables if t.id in free_table_ids]
+        if sum(layout.by_id[tid].seats for tid in free_zone_ids) < guest_count:
+            continue
+
+        zone_penalty = _zone_penalty(zone, preferred_zone)
+        frontier: Set[FrozenSet[int]] = {frozenset([tid]) for tid in free_zone_ids}
+
+        for size in range(2, MAX_COMBINED_TABLES + 1):
+            # Нижняя граница стоимости группы такого размера: если лучший
+            # вариант уже дешевле, перебирать большие группы бессмысленно
+            lower_bound = zone_penalty + COMBINE_WEIGHT * (size - 1)
+            if best_key is not None and best_key[0] <= lower_bound:
+                break
+
+            grown: Set[FrozenSet[int]] = set()
+            for group in frontier:
+                for table_id in group:
+                    for neighbour_id in layout.neighbours[table_id]:
+                        if neighbour_id in free_table_ids and neighbour_id not in group:
+                            grown.add(group | {neighbour_id})
+
+            for group in grown:
+                members = [layout.by_id[table_id] for table_id in group]
+                seats = sum(t.seats for t in members)
+                if seats < guest_count:
+                    continue
+                spread = sum(
+                    _distance(a, b)
+                    for i, a in enumerate(members)
+                    for b in members[i + 1:]
+                )
+                cost = (
+                    WASTE_WEIGHT * (seats - guest_count)
+                    + zone_penalty
+                    + COMBINE_WEIGHT * (size - 1)
+                    + DISTANCE_WEIGHT * spread
+                )
+                key = (cost, sorted(group))
+                if best_key is None or key < best_key:
+                    best_key = key
+                    # Основной стол брони - самый большой в группе
+                    best_ids = sorted(group, key=lambda tid: (-layout.by_id[tid].seats, tid))
+
+            frontier = grown
+
+    return best_ids
+
+
+def choose_tables(
+    layout: TableLayout,
+    free_table_ids: Set[int],
+    guest_count: int,
+    preferred_zone: Optional[Zone] = None,
+) -> Optional[List[int]]:
+    """
+    Choose tables for a booking among free ones.
+
+    Returns [table_id] for a single table, several ids (main table first) when
+    neighbouring tables have to be combined, or None if nothing fits.
+    The result is deterministic for the same input.
+    """
+    free_tables = [t for t in layout.tables if t.id in free_table_ids]
+    if not free_tables:
+        return None
+
+    single = _best_single(free_tables, guest_count, preferred_zone)
+    if single is not None:
+        return [single.id]
+
+    return _best_combination(layout, free_table_ids, guest_count, preferred_zone)
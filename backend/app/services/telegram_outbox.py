@@ -0,0 +1,373 @@
+"""
+Transactional outbox for Telegram notifications: messages are written in the
+same commit as the booking change and delivered by a background dispatcher,
+so webhooks and admin edits never wait for the Telegram API.
+"""
+import asyncio
+import logging
+import time
+from collections import deque
+from datetime import date, datetime, time as dt_time, timedelta, timezone
+from typing import Deque, Dict, List, NamedTuple, Optional
+
+import httpx
+from sqlalchemy import and_, delete, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.database import AsyncSessionLocal, is_sqlite, settings
+from app.models import Booking, OutboxStatus, Table, TelegramOutbox
+from app.services.telegram_service import (
+    TelegramError,
+    TelegramRateLimited,
+    booking_message,
+    booking_update_message,
+    is_configured,
+    payment_review_message,
+    send_telegram_message,
+)
+
+if is_sqlite:
+    from sqlalchemy.dialects.sqlite import insert as upsert
+else:
+    from sqlalchemy.dialects.postgresql import insert as upsert
+
+logger = logging.getLogger(__name__)
+
+# Старые отправленные сообщения удаляются не чаще раза в час
+PURGE_INTERVAL_SECONDS = 3600
+
+
+def _now() -> datetime:
+    now = datetime.now(timezone.utc)
+    return now.replace(tzinfo=None) if is_sqlite else now
+
+
+async def enqueue_message(
+    db: AsyncSession, dedup_key: str, text: str, booking_id: Optional[int] = None
+) -> None:
+    """
+    Add a message to the outbox in the current transaction (the caller commits).
+    A message with the same dedup_key is queued only once.
+    """
+    await db.execute(
+        upsert(TelegramOutbox)
+        .values(
+            dedup_key=dedup_key,
+            booking_id=booking_id,
+            chat_id=settings.telegram_chat_id,
+            text=text,
+            status=OutboxStatus.PENDING,
+            attempts=0,
+            next_attempt_at=_now(),
+        )
+        .on_conflict_do_nothing(index_elements=["dedup_key"])
+    )
+
+
+async def enqueue_booking_notification(
+    db: AsyncSession, booking: Booking, table: Optional[Table] = None
+) -> None:
+    """Queue the notification about a confirmed booking."""
+    await enqueue_message(
+        db, f"booking:{booking.id}:confirmed", booking_message(booking, table), booking.id
+    )
+
+
+async def enqueue_booking_update_notification(
+    db: AsyncSession,
+    booking: Booking,
+    table: Optional[Table] = None,
+    old_date: Optional[date] = None,
+    old_time: Optional[dt_time] = None,
+) -> None:
+    """Queue the notification about a moved booking."""
+    # Перенос с тех же даты и времени на те же - одно событие
+    dedup_key = (
+        f"booking:{booking.id}:moved:{old_date or booking.date}T{old_time or booking.time}"
+        f"->{booking.date}T{booking.time}"
+    )
+    await enqueue_message(
+        db, dedup_key, booking_update_message(booking, table, old_date, old_time), booking.id
+    )
+
+
+async def enqueue_payment_review_alert(
+    db: AsyncSession,
+    booking_id: int,
+    payment_id: str,
+    reason: str,
+    booking_exists: bool = True,
+) -> None:
+    """Queue the alert about a succeeded payment that did not confirm its booking."""
+    await enqueue_message(
+        db,
+        f"booking:{booking_id}:payment_review:{payment_id}",
+        payment_review_message(booking_id, payment_id, reason),
+        booking_id if booking_exists else None,
+    )
+
+
+class RateLimiter:
+    """Sliding window limit: at most `limit` events per `period` seconds."""
+
+    def __init__(self, limit: int, period: float):
+        self.limit = limit
+        self.period = period
+        self._events: Deque[float] = deque()
+
+    def delay(self) -> float:
+        """Seconds until the next event is allowed."""
+        now = time.monotonic()
+        while self._events and self._events[0] <= now - self.period:
+            self._events.popleft()
+        if len(self._events) < self.limit:
+            return 0.0
+        return self._events[0] + self.period - now
+
+    async def acquire(self) -> None:
+        """Wait for a free slot and take it."""
+        while True:
+            delay = self.delay()
+            if delay <= 0:
+                break
+            await asyncio.sleep(delay)
+        self._events.append(time.monotonic())
+
+
+class OutboxMessage(NamedTuple):
+    """Claimed outbox message."""
+
+    id: int
+    chat_id: str
+    text: str
+    attempts: int
+
+
+class TelegramOutboxDispatcher:
+    """
+    Sends due PENDING outbox messages in batches, oldest first.
+
+    Sending respects the Bot API limits (messages per second overall and per
+    minute to one chat), so Telegram does not start answering 429. If it
+    does, the dispatcher pauses for retry_after and the message is retried
+    without spending an attempt. Network errors and 5xx are retried with
+    exponential backoff; 400/403 (bad text, bot removed from the chat) fail
+    the message at once.
+
+    A batch is claimed by moving next_attempt_at past a lease, so several
+    uvicorn workers do not send the same message. The limits are kept per
+    process; the 429 handling covers the rest.
+    """
+
+    def __init__(
+        self,
+        poll_interval_seconds: float,
+        max_attempts: int,
+        retry_base_seconds: float,
+        messages_per_second: int,
+        chat_messages_per_minute: int,
+        retention_days: int,
+        lease_seconds: float = 300.0,
+        batch_size: int = 20,
+    ):
+        self.poll_interval_seconds = poll_interval_seconds
+        self.max_attempts = max_attempts
+        self.retry_base_seconds = retry_base_seconds
+        self.chat_messages_per_minute = chat_messages_per_minute
+        self.retention_days = retention_days
+        self.lease_seconds = lease_seconds
+        self.batch_size = batch_size
+        self._global_limit = RateLimiter(messages_per_second, 1.0)
+        self._chat_limits: Dict[str, RateLimiter] = {}
+        self._paused_until = 0.0
+        self._purged_at = 0.0
+        self._task: Optional[asyncio.Task] = None
+        self._wakeup = asyncio.Event()
+
+    def start(self) -> None:
+        """Start the dispatcher loop on the running event loop."""
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run(), name="telegram-outbox")
+
+    async def stop(self) -> None:
+        """Stop the dispatcher loop (unsent messages stay in the outbox)."""
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+
+    def notify(self) -> None:
+        """Wake the dispatcher up (a new message was committed)."""
+        self._wakeup.set()
+
+    def _chat_limit(self, chat_id: str) -> RateLimiter:
+        limiter = self._chat_limits.get(chat_id)
+        if limiter is None:
+            limiter = self._chat_limits[chat_id] = RateLimiter(self.chat_messages_per_minute, 60.0)
+        return limiter
+
+    async def _claim_due(self) -> List[OutboxMessage]:
+        now = _now()
+        due = and_(
+            TelegramOutbox.status == OutboxStatus.PENDING,
+            TelegramOutbox.next_attempt_at <= now,
+        )
+        async with AsyncSessionLocal() as db:
+            result = await db.execute(
+                select(TelegramOutbox.id)
+                .where(due)
+                .order_by(TelegramOutbox.id)
+                .limit(self.batch_size)
+            )
+            ids = result.scalars().all()
+            if not ids:
+                return []
+            # Аренда всей пачки одним запросом; RETURNING отдает только взятые строки
+            result = await db.execute(
+                update(TelegramOutbox)
+                .where(and_(TelegramOutbox.id.in_(ids), due))
+                .values(next_attempt_at=now + timedelta(seconds=self.lease_seconds))
+                .returning(
+                    TelegramOutbox.id,
+                    TelegramOutbox.chat_id,
+                    TelegramOutbox.text,
+                    TelegramOutbox.attempts,
+                )
+                .execution_options(synchronize_session=False)
+            )
+            claimed = sorted((OutboxMessage(*row) for row in result.all()), key=lambda m: m.id)
+            await db.commit()
+        return claimed
+
+    async def _save(self, message_ids: List[int], **values) -> None:
+        async with AsyncSessionLocal() as db:
+            await db.execute(
+                update(TelegramOutbox)
+                .where(TelegramOutbox.id.in_(message_ids))
+                .values(**values)
+                .execution_options(synchronize_session=False)
+            )
+            await db.commit()
+
+    async def _send(self, message: OutboxMessage) -> None:
+        if not is_configured():
+            # Mock mode - just log
+            print(f"[MOCK] Telegram notification would be sent:\n{message.text}")
+            await self._save([message.id], status=OutboxStatus.SENT, sent_at=_now())
+            return
+
+        await self._global_limit.acquire()
+        await self._chat_limit(message.chat_id).acquire()
+
+        attempts = message.attempts + 1
+        try:
+            await send_telegram_message(message.text, message.chat_id)
+        except TelegramRateLimited:
+            raise
+        except (TelegramError, httpx.HTTPError) as e:
+            permanent = isinstance(e, TelegramError) and e.permanent
+            if permanent or attempts >= self.max_attempts:
+                logger.error(
+                    f"Telegram message {message.id} failed after {attempts} attempts: {str(e)}"
+                )
+                await self._save(
+                    [message.id],
+                    status=OutboxStatus.FAILED,
+                    attempts=attempts,
+                    last_error=str(e),
+                )
+            else:
+                delay = self.retry_base_seconds * 2 ** (attempts - 1)
+                logger.warning(
+                    f"Telegram message {message.id} failed (attempt {attempts}), "
+                    f"retrying in {delay:.0f}s: {str(e)}"
+                )
+                await self._save(
+                    [message.id],
+                    attempts=attempts,
+                    next_attempt_at=_now() + timedelta(seconds=delay),
+                    last_error=str(e) or type(e).__name__,
+                )
+            return
+
+        await self._save(
+            [message.id],
+            status=OutboxStatus.SENT,
+            attempts=attempts,
+            sent_at=_now(),
+            last_error=None,
+        )
+
+    async def _purge_sent(self) -> None:
+        if time.monotonic() - self._purged_at < PURGE_INTERVAL_SECONDS:
+            return
+        self._purged_at = time.monotonic()
+        # Ключи дедупликации живут столько же, сколько отправленные сообщения
+        async with AsyncSessionLocal() as db:
+            await db.execute(
+                delete(TelegramOutbox).where(
+                    and_(
+                        TelegramOutbox.status == OutboxStatus.SENT,
+                        TelegramOutbox.sent_at < _now() - timedelta(days=self.retention_days),
+                    )
+                )
+            )
+            await db.commit()
+
+    async def process_due(self) -> int:
+        """Send one batch of due messages; returns how many were claimed."""
+        pause = self._paused_until - time.monotonic()
+        if pause > 0:
+            await asyncio.sleep(pause)
+
+        claimed = await self._claim_due()
+        for index, message in enumerate(claimed):
+            try:
+                await self._send(message)
+            except TelegramRateLimited as e:
+                logger.warning(f"Telegram rate limit hit, pausing for {e.retry_after:.0f}s")
+                self._paused_until = time.monotonic() + e.retry_after
+                # Остаток пачки возвращаем в очередь после паузы, попытки не тратим
+                await self._save(
+                    [m.id for m in claimed[index:]],
+                    next_attempt_at=_now() + timedelta(seconds=e.retry_after),
+                )
+                break
+            except Exception as e:
+                # Аренда истечет, и сообщение возьмут снова
+                logger.error(f"Telegram outbox message {message.id} error: {str(e)}", exc_info=True)
+        return len(claimed)
+
+    async def _run(self) -> None:
+        while True:
+            self._wakeup.clear()
+            try:
+                processed = await self.process_due()
+                await self._purge_sent()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Telegram outbox dispatcher error: {str(e)}", exc_info=True)
+                processed = 0
+
+            if processed < self.batch_size:
+                # Новые сообщения будят диспетчер сразу, повторы подбираются по таймеру
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), self.poll_interval_seconds)
+                except asyncio.TimeoutError:
+                    pass
+
+
+# Global instance
+telegram_dispatcher = TelegramOutboxDispatcher(
+    poll_interval_seconds=settings.telegram_poll_interval_seconds,
+    max_attempts=settings.telegram_max_attempts,
+    retry_base_seconds=settings.telegram_retry_base_seconds,
+    messages_per_second=settings.telegram_messages_per_second,
+    chat_messages_per_minute=settings.telegram_chat_messages_per_minute,
+    retention_days=settings.telegram_outbox_retention_days,
+)
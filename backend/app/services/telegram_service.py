@@ -1,28 +1,55 @@
 """
-Telegram bot service for sending booking notifications.
+Telegram bot service for booking notifications.
+
+Messages are not sent from request handlers: they are written to the
+telegram_outbox table (app.services.telegram_outbox) and delivered by a
+background dispatcher through send_telegram_message.
 """
-import httpx
 from datetime import date, time
+from html import escape
+from typing import Optional
+
 from app.database import settings
 from app.models import Booking, Table, Zone
+from app.services.http_clients import TELEGRAM, http_clients
+
+# Ответы Bot API, после которых повтор не поможет: неверный текст или чат,
+# бот удален из группы
+PERMANENT_ERROR_CODES = (400, 403)
+
+
+class TelegramError(Exception):
+    """Telegram did not accept the message."""
+
+    def __init__(self, description: str, permanent: bool = False):
+        super().__init__(description)
+        self.permanent = permanent
+
 
+class TelegramRateLimited(TelegramError):
+    """Telegram answered 429: nothing may be sent for retry_after seconds."""
 
-async def send_booking_notification(booking: Booking, table: Table = None) -> bool:
+    def __init__(self, description: str, retry_after: float):
+        super().__init__(description)
+        self.retry_after = retry_after
+
+
+def is_configured() -> bool:
+    """Bot token and chat are set (otherwise notifications are only logged)."""
+    return bool(settings.telegram_bot_token and settings.telegram_chat_id)
+
+
+def booking_message(booking: Booking, table: Table = None) -> str:
     """
-    Send a beautiful booking notification to Telegram chat.
+    Build a beautiful new booking notification for the Telegram chat.
     
     Args:
         booking: Booking instance
         table: Table instance (optional)
     
     Returns:
-        bool: True if message sent successfully, False otherwise
+        str: Message text (HTML parse mode)
     """
-    if not settings.telegram_bot_token or not settings.telegram_chat_id:
-        # Mock mode - just log
-        print(f"[MOCK] Telegram notification would be sent for booking #{booking.id}")
-        return True
-    
     # Format zone name in Russian
     zone_names = {
         Zone.HALL_1: "1 зал",
@@ -49,12 +76,12 @@ async def send_booking_notification(booking: Booking, table: Table = None) -> bo
 📅 Дата: {booking.date.strftime('%d.%m.%Y')}
 ⏰ Время: {booking.time.strftime('%H:%M')}
 👥 Гостей: {booking.guest_count}
-👤 Имя: {booking.user_name}
-📞 Телефон: {booking.user_phone}"""
+👤 Имя: {escape(booking.user_name)}
+📞 Телефон: {escape(booking.user_phone)}"""
     
     if table:
         message += f"""
-🪑 Стол №{table_number} ({zone_name})
+🪑 Стол №{escape(table_number)} ({zone_name})
 💺 Мест: {table.seats}"""
     
     message += f"""
@@ -63,22 +90,22 @@ async def send_booking_notification(booking: Booking, table: Table = None) -> bo
     
     if booking.comment:
         message += f"""
-💬 Комментарий: {booking.comment}"""
+💬 Комментарий: {escape(booking.comment)}"""
     
     message += f"""
 🆔 ID брони: #{booking.id}"""
     
-    return await _send_telegram_message(message)
+    return message
 
 
-async def send_booking_update_notification(
+def booking_update_message(
     booking: Booking, 
     table: Table = None,
     old_date: date = None,
     old_time: time = None
-) -> bool:
+) -> str:
     """
-    Send a notification when booking date/time is changed.
+    Build a notification about a changed booking date/time.
     
     Args:
         booking: Updated Booking instance
@@ -87,12 +114,8 @@ async def send_booking_update_notification(
         old_time: Previous time
     
     Returns:
-        bool: True if message sent successfully, False otherwise
+        str: Message text (HTML parse mode)
     """
-    if not settings.telegram_bot_token or not settings.telegram_chat_id:
-        print(f"[MOCK] Telegram update notification would be sent for booking #{booking.id}")
-        return True
-    
     # Get table_number
     table_number = table.table_number if table and table.table_number else (str(table.id) if table else "?")
     
@@ -100,8 +123,8 @@ async def send_booking_update_notification(
     message = f"""✏️ БРОНЬ ИЗМЕНЕНА!
 
 🆔 ID брони: #{booking.id}
-👤 Гость: {booking.user_name}
-📞 Телефон: {booking.user_phone}
+👤 Гость: {escape(booking.user_name)}
+📞 Телефон: {escape(booking.user_phone)}
 
 📝 Изменения:"""
 
@@ -116,33 +139,57 @@ async def send_booking_update_notification(
     if table:
         message += f"""
 
-🪑 Стол: №{table_number}"""
+🪑 Стол: №{escape(table_number)}"""
     
     message += f"""
 👥 Гостей: {booking.guest_count}"""
     
-    return await _send_telegram_message(message)
+    return message
 
 
-async def _send_telegram_message(message: str) -> bool:
+def payment_review_message(booking_id: int, payment_id: str, reason: str) -> str:
     """
-    Internal helper to send a message via Telegram Bot API.
+    Build an alert about a succeeded payment whose booking was not confirmed.
+
+    Returns:
+        str: Message text (HTML parse mode)
     """
-    url = f"https://api.telegram.org/bot{settings.telegram_bot_token}/sendMessage"
-    
+    return f"""⚠️ ОПЛАТА БЕЗ БРОНИ!
+
+🆔 ID брони: #{booking_id}
+💳 Платеж: {escape(payment_id)}
+❗ Причина: {escape(reason)}
+
+Платеж нужно вернуть или подтвердить бронь вручную."""
+
+
+async def send_telegram_message(message: str, chat_id: Optional[str] = None) -> None:
+    """
+    Send a message via Telegram Bot API.
+
+    Raises TelegramRateLimited on 429, TelegramError on other API errors
+    and httpx errors on network failures.
+    """
+    url = f"/bot{settings.telegram_bot_token}/sendMessage"
+
+    # Общий клиент telegram (TELEGRAM_API_URL): соединение переиспользуется между сообщениями
+    response = await http_clients.get(TELEGRAM).post(
+        url,
+        json={
+            "chat_id": chat_id or settings.telegram_chat_id,
+            "text": message,
+            "parse_mode": "HTML"
+        },
+    )
+    if response.is_success:
+        return
+
     try:
-        async with httpx.AsyncClient() as client:
-            response = await client.post(
-                url,
-                json={
-                    "chat_id": settings.telegram_chat_id,
-                    "text": message,
-                    "parse_mode": "HTML"
-                },
-                timeout=10.0
-            )
-            response.raise_for_status()
-            return True
-    except Exception as e:
-        print(f"Error sending Telegram notification: {e}")
-        return False
+        payload = response.json()
+    except ValueError:
+        payload = {}
+    description = payload.get("description") or f"HTTP {response.status_code}"
+    if response.status_code == 429:
+        retry_after = payload.get("parameters", {}).get("retry_after", 1)
+        raise TelegramRateLimited(description, float(retry_after))
+    raise TelegramError(description, permanent=response.status_code in PERMANENT_ERROR_CODES)
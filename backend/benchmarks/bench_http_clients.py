@@ -0,0 +1,117 @@
+"""
+Micro-benchmark: connection reuse of the shared HTTP clients.
+
+Starts a local mock upstream (a minimal HTTP/1.1 server with keep-alive
+that counts TCP connections), points the Telegram client at it and sends
+the same notifications twice: with a new httpx.AsyncClient per call (the
+previous approach) and through the shared client of app.services.http_clients.
+Reports latency and the number of connections each approach opened.
+
+Run from backend/:
+    python benchmarks/bench_http_clients.py [calls]
+"""
+import asyncio
+import os
+import sys
+import time as timer
+from typing import Dict, List
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+CALLS = 300
+RESPONSE = b'{"ok": true}'
+
+
+class MockUpstream:
+    """HTTP/1.1 server answering every request with 200 and a small JSON body."""
+
+    def __init__(self):
+        self.connections = 0
+        self.requests = 0
+        self._server = None
+
+    async def start(self) -> str:
+        self._server = await asyncio.start_server(self._handle, "127.0.0.1", 0)
+        host, port = self._server.sockets[0].getsockname()[:2]
+        return f"http://{host}:{port}"
+
+    async def stop(self) -> None:
+        self._server.close()
+        await self._server.wait_closed()
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        self.connections += 1
+        try:
+            while True:
+                head = await reader.readuntil(b"\r\n\r\n")
+                length = 0
+                for line in head.split(b"\r\n"):
+                    if line.lower().startswith(b"content-length:"):
+                        length = int(line.split(b":", 1)[1])
+                await reader.readexactly(length)
+                self.requests += 1
+                writer.write(
+                    b"HTTP/1.1 200 OK\r\nContent-Type: application/json\r\n"
+                    b"Content-Length: %d\r\n\r\n%s" % (len(RESPONSE), RESPONSE)
+                )
+                await writer.drain()
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            writer.close()
+
+
+async def main() -> None:
+    calls = int(sys.argv[1]) if len(sys.argv) > 1 else CALLS
+
+    upstream = MockUpstream()
+    base_url = await upstream.start()
+    # Настройки читаются при импорте приложения - окружение задаем до него
+    os.environ.update(
+        TELEGRAM_API_URL=base_url,
+        TELEGRAM_BOT_TOKEN="bench-token",
+        TELEGRAM_CHAT_ID="1",
+    )
+
+    import httpx
+
+    from app.services.http_clients import http_clients
+    from app.services.telegram_service import send_telegram_message
+    from stats import print_report, summarize
+
+    async def per_call_client() -> None:
+        async with httpx.AsyncClient() as client:
+            response = await client.post(
+                f"{base_url}/botbench-token/sendMessage",
+                json={"chat_id": "1", "text": "benchmark", "parse_mode": "HTML"},
+                timeout=10.0,
+            )
+            response.raise_for_status()
+
+    async def shared_client() -> None:
+        # Путь отправки диспетчера outbox: ошибки Bot API поднимаются исключениями
+        await send_telegram_message("benchmark")
+
+    results: Dict[str, Dict[str, float]] = {}
+    connections: Dict[str, int] = {}
+    for name, call in (("new client per call", per_call_client), ("shared client", shared_client)):
+        opened_before = upstream.connections
+        samples: List[float] = []
+        for _ in range(calls):
+            started = timer.perf_counter()
+            await call()
+            samples.append((timer.perf_counter() - started) * 1000)
+        results[name] = summarize(samples)
+        connections[name] = upstream.connections - opened_before
+
+    await http_clients.aclose()
+    await upstream.stop()
+
+    print_report(f"Telegram notifications against a local mock upstream ({calls} calls)", results)
+    for name, opened in connections.items():
+        print(f"{name:<32}{opened:>8} TCP connections")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,188 @@
+"""
+Micro-benchmarks of the hot paths of the API on the seeded dataset.
+
+Covers availability grid (cold and cached), table allocation, review
+mapping and menu serialisation (full build and cached snapshot). Each benchmark reports p50/p95/p99 latency
+and calls per second; --save/--baseline turn the run into a regression check.
+The run also fails (exit code 1) if the availability query does not use
+its index on the seeded dataset.
+
+Run from backend/ (seed first, see dataset.py; --seed repeats the URL of the
+database to wipe, it must match DATABASE_URL):
+    export DATABASE_URL=sqlite+aiosqlite:///bench.db
+    python benchmarks/bench_micro.py --seed sqlite+aiosqlite:///bench.db
+    python benchmarks/bench_micro.py --save baseline.json
+    python benchmarks/bench_micro.py --baseline baseline.json --max-regression 0.2
+"""
+import argparse
+import asyncio
+import os
+import random
+import sys
+import time as timer
+from datetime import date, time, timedelta
+from typing import Awaitable, Callable, Dict, List
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from sqlalchemy import select, text
+
+from app.database import AsyncSessionLocal, engine
+from app.models import Review
+from app.routers.reviews import map_review_to_schema
+from app.services.analytics_service import get_occupancy_heatmap, reset_analytics_days
+from app.services.booking_service import (
+    build_day_occupancy,
+    find_available_tables,
+    get_day_availability,
+    invalidate_availability_cache,
+)
+from app.services.menu_service import build_menu, get_menu_snapshot, menu_adapter
+from app.services.stats_service import get_overall_stats, get_weekday_stats
+from dataset import seed_dataset
+from migrate_add_booking_indexes import INDEX_NAME, availability_plan
+from stats import check_regressions, print_report, save_results, summarize
+
+ITERATIONS = 300
+WARMUP = 10
+
+
+async def run_benchmark(
+    call: Callable[[int], Awaitable[object]], iterations: int
+) -> Dict[str, float]:
+    for i in range(WARMUP):
+        await call(i)
+
+    samples = []
+    started = timer.perf_counter()
+    for i in range(iterations):
+        call_started = timer.perf_counter()
+        await call(i)
+        samples.append((timer.perf_counter() - call_started) * 1000)
+    return summarize(samples, timer.perf_counter() - started)
+
+
+async def check_availability_plan(target_date: date) -> bool:
+    """EXPLAIN the availability query on the seeded data; True if it uses its index."""
+    async with engine.connect() as conn:
+        # Статистика после массовой вставки, иначе план зависит от автоанализа
+        await conn.execute(text("ANALYZE bookings"))
+        plan = await availability_plan(conn, target_date)
+        await conn.commit()
+    if INDEX_NAME in plan:
+        return True
+    print(f"PLAN availability query does not use '{INDEX_NAME}':\n{plan}")
+    return False
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description="Micro-benchmarks of booking API hot paths")
+    parser.add_argument(
+        "--seed", metavar="DATABASE_URL", help="wipe and reseed this database (must be DATABASE_URL)"
+    )
+    parser.add_argument("--iterations", type=int, default=ITERATIONS)
+    parser.add_argument("--save", help="write results as JSON (baseline for later runs)")
+    parser.add_argument("--baseline", help="compare p95 with a saved JSON run")
+    parser.add_argument("--max-regression", type=float, default=0.2)
+    args = parser.parse_args()
+
+    if args.seed:
+        print("Seeding dataset...")
+        print(await seed_dataset(args.seed))
+
+    rng = random.Random(1)
+    today = date.today()
+    # Ближайшие даты - самые запрашиваемые
+    dates: List[date] = [today + timedelta(days=rng.randint(1, 30)) for _ in range(64)]
+    guest_counts = [2, 2, 2, 4, 4, 6, 8]
+
+    async with AsyncSessionLocal() as db:
+        reviews = (await db.execute(select(Review).limit(50))).scalars().all()
+        occupancy = await build_day_occupancy(db, dates[0])
+
+    async def availability_cold(i: int):
+        invalidate_availability_cache()
+        async with AsyncSessionLocal() as db:
+            return await get_day_availability(db, dates[i % len(dates)], guest_counts[i % 7])
+
+    async def availability_cached(i: int):
+        async with AsyncSessionLocal() as db:
+            return await get_day_availability(db, dates[i % 4], 2)
+
+    async def allocate_table(i: int):
+        async with AsyncSessionLocal() as db:
+            return await find_available_tables(
+                db, dates[0], time(12 + i % 9, 30 * (i % 2)), guest_counts[i % 7],
+                occupancy=occupancy,
+            )
+
+    async def allocate_with_occupancy_load(i: int):
+        async with AsyncSessionLocal() as db:
+            return await find_available_tables(
+                db, dates[i % len(dates)], time(19, 0), guest_counts[i % 7]
+            )
+
+    async def review_mapping(i: int):
+        return [map_review_to_schema(review) for review in reviews]
+
+    async def menu_serialisation(i: int):
+        async with AsyncSessionLocal() as db:
+            return menu_adapter.dump_json(await build_menu(db))
+
+    async def menu_snapshot(i: int):
+        async with AsyncSessionLocal() as db:
+            return await get_menu_snapshot(db)
+
+    async def overall_stats(i: int):
+        async with AsyncSessionLocal() as db:
+            return await get_overall_stats(db)
+
+    async def weekday_stats(i: int):
+        async with AsyncSessionLocal() as db:
+            return await get_weekday_stats(db, today - timedelta(days=365), today)
+
+    async def occupancy_heatmap_cold(i: int):
+        async with AsyncSessionLocal() as db:
+            await reset_analytics_days(db)
+            await db.commit()
+            return await get_occupancy_heatmap(db, today - timedelta(days=90), today)
+
+    async def occupancy_heatmap_stored(i: int):
+        async with AsyncSessionLocal() as db:
+            return await get_occupancy_heatmap(db, today - timedelta(days=90), today)
+
+    benchmarks = {
+        "get_day_availability[cold]": availability_cold,
+        "get_day_availability[cached]": availability_cached,
+        "find_available_tables": allocate_table,
+        "find_available_tables+load": allocate_with_occupancy_load,
+        "map_review_to_schema[x50]": review_mapping,
+        "menu_serialisation": menu_serialisation,
+        "menu_snapshot[cached]": menu_snapshot,
+        "admin_stats": overall_stats,
+        "weekday_stats[year]": weekday_stats,
+        "occupancy_heatmap[90d,cold]": occupancy_heatmap_cold,
+        "occupancy_heatmap[90d,stored]": occupancy_heatmap_stored,
+    }
+
+    results = {}
+    for name, call in benchmarks.items():
+        results[name] = await run_benchmark(call, args.iterations)
+    print_report("Micro-benchmarks", results)
+
+    failed = not await check_availability_plan(dates[0])
+
+    if args.save:
+        save_results(args.save, results)
+    if args.baseline:
+        regressions = check_regressions(results, args.baseline, args.max_regression)
+        for line in regressions:
+            print(f"REGRESSION {line}")
+        failed = failed or bool(regressions)
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
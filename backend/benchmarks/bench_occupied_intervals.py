@@ -0,0 +1,122 @@
+"""
+Micro-benchmark: loading occupied intervals for one day.
+
+Compares the previous approach (full ORM Booking objects converted to
+interval dicts) with the column projection used by booking_service
+(plain (table_id, time) tuples). Reports time and Python allocations per call.
+
+Run from backend/ (needs aiosqlite for the local SQLite database):
+    python benchmarks/bench_occupied_intervals.py [bookings_per_day]
+"""
+import asyncio
+import os
+import sys
+import tempfile
+import time as timer
+import tracemalloc
+from datetime import date, datetime, time, timedelta
+
+DB_PATH = os.path.join(tempfile.gettempdir(), "senoval_bench_intervals.db")
+# Всегда временная база: seed() удаляет брони и столы, DATABASE_URL из окружения не берем
+os.environ["DATABASE_URL"] = f"sqlite+aiosqlite:///{DB_PATH}"
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import and_, delete, select
+
+from app.database import AsyncSessionLocal, init_db
+from app.models import Booking, BookingStatus, Table, Zone
+from app.services.booking_service import get_occupied_intervals
+
+TARGET_DATE = date.today() + timedelta(days=7)
+ITERATIONS = 200
+
+
+async def seed(bookings_per_day: int) -> None:
+    """Create 100 tables and a fully booked target day."""
+    await init_db()
+    async with AsyncSessionLocal() as db:
+        await db.execute(delete(Booking))
+        await db.execute(delete(Table))
+        for table_id in range(1, 101):
+            db.add(Table(id=table_id, table_number=str(table_id), zone=Zone.HALL_1,
+                         seats=4, x=0, y=0))
+        for i in range(bookings_per_day):
+            db.add(Booking(
+                user_name="Гость Бенчмарков",
+                user_phone="+79990000000",
+                date=TARGET_DATE,
+                time=time(12 + (i % 10), 0),
+                guest_count=2,
+                status=BookingStatus.CONFIRMED,
+                deposit_amount=500.0,
+                table_id=1 + i % 100,
+                comment="Комментарий к брони, который раньше загружался впустую",
+            ))
+        await db.commit()
+
+
+async def orm_intervals(db, target_date: date):
+    """Previous implementation: full ORM objects -> interval dicts."""
+    result = await db.execute(
+        select(Booking).where(
+            and_(
+                Booking.date == target_date,
+                Booking.status == BookingStatus.CONFIRMED,
+                Booking.table_id.isnot(None),
+            )
+        )
+    )
+    intervals = []
+    for booking in result.scalars().all():
+        start_dt = datetime.combine(booking.date, booking.time)
+        intervals.append({
+            "table_id": booking.table_id,
+            "start": start_dt,
+            "end": start_dt + timedelta(hours=2),
+        })
+    return intervals
+
+
+async def projected_intervals(db, target_date: date):
+    """Current implementation: column projection."""
+    return await get_occupied_intervals(db, target_date)
+
+
+async def measure(name: str, loader) -> None:
+    # Новая сессия на каждый вызов, как в обработчике запроса
+    async with AsyncSessionLocal() as db:
+        await loader(db, TARGET_DATE)  # warm-up
+
+    started = timer.perf_counter()
+    for _ in range(ITERATIONS):
+        async with AsyncSessionLocal() as db:
+            rows = await loader(db, TARGET_DATE)
+    elapsed_ms = (timer.perf_counter() - started) * 1000 / ITERATIONS
+
+    # Объекты, удерживаемые результатом и сессией, и пиковая память вызова
+    tracemalloc.start()
+    async with AsyncSessionLocal() as db:
+        before = tracemalloc.take_snapshot()
+        tracemalloc.reset_peak()
+        rows = await loader(db, TARGET_DATE)
+        _, peak = tracemalloc.get_traced_memory()
+        after = tracemalloc.take_snapshot()
+    tracemalloc.stop()
+    stats = after.compare_to(before, "filename")
+    blocks = sum(stat.count_diff for stat in stats if stat.count_diff > 0)
+
+    print(f"{name:<12} rows={len(rows):<6} {elapsed_ms:8.2f} ms/call "
+          f"{blocks:8d} live blocks {peak / 1024:10.1f} KiB peak")
+
+
+async def main() -> None:
+    bookings_per_day = int(sys.argv[1]) if len(sys.argv) > 1 else 1000
+    print(f"Seeding {bookings_per_day} bookings for {TARGET_DATE}...")
+    await seed(bookings_per_day)
+    await measure("orm", orm_intervals)
+    await measure("projection", projected_intervals)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,145 @@
+"""
+HTTP load scenario against a running API server.
+
+Simulates a mix of guests (menu, reviews, availability lookups) and the
+admin panel (bookings list, stats) with N concurrent clients for a fixed
+duration, then reports p50/p95/p99 latency and throughput per endpoint.
+
+Run from backend/ against a local server on the seeded database:
+    export DATABASE_URL=sqlite+aiosqlite:///bench.db   # or a Postgres container
+    python benchmarks/dataset.py --database-url "$DATABASE_URL"
+    uvicorn app.main:app --port 8000 --workers 2 &
+    python benchmarks/load_test.py --concurrency 32 --duration 30 --save load.json
+"""
+import argparse
+import asyncio
+import os
+import random
+import sys
+import time as timer
+from collections import defaultdict
+from datetime import date, timedelta
+from typing import Callable, Dict, List, Optional, Tuple
+
+import httpx
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from stats import check_regressions, print_report, save_results, summarize
+
+# (вес, имя, построитель пути) - доля запросов в общем потоке
+Scenario = Tuple[int, str, Callable[[random.Random], str]]
+
+
+def _day(rng: random.Random) -> str:
+    return (date.today() + timedelta(days=rng.randint(1, 30))).isoformat()
+
+
+GUEST_SCENARIOS: List[Scenario] = [
+    (30, "GET /menu", lambda rng: "/api/menu"),
+    (15, "GET /reviews", lambda rng: "/api/reviews?limit=20"),
+    (35, "GET /bookings/availability/{date}",
+     lambda rng: f"/api/bookings/availability/{_day(rng)}?guest_count={rng.choice([2, 2, 4, 6])}"),
+    (10, "GET /bookings/availability?from&to",
+     lambda rng: f"/api/bookings/availability?from={date.today() + timedelta(days=1)}"
+                 f"&to={date.today() + timedelta(days=30)}&guest_count=2"),
+    (5, "GET /tables", lambda rng: "/api/tables"),
+]
+
+ADMIN_SCENARIOS: List[Scenario] = [
+    (3, "GET /bookings [admin]", lambda rng: "/api/bookings"),
+    (2, "GET /admin/stats", lambda rng: "/api/admin/stats"),
+    (1, "GET /admin/stats/daily?from&to",
+     lambda rng: f"/api/admin/stats/daily?from={date.today() - timedelta(days=30)}"
+                 f"&to={date.today()}"),
+]
+
+
+async def client_loop(
+    client: httpx.AsyncClient,
+    scenarios: List[Scenario],
+    deadline: float,
+    seed: int,
+    samples: Dict[str, List[float]],
+    errors: Dict[str, int],
+) -> None:
+    rng = random.Random(seed)
+    weights = [weight for weight, _, _ in scenarios]
+    while timer.perf_counter() < deadline:
+        _, name, build_path = rng.choices(scenarios, weights=weights)[0]
+        started = timer.perf_counter()
+        try:
+            response = await client.get(build_path(rng))
+            failed = response.status_code >= 400
+        except httpx.HTTPError:
+            failed = True
+        samples[name].append((timer.perf_counter() - started) * 1000)
+        if failed:
+            errors[name] += 1
+
+
+async def run_load(
+    base_url: str,
+    concurrency: int,
+    duration: float,
+    token: Optional[str],
+) -> Dict[str, Dict[str, float]]:
+    scenarios = GUEST_SCENARIOS + (ADMIN_SCENARIOS if token else [])
+    headers = {"Authorization": f"Bearer {token}"} if token else {}
+    samples: Dict[str, List[float]] = defaultdict(list)
+    errors: Dict[str, int] = defaultdict(int)
+
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(
+        base_url=base_url, headers=headers, limits=limits, timeout=30
+    ) as client:
+        # Прогрев: первые запросы заполняют кэши и пулы соединений
+        for _, _, build_path in scenarios:
+            await client.get(build_path(random.Random(0)))
+
+        started = timer.perf_counter()
+        deadline = started + duration
+        await asyncio.gather(*(
+            client_loop(client, scenarios, deadline, seed, samples, errors)
+            for seed in range(concurrency)
+        ))
+        elapsed = timer.perf_counter() - started
+
+    results = {
+        name: summarize(samples[name], elapsed, errors[name])
+        for _, name, _ in scenarios
+        if samples[name]
+    }
+    all_samples = [sample for values in samples.values() for sample in values]
+    results["TOTAL"] = summarize(all_samples, elapsed, sum(errors.values()))
+    return results
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description="Load scenario for the booking API")
+    parser.add_argument("--base-url", default="http://127.0.0.1:8000")
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--duration", type=float, default=30.0, help="seconds")
+    parser.add_argument("--token", default=os.getenv("BENCH_TOKEN"),
+                        help="admin JWT (printed by dataset.py) to include admin endpoints")
+    parser.add_argument("--save", help="write results as JSON (baseline for later runs)")
+    parser.add_argument("--baseline", help="compare p95 with a saved JSON run")
+    parser.add_argument("--max-regression", type=float, default=0.2)
+    args = parser.parse_args()
+
+    print(f"Load: {args.concurrency} clients for {args.duration:.0f}s against {args.base_url}")
+    results = await run_load(args.base_url, args.concurrency, args.duration, args.token)
+    print_report("Load test", results)
+
+    if args.save:
+        save_results(args.save, results)
+    if args.baseline:
+        regressions = check_regressions(results, args.baseline, args.max_regression)
+        for line in regressions:
+            print(f"REGRESSION {line}")
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,238 @@
+"""
+Payment reconciliation against a local fake YooKassa.
+
+Starts a minimal HTTP server implementing GET /payments of the YooKassa list
+API (created_at.gte / created_at.lt filters, limit, next_cursor), seeds a
+scratch database with PENDING and CONFIRMED bookings and payments for them
+(paid, canceled, still pending, retried after a cancel), then runs
+reconcile_payments twice. The first run must apply exactly the expected
+corrections, the second must find nothing left to change. Reports the run
+time and the number of API requests next to what one get_payment_status
+call per booking would cost. Exits with 1 on a mismatch.
+
+Run from backend/:
+    python benchmarks/reconcile_fake_yookassa.py [bookings]
+"""
+import asyncio
+import json
+import os
+import random
+import sys
+import tempfile
+import time as timer
+from datetime import date, datetime, time, timedelta, timezone
+from typing import Dict, List, Set
+from urllib.parse import parse_qs, urlsplit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+BOOKINGS = 2000
+RANDOM_SEED = 20240601
+
+
+def _parse_timestamp(value: str) -> datetime:
+    return datetime.strptime(value, "%Y-%m-%dT%H:%M:%S.%fZ").replace(tzinfo=timezone.utc)
+
+
+class FakeYooKassa:
+    """HTTP/1.1 server with keep-alive answering GET /payments like the YooKassa list API."""
+
+    def __init__(self, payments: List[Dict]):
+        # Как в YooKassa: новые платежи первыми
+        self.payments = sorted(payments, key=lambda p: p["created_at"], reverse=True)
+        self.requests = 0
+        self._server = None
+
+    async def start(self) -> str:
+        self._server = await asyncio.start_server(self._handle, "127.0.0.1", 0)
+        host, port = self._server.sockets[0].getsockname()[:2]
+        return f"http://{host}:{port}"
+
+    async def stop(self) -> None:
+        self._server.close()
+        await self._server.wait_closed()
+
+    def _page(self, query: Dict[str, List[str]]) -> Dict:
+        created_from = _parse_timestamp(query["created_at.gte"][0])
+        created_to = _parse_timestamp(query["created_at.lt"][0])
+        limit = min(int(query.get("limit", ["10"])[0]), 100)
+        offset = int(query.get("cursor", ["0"])[0])
+        matching = [
+            p for p in self.payments
+            if created_from <= _parse_timestamp(p["created_at"]) < created_to
+        ]
+        page = {"type": "list", "items": matching[offset:offset + limit]}
+        if offset + limit < len(matching):
+            page["next_cursor"] = str(offset + limit)
+        return page
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        try:
+            while True:
+                head = await reader.readuntil(b"\r\n\r\n")
+                method, target = head.split(b" ", 2)[:2]
+                url = urlsplit(target.decode())
+                self.requests += 1
+                if method == b"GET" and url.path.endswith("/payments"):
+                    status, body = b"200 OK", json.dumps(self._page(parse_qs(url.query))).encode()
+                else:
+                    status, body = b"404 Not Found", b'{"type": "error"}'
+                writer.write(
+                    b"HTTP/1.1 %s\r\nContent-Type: application/json\r\n"
+                    b"Content-Length: %d\r\n\r\n%s" % (status, len(body), body)
+                )
+                await writer.drain()
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            writer.close()
+
+
+def _payment(payment_id: str, booking_id: int, status: str, created_at: datetime) -> Dict:
+    return {
+        "id": payment_id,
+        "status": status,
+        "paid": status == "succeeded",
+        "amount": {"value": "500.00", "currency": "RUB"},
+        "created_at": created_at.strftime("%Y-%m-%dT%H:%M:%S.%f")[:-3] + "Z",
+        "metadata": {"booking_id": str(booking_id)},
+    }
+
+
+async def main() -> int:
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else BOOKINGS
+    rng = random.Random(RANDOM_SEED)
+    now = datetime.now(timezone.utc)
+    window_from = now - timedelta(hours=24)
+
+    # Сценарий каждой брони: исходный статус и платежи в YooKassa
+    scenarios = []
+    payments: List[Dict] = []
+    expected_confirmed: Set[int] = set()
+    expected_cancelled: Set[int] = set()
+    expected_review: Set[int] = set()
+    retried: Set[int] = set()
+    for booking_id in range(1, count + 1):
+        created_at = window_from + timedelta(seconds=rng.randint(60, 23 * 3600))
+        kind = rng.choice(["paid", "paid", "canceled", "in_progress", "retried", "confirmed_canceled"])
+        initial = "CONFIRMED" if kind == "confirmed_canceled" else "PENDING"
+        scenarios.append((booking_id, initial))
+        if kind == "paid":
+            payments.append(_payment(f"pay-{booking_id}", booking_id, "succeeded", created_at))
+            expected_confirmed.add(booking_id)
+        elif kind == "canceled":
+            payments.append(_payment(f"pay-{booking_id}", booking_id, "canceled", created_at))
+            expected_cancelled.add(booking_id)
+        elif kind == "in_progress":
+            payments.append(_payment(f"pay-{booking_id}", booking_id, "pending", created_at))
+        elif kind == "retried":
+            payments.append(_payment(f"pay-{booking_id}-1", booking_id, "canceled", created_at))
+            payments.append(
+                _payment(f"pay-{booking_id}-2", booking_id, "succeeded", created_at + timedelta(minutes=5))
+            )
+            expected_confirmed.add(booking_id)
+            retried.add(booking_id)
+        else:
+            payments.append(_payment(f"pay-{booking_id}", booking_id, "canceled", created_at))
+            expected_review.add(booking_id)
+    # Платеж вне окна сверки не должен учитываться
+    payments.append(_payment("pay-old", 1, "canceled", window_from - timedelta(hours=1)))
+
+    upstream = FakeYooKassa(payments)
+    base_url = await upstream.start()
+    scratch_dir = tempfile.TemporaryDirectory()
+    # Настройки читаются при импорте приложения - окружение задаем до него
+    os.environ.update(
+        DATABASE_URL=f"sqlite+aiosqlite:///{scratch_dir.name}/reconcile.db",
+        YOOKASSA_API_URL=base_url,
+        YOOKASSA_SHOP_ID="fake-shop",
+        YOOKASSA_SECRET_KEY="fake-secret",
+        TELEGRAM_BOT_TOKEN="",
+        TELEGRAM_CHAT_ID="",
+    )
+
+    from sqlalchemy import func, insert, select
+
+    from app.database import AsyncSessionLocal, engine, init_db
+    from app.models import Booking, BookingStatus, TelegramOutbox
+    from app.services.http_clients import http_clients
+    from app.services.payment_reconciliation import reconcile_payments
+    from app.services.stats_service import rebuild_daily_stats
+
+    await init_db()
+    async with AsyncSessionLocal() as db:
+        await db.execute(
+            insert(Booking),
+            [
+                {
+                    "id": booking_id,
+                    "user_name": f"Гость {booking_id}",
+                    "user_phone": f"+7999{booking_id:07d}",
+                    "date": date.today() + timedelta(days=1 + booking_id % 30),
+                    "time": time(19, 0),
+                    "guest_count": 2,
+                    "status": BookingStatus(initial),
+                    "deposit_amount": 500.0,
+                    "created_at": now,
+                }
+                for booking_id, initial in scenarios
+            ],
+        )
+        await rebuild_daily_stats(db)
+        await db.commit()
+
+    async with AsyncSessionLocal() as db:
+        started = timer.perf_counter()
+        first = await reconcile_payments(db, window_from, now)
+        first_ms = (timer.perf_counter() - started) * 1000
+        first_requests = upstream.requests
+        second = await reconcile_payments(db, window_from, now)
+        statuses = dict(
+            (await db.execute(select(Booking.id, Booking.status))).all()
+        )
+        payment_ids = dict(
+            (await db.execute(select(Booking.id, Booking.payment_id))).all()
+        )
+        notifications = await db.scalar(select(func.count()).select_from(TelegramOutbox))
+
+    await http_clients.aclose()
+    await engine.dispose()
+    await upstream.stop()
+    scratch_dir.cleanup()
+
+    print(
+        f"Reconciled {count} bookings / {first.payments} payments in {first_ms:.0f} ms "
+        f"with {first_requests} list requests (get_payment_status per booking: {count} requests)"
+    )
+    print(
+        f"confirmed {len(first.confirmed)}, cancelled {len(first.cancelled)}, "
+        f"payment ids saved {first.payment_ids_set}, need review {len(first.needs_review)}"
+    )
+
+    problems = []
+    if set(first.confirmed) != expected_confirmed:
+        problems.append("confirmed bookings differ from the expected ones")
+    if set(first.cancelled) != expected_cancelled:
+        problems.append("cancelled bookings differ from the expected ones")
+    if set(first.needs_review) != expected_review:
+        problems.append("bookings for review differ from the expected ones")
+    if any(statuses[b] != BookingStatus.CONFIRMED for b in expected_confirmed):
+        problems.append("a paid booking is not CONFIRMED")
+    if any(statuses[b] != BookingStatus.CONFIRMED for b in expected_review):
+        problems.append("a CONFIRMED booking was changed by a canceled payment")
+    if any(payment_ids[b] != f"pay-{b}-2" for b in retried):
+        problems.append("a retried booking does not store its succeeded payment")
+    if notifications != len(expected_confirmed):
+        problems.append(f"{notifications} notifications queued, expected {len(expected_confirmed)}")
+    if second.confirmed or second.cancelled or second.payment_ids_set:
+        problems.append(f"second run still changed bookings: {second}")
+
+    for problem in problems:
+        print(f"FAIL: {problem}")
+    if not problems:
+        print("OK: corrections applied once, second run is a no-op")
+    return 1 if problems else 0
+
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(main()))
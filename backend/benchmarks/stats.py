@@ -0,0 +1,72 @@
+"""
+Latency statistics and regression check shared by the benchmark scripts.
+"""
+import json
+from typing import Dict, List, Optional, Sequence
+
+
+def percentile(sorted_samples: Sequence[float], pct: float) -> float:
+    """Percentile with linear interpolation; samples must be sorted."""
+    if not sorted_samples:
+        return 0.0
+    position = (len(sorted_samples) - 1) * pct / 100
+    lower = int(position)
+    upper = min(lower + 1, len(sorted_samples) - 1)
+    fraction = position - lower
+    return sorted_samples[lower] + (sorted_samples[upper] - sorted_samples[lower]) * fraction
+
+
+def summarize(samples_ms: List[float], elapsed_s: Optional[float] = None, errors: int = 0) -> Dict[str, float]:
+    """p50/p95/p99/max in ms and throughput (calls per second)."""
+    ordered = sorted(samples_ms)
+    if elapsed_s is None:
+        elapsed_s = sum(ordered) / 1000
+    return {
+        "count": len(ordered),
+        "errors": errors,
+        "p50_ms": round(percentile(ordered, 50), 3),
+        "p95_ms": round(percentile(ordered, 95), 3),
+        "p99_ms": round(percentile(ordered, 99), 3),
+        "max_ms": round(ordered[-1], 3) if ordered else 0.0,
+        "throughput_rps": round(len(ordered) / elapsed_s, 1) if elapsed_s else 0.0,
+    }
+
+
+def print_report(title: str, results: Dict[str, Dict[str, float]]) -> None:
+    print(f"\n{title}")
+    print(f"{'name':<32}{'count':>8}{'err':>6}{'p50 ms':>10}{'p95 ms':>10}"
+          f"{'p99 ms':>10}{'max ms':>10}{'rps':>10}")
+    for name, row in results.items():
+        print(f"{name:<32}{row['count']:>8}{row['errors']:>6}{row['p50_ms']:>10.2f}"
+              f"{row['p95_ms']:>10.2f}{row['p99_ms']:>10.2f}{row['max_ms']:>10.2f}"
+              f"{row['throughput_rps']:>10.1f}")
+
+
+def save_results(path: str, results: Dict[str, Dict[str, float]]) -> None:
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(results, f, indent=2, ensure_ascii=False)
+
+
+def check_regressions(
+    results: Dict[str, Dict[str, float]],
+    baseline_path: str,
+    max_regression: float,
+) -> List[str]:
+    """
+    Compare p95 with a saved baseline run.
+    Returns descriptions of benchmarks that got slower by more than max_regression (0.2 = 20%).
+    """
+    with open(baseline_path, encoding="utf-8") as f:
+        baseline = json.load(f)
+
+    regressions = []
+    for name, row in results.items():
+        previous = baseline.get(name)
+        if not previous or not previous.get("p95_ms"):
+            continue
+        ratio = row["p95_ms"] / previous["p95_ms"]
+        if ratio > 1 + max_regression:
+            regressions.append(
+                f"{name}: p95 {previous['p95_ms']:.2f} -> {row['p95_ms']:.2f} ms (x{ratio:.2f})"
+            )
+    return regressions
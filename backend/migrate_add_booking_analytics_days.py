@@ -0,0 +1,32 @@
+"""
+Migration script to add the booking_analytics_days table.
+Rows are filled on demand by the analytics endpoints (past days only).
+Safe to run several times.
+"""
+import asyncio
+import sys
+
+# Import database URL from app settings
+sys.path.insert(0, ".")
+from app.database import engine
+from app.models import BookingAnalyticsDay
+
+
+async def migrate():
+    """Create booking_analytics_days."""
+    async with engine.begin() as conn:
+        print("Creating table 'booking_analytics_days' (if not exists)...")
+        await conn.run_sync(
+            BookingAnalyticsDay.metadata.create_all, tables=[BookingAnalyticsDay.__table__]
+        )
+
+    await engine.dispose()
+
+    print("✓ Migration completed successfully!")
+
+
+if __name__ == "__main__":
+    print("=" * 50)
+    print("Migration: Add booking analytics days")
+    print("=" * 50)
+    asyncio.run(migrate())
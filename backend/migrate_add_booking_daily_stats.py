@@ -0,0 +1,40 @@
+"""
+Migration script to add the booking_daily_stats rollup table.
+Creates the table and fills it from the existing bookings.
+Safe to run several times: the rollup is rebuilt from scratch.
+"""
+import asyncio
+import sys
+
+# Import database URL from app settings
+sys.path.insert(0, ".")
+from app.database import AsyncSessionLocal, engine
+from app.models import BookingDailyStats
+from app.services.stats_service import rebuild_daily_stats
+
+
+async def migrate():
+    """Create booking_daily_stats and backfill it."""
+    async with engine.begin() as conn:
+        print("Creating table 'booking_daily_stats' (if not exists)...")
+        await conn.run_sync(
+            BookingDailyStats.metadata.create_all, tables=[BookingDailyStats.__table__]
+        )
+
+    # Пересчет и замена сводки в одной транзакции
+    async with AsyncSessionLocal() as db:
+        print("Building daily stats from bookings...")
+        rows = await rebuild_daily_stats(db)
+        await db.commit()
+
+    await engine.dispose()
+
+    print("✓ Migration completed successfully!")
+    print(f"  - {rows} rows in booking_daily_stats")
+
+
+if __name__ == "__main__":
+    print("=" * 50)
+    print("Migration: Add booking daily stats rollup")
+    print("=" * 50)
+    asyncio.run(migrate())
@@ -0,0 +1,55 @@
+"""
+Migration script to add the booking list indexes (GET /bookings pagination and filters).
+On PostgreSQL indexes are built CONCURRENTLY, so bookings stay writable during the build.
+Safe to run several times.
+"""
+import asyncio
+import sys
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import create_async_engine
+
+# Import database URL from app settings
+sys.path.insert(0, ".")
+from app.database import settings
+
+# Имя -> (колонки PostgreSQL, колонки SQLite)
+INDEXES = {
+    "ix_bookings_created_at_id": ("created_at, id", "created_at, id"),
+    "ix_bookings_status_created_at_id": ("status, created_at, id", "status, created_at, id"),
+    "ix_bookings_table_created_at_id": ("table_id, created_at, id", "table_id, created_at, id"),
+    "ix_bookings_user_phone": ("user_phone text_pattern_ops", "user_phone"),
+}
+
+
+async def migrate():
+    """Create the booking list indexes."""
+    engine = create_async_engine(settings.database_url, echo=False)
+    is_postgres = "postgresql" in settings.database_url
+
+    # CREATE INDEX CONCURRENTLY нельзя выполнять внутри транзакции
+    async with engine.connect() as conn:
+        conn = await conn.execution_options(isolation_level="AUTOCOMMIT")
+        for name, (pg_columns, sqlite_columns) in INDEXES.items():
+            print(f"Creating index '{name}' (if not exists)...")
+            if is_postgres:
+                await conn.execute(text(
+                    f"CREATE INDEX CONCURRENTLY IF NOT EXISTS {name} ON bookings ({pg_columns})"
+                ))
+            else:
+                await conn.execute(text(
+                    f"CREATE INDEX IF NOT EXISTS {name} ON bookings ({sqlite_columns})"
+                ))
+        await conn.execute(text("ANALYZE bookings"))
+
+    await engine.dispose()
+
+    print("✓ Migration completed successfully!")
+    print(f"  - {len(INDEXES)} indexes on bookings")
+
+
+if __name__ == "__main__":
+    print("=" * 50)
+    print("Migration: Add booking list indexes")
+    print("=" * 50)
+    asyncio.run(migrate())
@@ -0,0 +1,68 @@
+"""
+Migration script to add payment_id column to bookings table.
+Fills it from payment_intents for bookings whose payment was already created.
+Safe to run several times.
+"""
+import asyncio
+import sys
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import create_async_engine
+
+# Import database URL from app settings
+sys.path.insert(0, ".")
+from app.database import settings
+
+
+async def migrate():
+    """Add payment_id column (with index) to bookings table."""
+    engine = create_async_engine(settings.database_url, echo=True)
+
+    async with engine.begin() as conn:
+        # Check if column already exists (PostgreSQL)
+        if "postgresql" in settings.database_url:
+            result = await conn.execute(text("""
+                SELECT column_name FROM information_schema.columns
+                WHERE table_name = 'bookings' AND column_name = 'payment_id'
+            """))
+            exists = result.fetchone() is not None
+        else:
+            # SQLite: Check via PRAGMA
+            result = await conn.execute(text("PRAGMA table_info(bookings)"))
+            columns = [row[1] for row in result.fetchall()]
+            exists = "payment_id" in columns
+
+        if exists:
+            print("✓ Column 'payment_id' already exists in 'bookings' table.")
+        else:
+            print("Adding 'payment_id' column to 'bookings' table...")
+            await conn.execute(text("ALTER TABLE bookings ADD COLUMN payment_id VARCHAR"))
+
+        await conn.execute(
+            text("CREATE INDEX IF NOT EXISTS ix_bookings_payment_id ON bookings (payment_id)")
+        )
+
+        print("Copying payment ids from 'payment_intents'...")
+        result = await conn.execute(text("""
+            UPDATE bookings SET payment_id = (
+                SELECT payment_intents.payment_id FROM payment_intents
+                WHERE payment_intents.booking_id = bookings.id
+            )
+            WHERE payment_id IS NULL AND EXISTS (
+                SELECT 1 FROM payment_intents
+                WHERE payment_intents.booking_id = bookings.id
+                  AND payment_intents.payment_id IS NOT NULL
+            )
+        """))
+
+    await engine.dispose()
+
+    print("✓ Migration completed successfully!")
+    print(f"  - Filled payment_id for {result.rowcount} bookings")
+
+
+if __name__ == "__main__":
+    print("=" * 50)
+    print("Migration: Add payment_id to bookings")
+    print("=" * 50)
+    asyncio.run(migrate())
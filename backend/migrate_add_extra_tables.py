@@ -0,0 +1,50 @@
+"""
+Migration script to add extra_tables_json column to bookings table.
+Stores neighbouring tables combined for a large party.
+Run this script once to update the database schema.
+"""
+import asyncio
+import sys
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import create_async_engine
+
+# Import database URL from app settings
+sys.path.insert(0, ".")
+from app.database import settings
+
+
+async def migrate():
+    """Add extra_tables_json column to bookings table."""
+    engine = create_async_engine(settings.database_url, echo=True)
+
+    async with engine.begin() as conn:
+        # Check if column already exists (PostgreSQL)
+        if "postgresql" in settings.database_url:
+            result = await conn.execute(text("""
+                SELECT column_name FROM information_schema.columns
+                WHERE table_name = 'bookings' AND column_name = 'extra_tables_json'
+            """))
+            exists = result.fetchone() is not None
+        else:
+            # SQLite: Check via PRAGMA
+            result = await conn.execute(text("PRAGMA table_info(bookings)"))
+            columns = [row[1] for row in result.fetchall()]
+            exists = "extra_tables_json" in columns
+
+        if exists:
+            print("✓ Column 'extra_tables_json' already exists in 'bookings' table.")
+            return
+
+        print("Adding 'extra_tables_json' column to 'bookings' table...")
+        await conn.execute(text("ALTER TABLE bookings ADD COLUMN extra_tables_json TEXT"))
+
+        print("✓ Migration completed successfully!")
+        print("  - Added 'extra_tables_json' column to 'bookings' table")
+
+
+if __name__ == "__main__":
+    print("=" * 50)
+    print("Migration: Add extra_tables_json to bookings")
+    print("=" * 50)
+    asyncio.run(migrate())
@@ -0,0 +1,148 @@
+"""
+Migration script to add WebP image variants to menu items and reviews.
+Adds image_variants_json columns, then re-renders existing images
+(Base64 values and originals saved by migrate_extract_menu_images.py)
+into resized WebP variants without EXIF. Safe to run several times.
+"""
+import asyncio
+import json
+import sys
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import create_async_engine
+
+# Import database URL from app settings
+sys.path.insert(0, ".")
+from app.database import settings
+from app.services.image_processing import render_variants
+from app.services.image_store import (
+    ImageStoreError,
+    decode_inline_image,
+    image_store,
+    is_inline_image,
+    store_variants,
+)
+
+
+async def add_column(conn, table: str) -> None:
+    if "postgresql" in settings.database_url:
+        result = await conn.execute(text("""
+            SELECT column_name FROM information_schema.columns
+            WHERE table_name = :table AND column_name = 'image_variants_json'
+        """), {"table": table})
+        exists = result.fetchone() is not None
+    else:
+        result = await conn.execute(text(f"PRAGMA table_info({table})"))
+        exists = "image_variants_json" in [row[1] for row in result.fetchall()]
+
+    if exists:
+        print(f"✓ Column 'image_variants_json' already exists in '{table}' table.")
+    else:
+        print(f"Adding 'image_variants_json' column to '{table}' table...")
+        await conn.execute(text(f"ALTER TABLE {table} ADD COLUMN image_variants_json TEXT"))
+
+
+def render_image(value: str):
+    """Variants for an inline image or a stored original; None if nothing to do."""
+    if is_inline_image(value):
+        data, _ = decode_inline_image(value)
+    else:
+        if value.endswith(".webp"):
+            return None
+        data = image_store.get(value)
+        if data is None:
+            return None  # внешняя ссылка
+    return store_variants(render_variants(data))
+
+
+async def migrate():
+    """Add variant columns and render variants for existing images."""
+    engine = create_async_engine(settings.database_url, echo=False)
+
+    async with engine.begin() as conn:
+        await add_column(conn, "menu_items")
+        await add_column(conn, "reviews")
+
+    async with engine.connect() as conn:
+        menu_ids = [row[0] for row in (await conn.execute(text(
+            "SELECT id FROM menu_items WHERE image_url IS NOT NULL AND image_variants_json IS NULL"
+        ))).fetchall()]
+        review_ids = [row[0] for row in (await conn.execute(text(
+            "SELECT id FROM reviews WHERE images_json IS NOT NULL AND image_variants_json IS NULL"
+        ))).fetchall()]
+
+    converted = failed = 0
+    replaced_originals = set()
+
+    for item_id in menu_ids:
+        async with engine.begin() as conn:
+            value = (await conn.execute(
+                text("SELECT image_url FROM menu_items WHERE id = :id"), {"id": item_id}
+            )).scalar_one_or_none()
+            try:
+                variants = render_image(value)
+            except (ImageStoreError, OSError) as e:
+                print(f"⚠ Menu item {item_id}: {e}, left unchanged")
+                failed += 1
+                continue
+            if variants is None:
+                continue
+            await conn.execute(
+                text("UPDATE menu_items SET image_url = :url, image_variants_json = :variants "
+                     "WHERE id = :id"),
+                {"url": variants[-1]["url"], "variants": json.dumps(variants), "id": item_id},
+            )
+            if not is_inline_image(value):
+                replaced_originals.add(value)
+            converted += 1
+
+    for review_id in review_ids:
+        async with engine.begin() as conn:
+            images_json = (await conn.execute(
+                text("SELECT images_json FROM reviews WHERE id = :id"), {"id": review_id}
+            )).scalar_one_or_none()
+            try:
+                images = json.loads(images_json)
+            except ValueError:
+                continue
+
+            urls, all_variants = [], []
+            for image in images:
+                try:
+                    variants = render_image(image)
+                except (ImageStoreError, OSError) as e:
+                    print(f"⚠ Review {review_id}: {e}, image left unchanged")
+                    failed += 1
+                    variants = None
+                urls.append(variants[-1]["url"] if variants else image)
+                all_variants.append(variants)
+                if variants and not is_inline_image(image):
+                    replaced_originals.add(image)
+
+            if not any(all_variants):
+                continue
+            await conn.execute(
+                text("UPDATE reviews SET images_json = :images, image_variants_json = :variants "
+                     "WHERE id = :id"),
+                {"images": json.dumps(urls), "variants": json.dumps(all_variants), "id": review_id},
+            )
+            converted += 1
+
+    await engine.dispose()
+
+    # Оригиналы содержат EXIF (в том числе геолокацию) - публично их больше не раздаем
+    for url in replaced_originals:
+        image_store.delete(url)
+
+    print("✓ Migration completed successfully!")
+    print(f"  - Rendered WebP variants for {converted} rows")
+    print(f"  - Removed {len(replaced_originals)} original files")
+    if failed:
+        print(f"  - {failed} images could not be processed")
+
+
+if __name__ == "__main__":
+    print("=" * 50)
+    print("Migration: Add WebP image variants")
+    print("=" * 50)
+    asyncio.run(migrate())
@@ -0,0 +1,30 @@
+"""
+Migration script to add the payment_intents table.
+Bookings created before the migration keep their old payment links.
+Safe to run several times.
+"""
+import asyncio
+import sys
+
+# Import database URL from app settings
+sys.path.insert(0, ".")
+from app.database import engine
+from app.models import PaymentIntent
+
+
+async def migrate():
+    """Create payment_intents."""
+    async with engine.begin() as conn:
+        print("Creating table 'payment_intents' (if not exists)...")
+        await conn.run_sync(PaymentIntent.metadata.create_all, tables=[PaymentIntent.__table__])
+
+    await engine.dispose()
+
+    print("✓ Migration completed successfully!")
+
+
+if __name__ == "__main__":
+    print("=" * 50)
+    print("Migration: Add payment intents")
+    print("=" * 50)
+    asyncio.run(migrate())
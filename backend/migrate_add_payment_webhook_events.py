@@ -0,0 +1,30 @@
+"""
+Migration script to add the payment_webhook_events table.
+Webhooks processed before the migration are not recorded.
+Safe to run several times.
+"""
+import asyncio
+import sys
+
+# Import database URL from app settings
+sys.path.insert(0, ".")
+from app.database import engine
+from app.models import PaymentWebhookEvent
+
+
+async def migrate():
+    """Create payment_webhook_events."""
+    async with engine.begin() as conn:
+        print("Creating table 'payment_webhook_events' (if not exists)...")
+        await conn.run_sync(PaymentWebhookEvent.metadata.create_all, tables=[PaymentWebhookEvent.__table__])
+
+    await engine.dispose()
+
+    print("✓ Migration completed successfully!")
+
+
+if __name__ == "__main__":
+    print("=" * 50)
+    print("Migration: Add payment webhook events")
+    print("=" * 50)
+    asyncio.run(migrate())
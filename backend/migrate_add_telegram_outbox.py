@@ -0,0 +1,30 @@
+"""
+Migration script to add the telegram_outbox table.
+Notifications are queued in it from the next booking change on.
+Safe to run several times.
+"""
+import asyncio
+import sys
+
+# Import database URL from app settings
+sys.path.insert(0, ".")
+from app.database import engine
+from app.models import TelegramOutbox
+
+
+async def migrate():
+    """Create telegram_outbox."""
+    async with engine.begin() as conn:
+        print("Creating table 'telegram_outbox' (if not exists)...")
+        await conn.run_sync(TelegramOutbox.metadata.create_all, tables=[TelegramOutbox.__table__])
+
+    await engine.dispose()
+
+    print("✓ Migration completed successfully!")
+
+
+if __name__ == "__main__":
+    print("=" * 50)
+    print("Migration: Add Telegram outbox")
+    print("=" * 50)
+    asyncio.run(migrate())
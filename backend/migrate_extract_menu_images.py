@@ -0,0 +1,78 @@
+"""
+Migration script to move Base64 menu images out of the database.
+Each inline image in menu_items.image_url is saved to the image store
+(MEDIA_ROOT) and the column is replaced with the file URL.
+Safe to run several times: rows that already hold a URL are skipped.
+"""
+import asyncio
+import sys
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import create_async_engine
+
+# Import database URL from app settings
+sys.path.insert(0, ".")
+from app.database import settings
+from app.services.image_store import (
+    ImageStoreError,
+    decode_inline_image,
+    image_store,
+    is_inline_image,
+)
+
+
+async def migrate():
+    """Extract inline images of menu items into files."""
+    engine = create_async_engine(settings.database_url, echo=False)
+
+    async with engine.connect() as conn:
+        result = await conn.execute(text(
+            "SELECT id FROM menu_items WHERE image_url IS NOT NULL ORDER BY id"
+        ))
+        item_ids = [row[0] for row in result.fetchall()]
+
+    moved = skipped = failed = 0
+    saved_bytes = 0
+
+    # По одной строке: Base64 всего меню в память целиком не грузим
+    for item_id in item_ids:
+        async with engine.begin() as conn:
+            result = await conn.execute(
+                text("SELECT image_url FROM menu_items WHERE id = :id"), {"id": item_id}
+            )
+            value = result.scalar_one_or_none()
+
+            if not is_inline_image(value):
+                skipped += 1
+                continue
+
+            try:
+                data, extension = decode_inline_image(value)
+            except ImageStoreError as e:
+                print(f"⚠ Menu item {item_id}: {e}, left unchanged")
+                failed += 1
+                continue
+
+            url = image_store.put(data, extension)
+            await conn.execute(
+                text("UPDATE menu_items SET image_url = :url WHERE id = :id"),
+                {"url": url, "id": item_id},
+            )
+            moved += 1
+            saved_bytes += len(value) - len(url)
+
+    await engine.dispose()
+
+    print("✓ Migration completed successfully!")
+    print(f"  - Moved {moved} images to '{settings.media_root}'")
+    print(f"  - Skipped {skipped} rows that already hold a URL")
+    if failed:
+        print(f"  - {failed} rows could not be decoded")
+    print(f"  - Menu rows are {saved_bytes / 1024 / 1024:.1f} MiB smaller")
+
+
+if __name__ == "__main__":
+    print("=" * 50)
+    print("Migration: Extract Base64 menu images to files")
+    print("=" * 50)
+    asyncio.run(migrate())
@@ -0,0 +1,62 @@
+"""
+Reconcile bookings with YooKassa payments created in a time window.
+Confirms paid PENDING bookings whose webhook never arrived, cancels PENDING
+bookings with canceled payments and lists cases that need manual review.
+
+Run:
+    python reconcile_payments.py                      # last 24 hours
+    python reconcile_payments.py --hours 72 --dry-run
+    python reconcile_payments.py --from 2024-06-01 --to 2024-06-08
+"""
+import argparse
+import asyncio
+import sys
+from datetime import datetime, timedelta, timezone
+
+# Import database URL from app settings
+sys.path.insert(0, ".")
+from app.database import AsyncSessionLocal, engine
+from app.services.http_clients import http_clients
+from app.services.payment_reconciliation import reconcile_payments
+
+
+def _moment(value: str) -> datetime:
+    """ISO date or datetime; without an offset it is taken as UTC."""
+    moment = datetime.fromisoformat(value)
+    return moment if moment.tzinfo else moment.replace(tzinfo=timezone.utc)
+
+
+async def reconcile(created_from: datetime, created_to: datetime, dry_run: bool) -> None:
+    try:
+        async with AsyncSessionLocal() as db:
+            result = await reconcile_payments(db, created_from, created_to, dry_run=dry_run)
+    finally:
+        await http_clients.aclose()
+        await engine.dispose()
+
+    prefix = "Would be " if dry_run else ""
+    print(f"Payments in window:          {result.payments}")
+    print(f"PENDING/CONFIRMED bookings:  {result.bookings}")
+    print(f"{prefix}confirmed:  {len(result.confirmed)} {result.confirmed or ''}")
+    print(f"{prefix}cancelled:  {len(result.cancelled)} {result.cancelled or ''}")
+    print(f"{prefix}payment ids saved: {result.payment_ids_set}")
+    if result.needs_review:
+        print(f"⚠ Need manual review: {result.needs_review}")
+    print("✓ Reconciliation completed" + (" (dry run, nothing changed)" if dry_run else ""))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Reconcile bookings with YooKassa payments")
+    parser.add_argument("--from", dest="created_from", type=_moment, help="window start (ISO)")
+    parser.add_argument("--to", dest="created_to", type=_moment, help="window end, exclusive (ISO)")
+    parser.add_argument("--hours", type=int, default=24, help="window length if --from is not set")
+    parser.add_argument("--dry-run", action="store_true", help="only report the differences")
+    args = parser.parse_args()
+
+    created_to = args.created_to or datetime.now(timezone.utc)
+    created_from = args.created_from or created_to - timedelta(hours=args.hours)
+
+    print("=" * 50)
+    print(f"Payment reconciliation: {created_from.isoformat()} - {created_to.isoformat()}")
+    print("=" * 50)
+    asyncio.run(reconcile(created_from, created_to, args.dry_run))
@@ -192,8 +192,8 @@ export const BookingForm: React.FC = () => {
 
       const { data } = await apiClient.post("/bookings", payload);
 
-      // Переход на оплату
-      if (data.payment_url) {
+      // Переход на оплату (ссылка YooKassa создается в фоне, см. payment_status_url)
+      if (data.payment_url || data.payment_status_url) {
         window.location.href = `/payment/test?booking_id=${data.booking_id}&amount=500`;
       } else {
         toast.success("Бронирование создано!");
@@ -40,7 +40,16 @@ const STATUS_CONFIG = {
 };
 
 export const BookingsTable: React.FC = () => {
-    const { bookings, updateBookingStatus, updateBooking, isLoading } = useBookingsStore();
+    const {
+        bookings,
+        nextCursor,
+        totalCount,
+        updateBookingStatus,
+        updateBooking,
+        fetchMoreBookings,
+        isLoading,
+        isLoadingMore,
+    } = useBookingsStore();
     const [statusFilter, setStatusFilter] = useState<StatusFilter>("all");
     const [searchQuery, setSearchQuery] = useState("");
     const [updatingId, setUpdatingId] = useState<string | null>(null);
@@ -394,7 +403,10 @@ export const BookingsTable: React.FC = () => {
             {/* Summary */}
             {filteredBookings.length > 0 && (
                 <div className="flex justify-between items-center text-sm text-white/40 px-2">
-                    <span>Показано: {filteredBookings.length} бронирований</span>
+                    <span>
+                        Показано: {filteredBookings.length} бронирований
+                        {totalCount !== null && ` (загружено ${bookings.length} из ${totalCount})`}
+                    </span>
                     <span>
                         Ожидаемый депозит:{" "}
                         {filteredBookings
@@ -405,6 +417,20 @@ export const BookingsTable: React.FC = () => {
                     </span>
                 </div>
             )}
+
+            {/* Load more: the API returns bookings page by page */}
+            {!isLoading && nextCursor && (
+                <div className="flex justify-center">
+                    <button
+                        onClick={fetchMoreBookings}
+                        disabled={isLoadingMore}
+                        className="px-4 py-2 rounded-lg text-sm font-medium bg-white/5 text-white/60 hover:bg-white/10 transition-all flex items-center gap-2 disabled:opacity-50"
+                    >
+                        {isLoadingMore && <Loader2 className="animate-spin" size={14} />}
+                        Загрузить еще
+                    </button>
+                </div>
+            )}
         </div>
     );
 };
@@ -13,7 +13,8 @@ interface UserProfileProps {
 }
 
 export const UserProfile: React.FC<UserProfileProps> = ({ user, onLogout }) => {
-  const { bookings, fetchBookings, isLoading } = useBookingsStore();
+  const { bookings, nextCursor, fetchBookings, fetchMoreBookings, isLoading, isLoadingMore } =
+    useBookingsStore();
 
   useEffect(() => {
     fetchBookings();
@@ -104,6 +105,15 @@ export const UserProfile: React.FC<UserProfileProps> = ({ user, onLogout }) => {
               </div>
             </GlassCard>
           ))}
+          {nextCursor && (
+            <button
+              onClick={fetchMoreBookings}
+              disabled={isLoadingMore}
+              className="mx-auto px-6 py-2 text-xs uppercase tracking-widest text-white/50 hover:text-luxury-gold transition-colors disabled:opacity-50"
+            >
+              {isLoadingMore ? "Загрузка..." : "Показать еще"}
+            </button>
+          )}
         </div>
       )}
     </div>
@@ -7,19 +7,64 @@ import { Booking, BookingRequest, BookingStatus } from '../types';
 
 interface BookingsState {
   bookings: Booking[];
+  // Keyset pagination: X-Next-Cursor of the last loaded page (null on the last page)
+  nextCursor: string | null;
+  totalCount: number | null;
   isLoading: boolean;
+  isLoadingMore: boolean;
   error: string | null;
   createBooking: (data: BookingRequest) => Promise<{ success: boolean; paymentUrl?: string; bookingId?: number; error?: string }>;
   confirmPayment: (bookingId: number) => Promise<{ success: boolean }>;
   fetchBookings: () => Promise<void>;
+  fetchMoreBookings: () => Promise<void>;
   getBooking: (id: number) => Promise<Booking | null>;
   updateBookingStatus: (id: number, status: BookingStatus) => Promise<void>;
   updateBooking: (id: number, data: BookingRequest) => Promise<void>;
 }
 
+const toBooking = (item: any): Booking => ({
+  id: item.id.toString(),
+  date: item.date,
+  time: item.time,
+  guests: item.guest_count,
+  name: item.user_name,
+  phone: item.user_phone,
+  tableId: item.table_id,
+  tableNumber: item.table_number,
+  status: item.status as BookingStatus,
+  depositAmount: item.deposit_amount,
+  createdAt: new Date(item.created_at),
+  comment: item.comment || '',
+});
+
+const pageInfo = (headers: any) => {
+  const total = headers['x-total-count'];
+  return {
+    nextCursor: (headers['x-next-cursor'] as string | undefined) || null,
+    totalCount: total !== undefined ? Number(total) : null,
+  };
+};
+
+// Replace an updated booking in place: a refetch would drop the pages loaded with "load more"
+const withUpdated = (bookings: Booking[], item: any): Booking[] => {
+  const updated = toBooking(item);
+  return bookings.map((b) =>
+    b.id === updated.id
+      ? {
+          ...updated,
+          // The update response has no table number; keep it while the table is the same
+          tableNumber: updated.tableNumber ?? (b.tableId === updated.tableId ? b.tableNumber : undefined),
+        }
+      : b
+  );
+};
+
 export const useBookingsStore = create<BookingsState>((set, get) => ({
   bookings: [],
+  nextCursor: null,
+  totalCount: null,
   isLoading: false,
+  isLoadingMore: false,
   error: null,
 
   createBooking: async (data: BookingRequest) => {
@@ -68,27 +113,34 @@ export const useBookingsStore = create<BookingsState>((set, get) => ({
     set({ isLoading: true, error: null });
     try {
       const response = await apiClient.get('/bookings');
-      const bookings: Booking[] = response.data.map((item: any) => ({
-        id: item.id.toString(),
-        date: item.date,
-        time: item.time,
-        guests: item.guest_count,
-        name: item.user_name,
-        phone: item.user_phone,
-        tableId: item.table_id,
-        tableNumber: item.table_number,
-        status: item.status as BookingStatus,
-        depositAmount: item.deposit_amount,
-        createdAt: new Date(item.created_at),
-        comment: item.comment || '',
-      }));
-
-      set({ bookings, isLoading: false });
+      const bookings: Booking[] = response.data.map(toBooking);
+
+      set({ bookings, ...pageInfo(response.headers), isLoading: false });
     } catch (error: any) {
       set({ error: error.message, isLoading: false });
     }
   },
 
+  fetchMoreBookings: async () => {
+    const { nextCursor, isLoadingMore } = get();
+    if (!nextCursor || isLoadingMore) return;
+
+    set({ isLoadingMore: true, error: null });
+    try {
+      const response = await apiClient.get('/bookings', { params: { cursor: nextCursor } });
+      const loaded = new Set(get().bookings.map((b) => b.id));
+      const more: Booking[] = response.data.map(toBooking).filter((b: Booking) => !loaded.has(b.id));
+
+      set({
+        bookings: [...get().bookings, ...more],
+        ...pageInfo(response.headers),
+        isLoadingMore: false,
+      });
+    } catch (error: any) {
+      set({ error: error.message, isLoadingMore: false });
+    }
+  },
+
   getBooking: async (id: number) => {
     try {
       const response = await apiClient.get(`/bookings/${id}`);
@@ -114,9 +166,8 @@ export const useBookingsStore = create<BookingsState>((set, get) => ({
 
   updateBookingStatus: async (id: number, status: BookingStatus) => {
     try {
-      await apiClient.put(`/bookings/${id}/status`, { status });
-      // Refresh bookings after update
-      await get().fetchBookings();
+      const response = await apiClient.put(`/bookings/${id}/status`, { status });
+      set({ bookings: withUpdated(get().bookings, response.data) });
     } catch (error: any) {
       throw new Error(error.response?.data?.detail || 'Ошибка обновления статуса');
     }
@@ -124,7 +175,7 @@ export const useBookingsStore = create<BookingsState>((set, get) => ({
 
   updateBooking: async (id: number, data: BookingRequest) => {
     try {
-      await apiClient.put(`/bookings/${id}`, {
+      const response = await apiClient.put(`/bookings/${id}`, {
         user_name: data.name,
         user_phone: data.phone,
         date: data.date,
@@ -133,8 +184,7 @@ export const useBookingsStore = create<BookingsState>((set, get) => ({
         table_id: data.tableId,
         comment: data.comment,
       });
-      // Refresh bookings after update
-      await get().fetchBookings();
+      set({ bookings: withUpdated(get().bookings, response.data) });
     } catch (error: any) {
       throw new Error(error.response?.data?.detail || 'Ошибка обновления бронирования');
     }